@@ -0,0 +1,247 @@
+"""
+Batch scoring for regrading stored training sessions.
+
+Sessions are loaded into column arrays (duration, completed step count,
+critical error count, exam flag, template) and scored with NumPy in one
+pass. The arithmetic mirrors ScoringSystem.calculate_session_score
+operation for operation, so a regrade produces the same floats as
+scoring each session individually with the same weights and templates.
+Without NumPy the same formulas run row by row in Python.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Mapping, Optional
+import logging
+
+from core.models import SandwichTemplate, TrainingMode
+from core.scoring_system import ScoringSystem
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Python truthiness of error['critical'], evaluated in SQL
+CRITICAL_ERRORS_SQL = '''
+    (SELECT COUNT(*) FROM json_each(s.errors) e
+     WHERE e.type = 'object' AND CASE json_type(e.value, '$.critical')
+         WHEN 'true' THEN 1
+         WHEN 'integer' THEN json_extract(e.value, '$.critical') != 0
+         WHEN 'real' THEN json_extract(e.value, '$.critical') != 0
+         WHEN 'text' THEN json_extract(e.value, '$.critical') != ''
+         WHEN 'array' THEN json_extract(e.value, '$.critical') != '[]'
+         WHEN 'object' THEN json_extract(e.value, '$.critical') != '{}'
+         ELSE 0 END)
+'''
+
+LOAD_SESSIONS = f'''
+    SELECT s.id, s.template_id, s.mode, s.start_time, s.end_time,
+           COALESCE(json_array_length(s.completed_steps), 0) AS completed,
+           {CRITICAL_ERRORS_SQL} AS critical
+    FROM training_sessions s
+'''
+
+
+@dataclass
+class SessionColumns:
+    """Scoring inputs of many sessions, one list (or array) per field"""
+    ids: List[str]
+    template_ids: List[str]
+    durations: List[Optional[float]]  # seconds; None (NaN) when start or end is missing
+    completed: List[int]
+    critical_errors: List[int]
+    exam: List[bool]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@dataclass
+class BatchScores:
+    """Scoring results aligned with the SessionColumns they came from"""
+    ids: List[str]
+    score: List[float]
+    accuracy: List[float]
+    speed: List[float]
+    bonus: List[float]
+    grade: List[str]
+    passed: List[bool]
+
+
+class BatchScorer:
+    """Scores sessions in bulk with the weights of a ScoringSystem"""
+
+    def __init__(self, scoring_system: ScoringSystem = None):
+        self.scoring_system = scoring_system or ScoringSystem()
+
+    def load_columns(self, db, user_id: str = None, template_id: str = None,
+                     batch_size: int = 10000) -> SessionColumns:
+        """Read stored sessions into columns"""
+        where = '1=1'
+        params = []
+        if user_id:
+            where += ' AND s.user_id = ?'
+            params.append(user_id)
+        if template_id:
+            where += ' AND s.template_id = ?'
+            params.append(template_id)
+
+        with db.pool.reader() as conn:
+            return self.read_columns(conn, where, params, batch_size)
+
+    def read_columns(self, conn, where: str = '1=1', params=(), batch_size: int = 10000) -> SessionColumns:
+        """Read the sessions matching a WHERE clause (on alias s) from a connection"""
+        fields = [[] for _ in range(7)]
+        # Plain tuples; sqlite3.Row costs more than the query here
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f'{LOAD_SESSIONS} WHERE {where}', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            # Transpose the batch into its columns
+            for column, values in zip(fields, zip(*rows)):
+                column.extend(values)
+        ids, template_ids, modes, starts, ends, completed, critical = fields
+
+        exam = [mode == TrainingMode.EXAM.value for mode in modes]
+
+        if NUMPY_AVAILABLE:
+            start = np.array(starts, dtype='datetime64[us]')
+            end = np.array(ends, dtype='datetime64[us]')
+            # Integer microseconds / 1e6, exactly as timedelta.total_seconds()
+            elapsed = (end - start)
+            durations = np.where(np.isnat(elapsed), np.nan, elapsed.astype('int64') / 10 ** 6)
+            return SessionColumns(ids, template_ids, durations,
+                                  np.array(completed, dtype=np.int64),
+                                  np.array(critical, dtype=np.int64),
+                                  np.array(exam, dtype=bool))
+
+        durations = [
+            (datetime.fromisoformat(e) - datetime.fromisoformat(s)).total_seconds() if s and e else None
+            for s, e in zip(starts, ends)
+        ]
+        return SessionColumns(ids, template_ids, durations, completed, critical, exam)
+
+    def score(self, columns: SessionColumns, templates: Mapping[str, SandwichTemplate]) -> BatchScores:
+        """Score every session in `columns` against `templates` (by ID).
+
+        Sessions whose template is missing score 0 with grade F, as in the
+        per-session path. Templates without steps or without a time target,
+        where the per-session path divides by zero, yield 0 accuracy/speed.
+        """
+        if not NUMPY_AVAILABLE:
+            return self._score_python(columns, templates)
+
+        scoring = self.scoring_system
+        n = len(columns)
+
+        # Template attributes gathered per session through an index array
+        template_keys, template_index = np.unique(np.array(columns.template_ids, dtype=object),
+                                                  return_inverse=True)
+        known = np.array([key in templates for key in template_keys], dtype=bool)[template_index]
+        total_steps = np.array([len(templates[key].steps) if key in templates else 0
+                                for key in template_keys], dtype=np.float64)[template_index]
+        target_time = np.array([templates[key].total_time_target if key in templates else 0
+                                for key in template_keys], dtype=np.float64)[template_index]
+
+        completed = np.asarray(columns.completed, dtype=np.int64)
+        critical = np.asarray(columns.critical_errors, dtype=np.int64)
+        durations = np.asarray(columns.durations, dtype=np.float64)
+        exam = np.asarray(columns.exam, dtype=bool)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Accuracy
+            base_accuracy = completed / total_steps
+            accuracy = np.maximum(0, base_accuracy - critical * 0.3)
+            accuracy = np.where((completed == 0) | (total_steps == 0), 0.0, accuracy)
+
+            # Speed
+            overtime_speed = np.maximum(0, 1.0 - ((durations - target_time) / target_time))
+            speed = np.where(durations <= target_time, 1.0, overtime_speed)
+            speed = np.where(np.isnan(durations) | ((target_time == 0) & (durations > 0)), 0.0, speed)
+
+        composite = accuracy * 100 * scoring.accuracy_weight + speed * 100 * scoring.speed_weight
+        bonus = np.where(exam & (speed > 0.8), np.minimum(10, (speed - 0.8) * 50), 0.0)
+        score = np.minimum(100, np.maximum(0, composite + bonus))
+
+        score = np.where(known, score, 0.0)
+        accuracy = np.where(known, accuracy, 0.0)
+        speed = np.where(known, speed, 0.0)
+        bonus = np.where(known, bonus, 0.0)
+
+        grade = np.select([score >= 90, score >= 80, score >= 70, score >= 60], ['A', 'B', 'C', 'D'], 'F')
+        logger.info(f"Batch scored {n} sessions")
+        return BatchScores(columns.ids, score, accuracy, speed, bonus, grade, score >= 70)
+
+    def _score_python(self, columns: SessionColumns, templates: Mapping[str, SandwichTemplate]) -> BatchScores:
+        """Row-by-row fallback used when NumPy is not installed"""
+        scoring = self.scoring_system
+        results = BatchScores(columns.ids, [], [], [], [], [], [])
+
+        for i in range(len(columns)):
+            template = templates.get(columns.template_ids[i])
+            accuracy = speed = bonus = score = 0.0
+
+            if template:
+                total_steps = len(template.steps)
+                if columns.completed[i] and total_steps:
+                    accuracy = max(0, columns.completed[i] / total_steps - columns.critical_errors[i] * 0.3)
+
+                duration = columns.durations[i]
+                target_time = template.total_time_target
+                if duration is not None and duration <= target_time:
+                    speed = 1.0
+                elif duration is not None and target_time:
+                    speed = max(0, 1.0 - ((duration - target_time) / target_time))
+
+                composite = accuracy * 100 * scoring.accuracy_weight + speed * 100 * scoring.speed_weight
+                if columns.exam[i] and speed > 0.8:
+                    bonus = min(10, (speed - 0.8) * 50)
+                score = min(100, max(0, composite + bonus))
+
+            results.score.append(score)
+            results.accuracy.append(accuracy)
+            results.speed.append(speed)
+            results.bonus.append(bonus)
+            results.grade.append(scoring._get_grade(score))
+            results.passed.append(score >= 70)
+
+        return results
+
+    def regrade(self, db, user_id: str = None, template_id: str = None, chunk_size: int = 5000) -> int:
+        """Recompute and store score, accuracy and speed of stored sessions.
+
+        Only raw sessions are regraded; totals already folded into rollups
+        keep the values they were recorded with. The tables derived from
+        scores are rebuilt afterwards, sketches and leaderboards only for the
+        regraded templates. Returns the number of sessions updated.
+        """
+        columns = self.load_columns(db, user_id=user_id, template_id=template_id)
+        templates = {template.id: template for template in db.template_cache.all()}
+        results = self.score(columns, templates)
+
+        rows = list(zip(
+            (float(v) for v in results.score),
+            (float(v) for v in results.accuracy),
+            (float(v) for v in results.speed),
+            results.ids
+        ))
+        for start in range(0, len(rows), chunk_size):
+            with db.pool.writer() as conn:
+                conn.executemany(
+                    "UPDATE training_sessions SET score = ?, accuracy = ?, speed = ? WHERE id = ?",
+                    rows[start:start + chunk_size]
+                )
+
+        if rows:
+            db.rebuild_score_aggregates(sorted(set(columns.template_ids)))
+
+        logger.info(f"Regraded {len(rows)} sessions")
+        return len(rows)
@@ -0,0 +1,296 @@
+"""
+Offline fitting of FSRS weights to one store's flashcard review log.
+
+Reviews are grouped into (user, card) histories and reduced to the first
+review of each day, which is what the scheduler's long-term memory model
+describes. Every later review is a prediction: the recall probability of
+the state built from the earlier reviews, against whether the card was
+recalled (any rating but "again"). Weights are fitted to minimize log
+loss with Adam over mini-batches of histories. A batch is evaluated one
+review step at a time across all of its histories with NumPy, carrying
+the derivatives of stability and difficulty with respect to each weight
+along with the state (forward-mode), so there is no per-review Python.
+
+Run offline with:  python -m core.fsrs_optimizer --db lineup_pro.db --store default
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+import logging
+
+from core.spaced_repetition import DECAY, DEFAULT_WEIGHTS, FACTOR
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Reviews logged before stores were recorded (store_id NULL) count for every store
+LOAD_REVIEWS = '''
+    SELECT user_id, flashcard_id, reviewed_at, rating FROM flashcard_reviews
+    WHERE store_id = ? OR store_id IS NULL
+    ORDER BY user_id, flashcard_id, reviewed_at, id
+'''
+
+# Allowed range of each weight, as in the reference FSRS-4.5 optimizer
+WEIGHT_BOUNDS = (
+    (0.1, 100), (0.1, 100), (0.1, 100), (0.1, 100), (1, 10), (0.1, 5), (0.1, 5), (0, 0.75),
+    (0, 4), (0, 0.8), (0.01, 3), (0.1, 5), (0.01, 0.2), (0.01, 0.9), (0.01, 2), (0, 1), (1, 6),
+)
+
+N_WEIGHTS = len(DEFAULT_WEIGHTS)
+
+
+@dataclass
+class ReviewHistories:
+    """Daily reviews of every (user, card) history with at least two days, as columns"""
+    seq: 'np.ndarray'  # history index
+    step: 'np.ndarray'  # position within the history
+    delta: 'np.ndarray'  # days since the previous review in the history
+    rating: 'np.ndarray'
+    count: int  # number of histories
+
+    @property
+    def predictions(self) -> int:
+        """Reviews whose outcome the model predicts (all but each history's first)"""
+        return len(self.seq) - self.count
+
+    @classmethod
+    def from_columns(cls, users, cards, reviewed_at, ratings) -> 'ReviewHistories':
+        """Build from review columns sorted by user, card and time"""
+        users = np.asarray(users, dtype=object)
+        cards = np.asarray(cards, dtype=object)
+        day = np.asarray(reviewed_at, dtype=np.int64) // 86400
+        ratings = np.asarray(ratings, dtype=np.int64)
+
+        new_seq = np.ones(len(day), dtype=bool)
+        new_seq[1:] = (users[1:] != users[:-1]) | (cards[1:] != cards[:-1])
+        keep = new_seq.copy()
+        keep[1:] |= day[1:] != day[:-1]
+        new_seq, day, ratings = new_seq[keep], day[keep], ratings[keep]
+
+        seq = np.cumsum(new_seq) - 1
+        # Histories with a single day predict nothing
+        lengths = np.bincount(seq) if len(seq) else np.zeros(0, dtype=np.int64)
+        useful = lengths[seq] > 1
+        seq = np.unique(seq[useful], return_inverse=True)[1]
+        new_seq, day, ratings = new_seq[useful], day[useful], ratings[useful]
+
+        delta = np.zeros(len(day))
+        delta[1:] = day[1:] - day[:-1]
+        delta[new_seq] = 0
+        starts = np.flatnonzero(new_seq)
+        step = np.arange(len(day)) - starts[seq]
+        return cls(seq, step, delta, ratings, len(starts))
+
+
+@dataclass
+class FitResult:
+    weights: Tuple[float, ...]
+    log_loss_before: float
+    log_loss_after: float
+    reviews: int  # predicted reviews the fit was scored on
+
+
+class FSRSOptimizer:
+    """Fits FSRS weights to review histories by mini-batch gradient descent"""
+
+    def __init__(self, weights: Sequence[float] = DEFAULT_WEIGHTS, learning_rate: float = 0.04,
+                 epochs: int = 5, batch_size: int = 512, seed: int = 0):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("FSRSOptimizer requires NumPy")
+        self.weights = np.array(weights, dtype=np.float64)
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.lower, self.upper = np.array(WEIGHT_BOUNDS, dtype=np.float64).T
+
+    def load_histories(self, db, batch_size: int = 100000) -> ReviewHistories:
+        """Read the review log of the database's store"""
+        columns = [[] for _ in range(4)]
+        with db.pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(LOAD_REVIEWS, (db.store_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for column, values in zip(columns, zip(*rows)):
+                    column.extend(values)
+        return ReviewHistories.from_columns(*columns)
+
+    def tune(self, db, min_reviews: int = 1000) -> Optional[FitResult]:
+        """Fit weights to the reviews logged in a database's store and store them for it.
+
+        Returns None without fitting when the log has fewer than
+        `min_reviews` predictable reviews. Weights are only stored when
+        they predict the log better than the current ones.
+        """
+        histories = self.load_histories(db)
+        if histories.predictions < min_reviews:
+            logger.info(f"Only {histories.predictions} reviews to fit, keeping scheduler parameters")
+            return None
+
+        self.weights = np.array(db.scheduler.w, dtype=np.float64)
+        result = self.fit(histories)
+        if result.log_loss_after < result.log_loss_before:
+            db.save_scheduler_parameters(result.weights, result.reviews, result.log_loss_after)
+        return result
+
+    def fit(self, histories: ReviewHistories) -> FitResult:
+        """Run Adam from the current weights; returns the fitted weights and log loss"""
+        before = self.log_loss(histories)
+        w = self.weights.copy()
+        m = np.zeros(N_WEIGHTS)
+        v = np.zeros(N_WEIGHTS)
+        beta1, beta2, t = 0.9, 0.999, 0
+
+        for epoch in range(self.epochs):
+            for batch in self._batches(histories, shuffle=True):
+                loss, grad, count = self._evaluate(w, batch)
+                if not count:
+                    continue
+                t += 1
+                grad /= count
+                m = beta1 * m + (1 - beta1) * grad
+                v = beta2 * v + (1 - beta2) * grad * grad
+                step = self.learning_rate * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + 1e-8)
+                w = np.clip(w - step, self.lower, self.upper)
+            logger.info(f"FSRS fit epoch {epoch + 1}/{self.epochs}")
+
+        self.weights = w
+        after = self.log_loss(histories)
+        logger.info(f"FSRS fit on {histories.predictions} reviews: log loss {before:.4f} -> {after:.4f}")
+        return FitResult(tuple(float(x) for x in w), before, after, histories.predictions)
+
+    def log_loss(self, histories: ReviewHistories, weights: Sequence[float] = None) -> float:
+        w = self.weights if weights is None else np.asarray(weights, dtype=np.float64)
+        total, count = 0.0, 0
+        for batch in self._batches(histories, shuffle=False):
+            loss, _, batch_count = self._evaluate(w, batch)
+            total += loss
+            count += batch_count
+        return total / count if count else 0.0
+
+    def _batches(self, histories: ReviewHistories, shuffle: bool):
+        """Yield batches as lists of per-step (local history index, delta, rating) arrays"""
+        order = self.rng.permutation(histories.count) if shuffle else np.arange(histories.count)
+        position = np.empty(histories.count, dtype=np.int64)
+        position[order] = np.arange(histories.count)
+        batch_of = position[histories.seq] // self.batch_size
+        local = position[histories.seq] % self.batch_size
+
+        rows = np.lexsort((local, histories.step, batch_of))
+        batch_of, step = batch_of[rows], histories.step[rows]
+        local, delta, rating = local[rows], histories.delta[rows], histories.rating[rows]
+
+        batch_edges = np.flatnonzero(np.diff(batch_of)) + 1
+        for start, end in zip(np.r_[0, batch_edges], np.r_[batch_edges, len(rows)]):
+            step_edges = np.flatnonzero(np.diff(step[start:end])) + 1 + start
+            yield [
+                (local[a:b], delta[a:b], rating[a:b])
+                for a, b in zip(np.r_[start, step_edges], np.r_[step_edges, end])
+            ]
+
+    def _evaluate(self, w, steps) -> Tuple[float, 'np.ndarray', int]:
+        """Summed log loss, its gradient and the number of predictions for one batch"""
+        size = self.batch_size
+        eye = np.eye(N_WEIGHTS)
+        S = np.zeros(size)
+        D = np.zeros(size)
+        dS = np.zeros((size, N_WEIGHTS))
+        dD = np.zeros((size, N_WEIGHTS))
+        loss, grad, count = 0.0, np.zeros(N_WEIGHTS), 0
+
+        for k, (idx, t, g) in enumerate(steps):
+            if k == 0:
+                S[idx] = w[g - 1]
+                dS[idx] = eye[g - 1]
+                d0 = w[4] - (g - 3) * w[5]
+                D[idx] = np.clip(d0, 1, 10)
+                dD[idx] = ((d0 > 1) & (d0 < 10))[:, None] * (eye[4] - (g - 3)[:, None] * eye[5])
+                continue
+
+            s, d, ds, dd = S[idx], D[idx], dS[idx], dD[idx]
+
+            # Predicted recall and its loss
+            base = 1 + FACTOR * t / s
+            r = base ** DECAY
+            dr = (-DECAY * FACTOR * t / (s * s) * base ** (DECAY - 1))[:, None] * ds
+            recalled = g > 1
+            rc = np.clip(r, 1e-6, 1 - 1e-6)
+            loss -= np.sum(np.where(recalled, np.log(rc), np.log(1 - rc)))
+            grad += np.sum(np.where(recalled, -1 / rc, 1 / (1 - rc))[:, None] * dr, axis=0)
+            count += len(idx)
+
+            # Next difficulty, with FSRS-4.5 mean reversion to w4 (the first-"good" difficulty)
+            moved = d - w[6] * (g - 3)
+            new_d = w[7] * w[4] + (1 - w[7]) * moved
+            dnew_d = ((1 - w[7]) * (dd - (g - 3)[:, None] * eye[6]) + w[7] * eye[4]
+                      + (w[4] - moved)[:, None] * eye[7])
+            dnew_d *= ((new_d > 1) & (new_d < 10))[:, None]
+            new_d = np.clip(new_d, 1, 10)
+
+            # Stability after a recall
+            hard, easy = g == 2, g == 4
+            c = np.exp(w[8]) * (11 - d) * s ** -w[9] * np.where(hard, w[15], 1) * np.where(easy, w[16], 1)
+            dc = c[:, None] * (eye[8] - dd / (11 - d)[:, None] - (w[9] / s)[:, None] * ds
+                               - np.log(s)[:, None] * eye[9]
+                               + hard[:, None] * eye[15] / w[15] + easy[:, None] * eye[16] / w[16])
+            ex = np.exp(w[10] * (1 - r))
+            dex = ex[:, None] * (-w[10] * dr + (1 - r)[:, None] * eye[10])
+            growth = c * (ex - 1)
+            s_recall = s * (1 + growth)
+            ds_recall = ds * (1 + growth)[:, None] + s[:, None] * (dc * (ex - 1)[:, None] + c[:, None] * dex)
+
+            # Stability after a lapse, never above the old stability
+            q = (s + 1) ** w[13]
+            s_lapse = w[11] * d ** -w[12] * (q - 1) * np.exp(w[14] * (1 - r))
+            ds_lapse = s_lapse[:, None] * (
+                eye[11] / w[11] - (w[12] / d)[:, None] * dd - np.log(d)[:, None] * eye[12]
+                + (q / (q - 1))[:, None] * ((w[13] / (s + 1))[:, None] * ds + np.log(s + 1)[:, None] * eye[13])
+                - w[14] * dr + (1 - r)[:, None] * eye[14]
+            )
+            capped = s_lapse >= s
+            s_lapse = np.where(capped, s, s_lapse)
+            ds_lapse = np.where(capped[:, None], ds, ds_lapse)
+
+            lapsed = (g == 1)[:, None]
+            S[idx] = np.maximum(np.where(g == 1, s_lapse, s_recall), 0.01)
+            dS[idx] = np.where(lapsed, ds_lapse, ds_recall)
+            D[idx] = new_d
+            dD[idx] = dnew_d
+
+        return loss, grad, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit FSRS scheduler weights to the review log")
+    parser.add_argument('--db', default='lineup_pro.db')
+    parser.add_argument('--store', default='default')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--min-reviews', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from data.database import DatabaseManager
+    db = DatabaseManager(args.db, store_id=args.store)
+    db.initialize()
+    try:
+        result = FSRSOptimizer(epochs=args.epochs).tune(db, min_reviews=args.min_reviews)
+        if result:
+            print(f"Log loss {result.log_loss_before:.4f} -> {result.log_loss_after:.4f} "
+                  f"on {result.reviews} reviews")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
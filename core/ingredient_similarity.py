@@ -0,0 +1,137 @@
+"""
+Ingredient inverted index and MinHash / LSH similarity between dishes.
+
+Each dish is a set of ingredient keys. The inverted index maps a key to
+the dishes containing it. For similarity, every dish gets a MinHash
+signature: for each of `num_perm` hash functions, the smallest hash of
+its ingredients. Two signatures agree in a position with probability
+equal to the Jaccard similarity of the sets. Signatures are cut into
+`bands` bands; dishes whose band values collide anywhere become candidates,
+are ranked by how many bands collide, and the best are re-scored by exact
+Jaccard. Ingredient keys repeat across a menu, so each key's hashes are
+computed once and a dish's signature is the element-wise minimum of its
+keys' rows.
+
+Confusable dishes usually share only a few ingredients (the two burgers
+in the seed deck have Jaccard 0.23), so the default of 64 bands of 2 rows
+makes dishes around 0.15 and above likely candidates.
+"""
+
+import random
+import zlib
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+_PRIME = (1 << 61) - 1
+
+
+class IngredientIndex:
+    """Inverted index and LSH buckets over the ingredient sets of dishes"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 64, rerank: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Candidates re-scored exactly per query, at least 4 * k
+        self.rerank = rerank
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(num_perm)]
+        self._key_hashes: Dict[str, Tuple[int, ...]] = {}
+
+        self.postings: Dict[str, Set[str]] = {}
+        self.ingredients: Dict[str, FrozenSet[str]] = {}
+        self._band_keys: Dict[str, List[Tuple[int, ...]]] = {}
+        self._buckets: Dict[Tuple[int, ...], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ingredients)
+
+    def __contains__(self, dish_id: str) -> bool:
+        return dish_id in self.ingredients
+
+    def signature(self, keys: Iterable[str]) -> Tuple[int, ...]:
+        """MinHash signature of an ingredient set (empty for an empty set)"""
+        rows = [self._hashes(key) for key in set(keys)]
+        if not rows:
+            return ()
+        return tuple(map(min, *rows)) if len(rows) > 1 else rows[0]
+
+    def _hashes(self, key: str) -> Tuple[int, ...]:
+        hashes = self._key_hashes.get(key)
+        if hashes is None:
+            x = zlib.crc32(key.encode('utf-8'))
+            hashes = self._key_hashes[key] = tuple((a * x + b) % _PRIME for a, b in self._perms)
+        return hashes
+
+    def add(self, dish_id: str, keys: Iterable[str]):
+        """Index a dish, replacing any previous ingredients it had"""
+        if dish_id in self.ingredients:
+            self.remove(dish_id)
+
+        keys = frozenset(keys)
+        self.ingredients[dish_id] = keys
+        for key in keys:
+            self.postings.setdefault(key, set()).add(dish_id)
+
+        signature = self.signature(keys)
+        band_keys = [
+            (band,) + signature[band * self.rows:(band + 1) * self.rows]
+            for band in range(self.bands)
+        ] if signature else []
+        self._band_keys[dish_id] = band_keys
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, set()).add(dish_id)
+
+    def remove(self, dish_id: str):
+        """Drop a dish from the index; unknown IDs are ignored"""
+        keys = self.ingredients.pop(dish_id, None)
+        if keys is None:
+            return
+        for key in keys:
+            _discard(self.postings, key, dish_id)
+        for band_key in self._band_keys.pop(dish_id):
+            _discard(self._buckets, band_key, dish_id)
+
+    def containing(self, *keys: str) -> Set[str]:
+        """Dishes containing every one of the given ingredient keys"""
+        if not keys:
+            return set()
+        postings = sorted((self.postings.get(key, set()) for key in keys), key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def similar(self, dish_id: str, k: int = 5, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """Up to `k` other dishes most likely to be confused with `dish_id`, as (id, Jaccard).
+
+        Only LSH candidates are considered, so dishes far below the band
+        threshold may be missed; results are ordered by similarity, then ID.
+        """
+        keys = self.ingredients.get(dish_id)
+        if not keys:
+            return []
+
+        collisions = Counter()
+        for band_key in self._band_keys[dish_id]:
+            collisions.update(self._buckets[band_key])
+        del collisions[dish_id]
+
+        # Re-score the candidates sharing the most bands exactly
+        scored = []
+        for candidate, _ in collisions.most_common(max(4 * k, self.rerank)):
+            other = self.ingredients[candidate]
+            shared = len(keys & other)
+            similarity = shared / (len(keys) + len(other) - shared)
+            if similarity >= min_similarity:
+                scored.append((-similarity, candidate))
+        scored.sort()
+        return [(candidate, -negated) for negated, candidate in scored[:k]]
+
+
+def _discard(index: Dict, key, dish_id: str):
+    members = index.get(key)
+    if members is not None:
+        members.discard(dish_id)
+        if not members:
+            del index[key]
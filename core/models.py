@@ -91,17 +91,17 @@ class Flashcard:
     mastery_level: float = 0.0  # 0.0 to 1.0
 
     def to_dict(self):
-        """Convert to dictionary for SQLite storage"""
+        """Convert to dictionary (lists are kept as lists)"""
         return {
             'id': self.id,
             'dish_name': self.dish_name,
             'dish_name_translation_key': self.dish_name_translation_key,
             'dish_image': self.dish_image,
-            'ingredients': ','.join(self.ingredients),
-            'ingredients_translation_keys': ','.join(self.ingredients_translation_keys),
+            'ingredients': list(self.ingredients),
+            'ingredients_translation_keys': list(self.ingredients_translation_keys),
             'difficulty': self.difficulty,
             'category': self.category,
-            'assembly_tips': ','.join(self.assembly_tips),
+            'assembly_tips': list(self.assembly_tips),
             'created_at': self.created_at.isoformat(),
             'times_reviewed': self.times_reviewed,
             'mastery_level': self.mastery_level
@@ -115,11 +115,11 @@ class Flashcard:
             dish_name=data['dish_name'],
             dish_name_translation_key=data['dish_name_translation_key'],
             dish_image=data['dish_image'],
-            ingredients=data['ingredients'].split(','),
-            ingredients_translation_keys=data['ingredients_translation_keys'].split(','),
+            ingredients=list(data['ingredients']),
+            ingredients_translation_keys=list(data['ingredients_translation_keys']),
             difficulty=data['difficulty'],
             category=data['category'],
-            assembly_tips=data['assembly_tips'].split(','),
+            assembly_tips=list(data['assembly_tips']),
             created_at=datetime.fromisoformat(data['created_at']),
             times_reviewed=data['times_reviewed'],
             mastery_level=data['mastery_level']
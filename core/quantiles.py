@@ -0,0 +1,141 @@
+"""
+KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+Keeps a bounded sample of a stream in levels of compactors: items at level
+h stand for 2**h original values. When the sketch is full, a level is
+sorted and every other item promoted, so memory stays around k / (1 - c)
+items however many values are added. Sketches of the same metric merge
+by concatenating levels, which is how per-device sketches are combined.
+Rank and quantile queries have error about 1.7 / k with high probability.
+"""
+
+import json
+import math
+import random
+from typing import Iterable, List, Optional
+
+_rng = random.Random()
+
+
+class KLLSketch:
+    """Mergeable streaming quantile sketch of float values"""
+
+    def __init__(self, k: int = 200, c: float = 2 / 3):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactors: List[List[float]] = []
+        self.max_size = 0
+        self.size = 0
+        self._grow()
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def update(self, value: float):
+        """Add one value"""
+        self.compactors[0].append(value)
+        self.n += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def update_many(self, values: Iterable[float]):
+        for value in values:
+            self.update(value)
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            compactor = self.compactors[level]
+            if len(compactor) < self._capacity(level):
+                continue
+            if level + 1 >= len(self.compactors):
+                self._grow()
+
+            # Promote every other item; an odd one out stays so total weight is exact
+            compactor.sort()
+            leftover = [compactor.pop()] if len(compactor) % 2 else []
+            self.compactors[level + 1].extend(compactor[_rng.randint(0, 1)::2])
+            self.compactors[level] = leftover
+
+            self.size = sum(len(c) for c in self.compactors)
+            if self.size < self.max_size:
+                break
+
+    def merge(self, other: 'KLLSketch'):
+        """Fold another sketch of the same metric into this one"""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self.size = sum(len(c) for c in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def _weighted(self) -> List[tuple]:
+        return sorted(
+            (value, 1 << level)
+            for level, compactor in enumerate(self.compactors)
+            for value in compactor
+        )
+
+    def rank(self, value: float) -> float:
+        """Approximate fraction of values <= `value`"""
+        if not self.n:
+            return 0.0
+        weight = sum(1 << level for level, compactor in enumerate(self.compactors)
+                     for item in compactor if item <= value)
+        return weight / self.n
+
+    def quantiles(self, fractions: Iterable[float]) -> List[Optional[float]]:
+        """Approximate values at the given fractions (0..1); None when empty"""
+        fractions = list(fractions)
+        if not self.n:
+            return [None] * len(fractions)
+
+        items = self._weighted()
+        results = []
+        for fraction in fractions:
+            target = fraction * self.n
+            cumulative = 0
+            result = items[-1][0]
+            for value, weight in items:
+                cumulative += weight
+                if cumulative >= target:
+                    result = value
+                    break
+            results.append(result)
+        return results
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        return self.quantiles([fraction])[0]
+
+    def to_json(self) -> str:
+        return json.dumps({'k': self.k, 'c': self.c, 'n': self.n, 'compactors': self.compactors})
+
+    @classmethod
+    def from_json(cls, text: str) -> 'KLLSketch':
+        data = json.loads(text)
+        sketch = cls(k=data['k'], c=data['c'])
+        for _ in range(len(data['compactors']) - 1):
+            sketch._grow()
+        sketch.compactors = [list(c) for c in data['compactors']]
+        sketch.n = data['n']
+        sketch.size = sum(len(c) for c in sketch.compactors)
+        return sketch
+
+    @classmethod
+    def merged(cls, sketches: Iterable['KLLSketch']) -> 'KLLSketch':
+        """Merge any number of sketches into a new one"""
+        result = None
+        for sketch in sketches:
+            if result is None:
+                result = cls(k=sketch.k, c=sketch.c)
+            result.merge(sketch)
+        return result if result is not None else cls()
@@ -1,24 +1,63 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import json
 
 from core.models import *
+from core.trends import TrendAccumulator
+
+@dataclass(frozen=True)
+class ScoringPlan:
+    """What scoring needs from a template, compiled once per template version"""
+    template_id: str
+    version: Optional[str]
+    step_count: int
+    total_time_target: int
+
+    @classmethod
+    def compile(cls, template: SandwichTemplate, version: Optional[str] = None) -> 'ScoringPlan':
+        return cls(
+            template_id=template.id,
+            version=version,
+            step_count=len(template.steps),
+            total_time_target=template.total_time_target
+        )
 
 class ScoringSystem:
     """Calculates scores and tracks performance"""
 
-    def __init__(self):
+    def __init__(self, template_store=None):
         self.base_points_per_step = 10
         self.time_bonus_factor = 2.0
         self.accuracy_weight = 0.7
         self.speed_weight = 0.3
 
+        # Anything with get_template(template_id), normally the DatabaseManager
+        self.template_store = template_store
+        self._plans: Dict[str, ScoringPlan] = {}
+
+    def get_plan(self, template_id: str) -> Optional[ScoringPlan]:
+        """Return the compiled plan for a template, rebuilding it when the template changed"""
+        version = getattr(self.template_store, 'template_version', None)
+
+        plan = self._plans.get(template_id)
+        if plan is not None and plan.version == version:
+            return plan
+
+        template = self._get_template_by_id(template_id)
+        if not template:
+            self._plans.pop(template_id, None)
+            return None
+
+        plan = ScoringPlan.compile(template, version)
+        self._plans[template_id] = plan
+        return plan
+
     def calculate_session_score(self, session: TrainingSession) -> Dict:
         """Calculate comprehensive score for a training session"""
 
-        # Get template for reference
-        # This would come from database in real implementation
-        template = self._get_template_by_id(session.template_id)
+        # Get the compiled template plan
+        template = self.get_plan(session.template_id)
 
         if not template:
             return {
@@ -70,12 +109,12 @@ class ScoringSystem:
             'passed': final_score >= 70
         }
 
-    def _calculate_accuracy(self, session: TrainingSession, template: SandwichTemplate) -> float:
+    def _calculate_accuracy(self, session: TrainingSession, template: ScoringPlan) -> float:
         """Calculate accuracy score (0-1)"""
         if not session.completed_steps:
             return 0.0
 
-        total_steps = len(template.steps)
+        total_steps = template.step_count
         completed_correctly = len(session.completed_steps)
 
         # Check for critical errors
@@ -95,7 +134,7 @@ class ScoringSystem:
 
         return final_accuracy
 
-    def _calculate_speed(self, session: TrainingSession, template: SandwichTemplate) -> float:
+    def _calculate_speed(self, session: TrainingSession, template: ScoringPlan) -> float:
         """Calculate speed score (0-1)"""
         if not session.start_time or not session.end_time:
             return 0.0
@@ -161,24 +200,30 @@ class ScoringSystem:
 
         return " ".join(feedback_parts)
 
-    def _get_template_by_id(self, template_id: str):
-        """Helper to get template - would connect to database"""
-        # Placeholder - in real app, this would query the database
-        return None
+    def _get_template_by_id(self, template_id: str) -> Optional[SandwichTemplate]:
+        """Look up a template in the template store"""
+        if self.template_store is None:
+            return None
+        return self.template_store.get_template(template_id)
+
+    def analyze_performance_trends(self, user_id: str, sessions: List[TrainingSession],
+                                   rollup: Dict = None) -> Dict:
+        """Analyze performance trends over time
 
-    def analyze_performance_trends(self, user_id: str, sessions: List[TrainingSession]) -> Dict:
-        """Analyze performance trends over time"""
+        `rollup` holds the totals of older sessions that were rolled up by
+        retention (see DatabaseManager.get_session_rollup); they count towards
+        the averages and error types but not the recent trend.
+        """
         if not sessions:
             return {}
 
-        # Calculate averages
-        scores = [s.score for s in sessions]
-        accuracies = [s.accuracy for s in sessions]
-        speeds = [s.speed for s in sessions]
+        rollup = rollup or {}
+        total_sessions = len(sessions) + (rollup.get('sessions') or 0)
 
-        avg_score = sum(scores) / len(scores)
-        avg_accuracy = sum(accuracies) / len(accuracies)
-        avg_speed = sum(speeds) / len(speeds)
+        # Calculate averages
+        avg_score = (sum(s.score for s in sessions) + (rollup.get('score_sum') or 0.0)) / total_sessions
+        avg_accuracy = (sum(s.accuracy for s in sessions) + (rollup.get('accuracy_sum') or 0.0)) / total_sessions
+        avg_speed = (sum(s.speed for s in sessions) + (rollup.get('speed_sum') or 0.0)) / total_sessions
 
         # Identify trends
         recent_sessions = sessions[-5:] if len(sessions) >= 5 else sessions
@@ -187,7 +232,7 @@ class ScoringSystem:
         trend = "improving" if recent_avg > avg_score else "declining" if recent_avg < avg_score else "stable"
 
         # Identify weakest areas
-        error_types = {}
+        error_types = dict(rollup.get('error_counts') or {})
         for session in sessions:
             for error in session.errors:
                 error_type = error.get('type', 'unknown')
@@ -199,7 +244,35 @@ class ScoringSystem:
             'average_score': avg_score,
             'average_accuracy': avg_accuracy,
             'average_speed': avg_speed,
-            'total_sessions': len(sessions),
+            'total_sessions': total_sessions,
+            'performance_trend': trend,
+            'common_errors': common_errors,
+            'recommendations': self._generate_recommendations(common_errors)
+        }
+
+    def summarize_trends(self, accumulator: TrendAccumulator) -> Dict:
+        """Performance trends from a user's TrendAccumulator, without loading history
+
+        Same keys as analyze_performance_trends, plus the variance of each metric.
+        """
+        if not accumulator or not accumulator.total_sessions:
+            return {}
+
+        avg_score = accumulator.score.mean
+        recent = accumulator.recent_scores
+        recent_avg = sum(recent) / len(recent) if recent else avg_score
+
+        trend = "improving" if recent_avg > avg_score else "declining" if recent_avg < avg_score else "stable"
+        common_errors = accumulator.error_counts.most_common(3)
+
+        return {
+            'average_score': avg_score,
+            'average_accuracy': accumulator.accuracy.mean,
+            'average_speed': accumulator.speed.mean,
+            'score_variance': accumulator.score.variance,
+            'accuracy_variance': accumulator.accuracy.variance,
+            'speed_variance': accumulator.speed.variance,
+            'total_sessions': accumulator.total_sessions,
             'performance_trend': trend,
             'common_errors': common_errors,
             'recommendations': self._generate_recommendations(common_errors)
@@ -0,0 +1,131 @@
+"""
+FSRS spaced-repetition scheduling for flashcards.
+
+Each (user, flashcard) pair carries a memory state: stability (days until
+recall probability falls to 90%), difficulty (1-10), the due time and the
+last interval. A review updates the state with the FSRS-4.5 formulas and
+schedules the card when predicted recall drops to the desired retention.
+Failed cards come back after a short relearning step.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Optional, Sequence
+
+# FSRS-4.5 default parameters (w0..w16)
+DEFAULT_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1  # 19/81, so that R(t = S) = 0.9
+
+
+class Rating(IntEnum):
+    AGAIN = 1
+    HARD = 2
+    GOOD = 3
+    EASY = 4
+
+
+@dataclass(frozen=True)
+class ReviewState:
+    """Memory state of one card for one user"""
+    stability: float
+    difficulty: float
+    due_at: datetime
+    interval_days: float
+    reps: int
+    lapses: int
+    last_review: datetime
+
+
+def forgetting_curve(elapsed_days: float, stability: float) -> float:
+    """Probability of recall after `elapsed_days` for a memory of the given stability"""
+    return (1 + FACTOR * max(0.0, elapsed_days) / stability) ** DECAY
+
+
+class FSRS:
+    """Computes the next ReviewState from the current one and a rating"""
+
+    def __init__(self, weights: Sequence[float] = DEFAULT_WEIGHTS, desired_retention: float = 0.9,
+                 maximum_interval: int = 36500, relearn_minutes: int = 10):
+        self.w = tuple(weights)
+        self.desired_retention = desired_retention
+        self.maximum_interval = maximum_interval
+        self.relearn_minutes = relearn_minutes
+
+    def retrievability(self, state: ReviewState, now: datetime) -> float:
+        elapsed = (now - state.last_review).total_seconds() / 86400
+        return forgetting_curve(elapsed, state.stability)
+
+    def review(self, state: Optional[ReviewState], rating: Rating, now: datetime = None) -> ReviewState:
+        """Apply a review; `state` is None for a card the user has never reviewed"""
+        now = now or datetime.now()
+        rating = Rating(rating)
+
+        if state is None or state.reps == 0:
+            stability = self.initial_stability(rating)
+            difficulty = self.initial_difficulty(rating)
+            lapses = 0
+        else:
+            r = self.retrievability(state, now)
+            difficulty = self.next_difficulty(state.difficulty, rating)
+            if rating == Rating.AGAIN:
+                stability = self.forget_stability(state.difficulty, state.stability, r)
+                lapses = state.lapses + 1
+            else:
+                stability = self.recall_stability(state.difficulty, state.stability, r, rating)
+                lapses = state.lapses
+
+        if rating == Rating.AGAIN:
+            interval_days = self.relearn_minutes / 1440
+        else:
+            interval_days = self.next_interval(stability)
+
+        return ReviewState(
+            stability=stability,
+            difficulty=difficulty,
+            due_at=now + timedelta(days=interval_days),
+            interval_days=interval_days,
+            reps=(state.reps if state else 0) + 1,
+            lapses=lapses,
+            last_review=now,
+        )
+
+    def next_interval(self, stability: float) -> float:
+        """Whole days until recall probability falls to desired_retention"""
+        interval = stability / FACTOR * (self.desired_retention ** (1 / DECAY) - 1)
+        return float(min(max(1, round(interval)), self.maximum_interval))
+
+    def initial_stability(self, rating: Rating) -> float:
+        return max(self.w[rating - 1], 0.1)
+
+    def initial_difficulty(self, rating: Rating) -> float:
+        return _clamp(self.w[4] - (rating - 3) * self.w[5])
+
+    def next_difficulty(self, difficulty: float, rating: Rating) -> float:
+        updated = difficulty - self.w[6] * (rating - 3)
+        # FSRS-4.5 mean reversion towards w4, the difficulty of a first "good"
+        return _clamp(self.w[7] * self.w[4] + (1 - self.w[7]) * updated)
+
+    def recall_stability(self, difficulty: float, stability: float, r: float, rating: Rating) -> float:
+        w = self.w
+        hard_penalty = w[15] if rating == Rating.HARD else 1.0
+        easy_bonus = w[16] if rating == Rating.EASY else 1.0
+        return stability * (
+            1 + math.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+            * (math.exp(w[10] * (1 - r)) - 1) * hard_penalty * easy_bonus
+        )
+
+    def forget_stability(self, difficulty: float, stability: float, r: float) -> float:
+        w = self.w
+        forgotten = w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * math.exp(w[14] * (1 - r))
+        return min(forgotten, stability)
+
+
+def _clamp(difficulty: float) -> float:
+    return min(max(difficulty, 1.0), 10.0)
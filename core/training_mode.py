@@ -36,7 +36,7 @@ class TrainingSessionManager:
         )
 
         # Get template from database
-        self.template = self.app.db.get_template(template_id)
+        self.template = self.app.database.get_template(template_id)
 
         if not self.template:
             raise ValueError(f"Template not found: {template_id}")
@@ -82,7 +82,8 @@ class TrainingSessionManager:
 
         # Calculate score if completed
         if completed:
-            scoring_system = ScoringSystem()
+            # Shared instance keeps compiled template plans across sessions
+            scoring_system = getattr(self.app, 'scoring_system', None) or ScoringSystem(self.app.database)
             score_result = scoring_system.calculate_session_score(self.session)
 
             # Update session with scores
@@ -91,6 +92,6 @@ class TrainingSessionManager:
             self.session.speed = score_result['speed']
 
             # Save to database
-            self.app.db.save_session(self.session)
+            self.app.database.save_session(self.session)
 
         return self.session
@@ -0,0 +1,112 @@
+"""
+Incremental performance-trend statistics.
+
+A TrendAccumulator holds everything analyze_performance_trends derives
+from a user's history (running means and variances via Welford's method,
+the last few scores and error type counts) and is updated in O(1) per
+session, so trends can be read without loading the history.
+"""
+
+import json
+from collections import Counter, deque
+from typing import Dict, Iterable, List
+
+from core.models import TrainingSession
+
+RECENT_SIZE = 5
+
+
+class RunningStats:
+    """Welford running mean and variance of one metric"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, count: int, mean: float, m2: float = 0.0):
+        """Fold in a group of values summarized by count, mean and M2 (Chan et al.)"""
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        """Population variance"""
+        return self.m2 / self.count if self.count else 0.0
+
+
+class TrendAccumulator:
+    """Per-user trend state: metric stats, recent scores and error counts"""
+
+    def __init__(self):
+        self.score = RunningStats()
+        self.accuracy = RunningStats()
+        self.speed = RunningStats()
+        self.recent_scores = deque(maxlen=RECENT_SIZE)
+        self.error_counts = Counter()
+
+    @property
+    def total_sessions(self) -> int:
+        return self.score.count
+
+    def add(self, score: float, accuracy: float, speed: float, errors: List[Dict]):
+        """Account for one finished session given its metrics and errors"""
+        self.score.add(score)
+        self.accuracy.add(accuracy)
+        self.speed.add(speed)
+        self.recent_scores.append(score)
+        for error in errors:
+            self.error_counts[error.get('type', 'unknown')] += 1
+
+    def add_session(self, session: TrainingSession):
+        self.add(session.score, session.accuracy, session.speed, session.errors)
+
+    def add_sessions(self, sessions: Iterable[TrainingSession]):
+        for session in sessions:
+            self.add_session(session)
+
+    def add_rollup(self, sessions: int, score_sum: float, accuracy_sum: float, speed_sum: float,
+                   error_counts: Dict[str, int] = None):
+        """Fold in sessions known only by their totals (retention rollups).
+
+        Their spread is unknown, so they add to the means but not to M2.
+        """
+        if not sessions:
+            return
+        self.score.merge(sessions, score_sum / sessions)
+        self.accuracy.merge(sessions, accuracy_sum / sessions)
+        self.speed.merge(sessions, speed_sum / sessions)
+        self.error_counts.update(error_counts or {})
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'score': [self.score.count, self.score.mean, self.score.m2],
+            'accuracy': [self.accuracy.count, self.accuracy.mean, self.accuracy.m2],
+            'speed': [self.speed.count, self.speed.mean, self.speed.m2],
+            'recent_scores': list(self.recent_scores),
+            'error_counts': dict(self.error_counts),
+        })
+
+    @classmethod
+    def from_json(cls, text: str) -> 'TrendAccumulator':
+        data = json.loads(text)
+        accumulator = cls()
+        accumulator.score = RunningStats(*data['score'])
+        accumulator.accuracy = RunningStats(*data['accuracy'])
+        accumulator.speed = RunningStats(*data['speed'])
+        accumulator.recent_scores.extend(data['recent_scores'])
+        accumulator.error_counts.update(data['error_counts'])
+        return accumulator
@@ -0,0 +1,135 @@
+"""
+Scheduled online backups of the SQLite database.
+
+Backups use the sqlite3 online backup API a few pages at a time on a
+background thread, sleeping briefly between steps so the UI thread and
+the writer are never starved. A finished copy is promoted (renamed into
+place) only after PRAGMA quick_check passes, and old copies are rotated.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackupScheduler:
+    """Runs a backup every `interval_hours` and keeps the newest `keep` copies"""
+
+    FILE_PREFIX = "lineup_pro_"
+    FILE_SUFFIX = ".db"
+
+    def __init__(self, db_path: str, backup_dir: str = "backups/", interval_hours: float = 24,
+                 keep: int = 7, pages_per_step: int = 64, step_pause: float = 0.005):
+        self.db_path = db_path
+        self.backup_dir = Path(backup_dir)
+        self.interval_hours = interval_hours
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._backup_lock = threading.Lock()
+
+    def start(self):
+        """Start the background scheduler thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lineup-backup', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop the scheduler; an in-progress backup is abandoned"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def list_backups(self) -> List[Path]:
+        """Promoted backups, oldest first"""
+        if not self.backup_dir.exists():
+            return []
+        return sorted(self.backup_dir.glob(f"{self.FILE_PREFIX}*{self.FILE_SUFFIX}"))
+
+    def seconds_until_due(self) -> float:
+        """Time until the next backup is due, based on the newest backup"""
+        backups = self.list_backups()
+        if not backups:
+            return 0.0
+        age = time.time() - backups[-1].stat().st_mtime
+        return max(0.0, self.interval_hours * 3600 - age)
+
+    def _run(self):
+        while not self._stop.wait(self.seconds_until_due()):
+            try:
+                self.backup_now()
+            except Exception as e:
+                logger.error(f"Scheduled backup failed: {e}")
+                # Avoid a hot retry loop; try again after a short pause
+                if self._stop.wait(min(300, self.interval_hours * 3600)):
+                    break
+
+    def backup_now(self) -> Optional[Path]:
+        """Back up the database now; returns the promoted file, or None on failure"""
+        with self._backup_lock:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            final_path = self.backup_dir / f"{self.FILE_PREFIX}{stamp}{self.FILE_SUFFIX}"
+            tmp_path = final_path.with_name(final_path.name + '.part')
+
+            started = time.monotonic()
+            src = sqlite3.connect(self.db_path, check_same_thread=False)
+            dst = sqlite3.connect(tmp_path)
+            try:
+                # Pin one snapshot so concurrent commits do not restart the copy
+                src.execute("BEGIN")
+                src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+                src.backup(dst, pages=self.pages_per_step, progress=self._on_step)
+                src.rollback()
+
+                result = self._quick_check(dst)
+            except Exception:
+                dst.close()
+                tmp_path.unlink(missing_ok=True)
+                raise
+            finally:
+                src.close()
+            dst.close()
+
+            if result != 'ok':
+                logger.error(f"Backup failed integrity check ({result}); keeping previous backups")
+                tmp_path.unlink(missing_ok=True)
+                return None
+
+            os.replace(tmp_path, final_path)
+            self._rotate()
+
+            logger.info(f"Backup written to {final_path} in {time.monotonic() - started:.2f}s")
+            return final_path
+
+    def _quick_check(self, conn: sqlite3.Connection) -> str:
+        """Run PRAGMA quick_check on a finished copy; 'ok' when it is sound"""
+        return conn.execute("PRAGMA quick_check").fetchone()[0]
+
+    def _on_step(self, status, remaining, total):
+        """Backup progress callback: yield between page batches, abort on stop"""
+        if self._stop.is_set():
+            raise InterruptedError("Backup cancelled")
+        if remaining:
+            time.sleep(self.step_pause)
+
+    def _rotate(self):
+        """Delete promoted backups beyond the newest `keep`"""
+        backups = self.list_backups()
+        for old in backups[:max(0, len(backups) - self.keep)]:
+            try:
+                old.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove old backup {old}: {e}")
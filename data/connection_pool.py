@@ -0,0 +1,201 @@
+"""
+Process-wide SQLite connection pool.
+
+SQLite allows many concurrent readers but only one writer, so the pool keeps
+a small set of reader connections plus a single dedicated writer connection
+guarded by a lock. The database is switched to WAL mode so readers never
+block the writer (and vice versa).
+"""
+
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from typing import Dict, Optional
+import logging
+
+from data.query_profiler import QueryProfiler
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Pool of reader connections plus one writer connection for a database file"""
+
+    _pools: Dict[str, 'ConnectionPool'] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path: str, max_readers: int = 4, timeout: float = 5.0):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.timeout = timeout
+
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._dedicated = []
+        self._closed = False
+        # Managers holding this pool through shared(); the last release() closes it
+        self._users = 0
+
+        # Every open connection, so a trace callback can be (un)installed on all of them
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._trace_callback = None
+        self.profiler = QueryProfiler(self)
+
+    @classmethod
+    def shared(cls, db_path: str, **kwargs) -> 'ConnectionPool':
+        """Return the process-wide pool for a database file, creating it on first use.
+
+        Each call takes a reference; hand it back with release().
+        """
+        with cls._pools_lock:
+            pool = cls._pools.get(db_path)
+            if pool is None or pool._closed:
+                pool = cls(db_path, **kwargs)
+                cls._pools[db_path] = pool
+            pool._users += 1
+            return pool
+
+    def release(self) -> bool:
+        """Drop a reference taken by shared(); closes the pool when it was the last"""
+        with self._pools_lock:
+            self._users -= 1
+            if self._users > 0:
+                return False
+        self.close_all()
+        return True
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Open a configured connection"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # Only takes effect on a new file, and must precede the switch to WAL
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        conn.set_trace_callback(self._trace_callback)
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _close(self, conn: sqlite3.Connection):
+        conn.close()
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def set_trace_callback(self, callback):
+        """Install (or with None, remove) a statement trace callback on every connection"""
+        self._trace_callback = callback
+        with self._connections_lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.set_trace_callback(callback)
+            except sqlite3.ProgrammingError:
+                pass  # closed meanwhile
+
+    def dedicated_reader(self) -> sqlite3.Connection:
+        """Open a read-only connection owned by the caller but closed with the pool.
+
+        Used where per-connection state matters, e.g. watching PRAGMA data_version.
+        """
+        conn = self._connect(read_only=True)
+        self._dedicated.append(conn)
+        return conn
+
+    def close_dedicated(self, conn: sqlite3.Connection):
+        """Close a connection from dedicated_reader() before the pool itself closes"""
+        if conn in self._dedicated:
+            self._dedicated.remove(conn)
+        self._close(conn)
+
+    @contextmanager
+    def reader(self):
+        """Borrow a reader connection for the duration of the block"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+
+        conn = None
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                if self._reader_count < self.max_readers:
+                    conn = self._connect(read_only=True)
+                    self._reader_count += 1
+            if conn is None:
+                conn = self._readers.get(timeout=self.timeout)
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                self._close(conn)
+            else:
+                self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection; commits on success, rolls back on error.
+
+        Re-entrant within a thread: nested blocks join the outer transaction.
+        """
+        with self._writer_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            if self._writer is None:
+                self._writer = self._connect()
+
+            self._writer_depth += 1
+            try:
+                yield self._writer
+                if self._writer_depth == 1:
+                    self._writer.commit()
+            except Exception:
+                if self._writer_depth == 1:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._writer_depth -= 1
+
+    def close_all(self):
+        """Close every idle connection and the writer; busy readers close on return"""
+        with self._pools_lock:
+            if self._pools.get(self.db_path) is self:
+                del self._pools[self.db_path]
+
+        self._closed = True
+        closed = 0
+
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+            closed += 1
+
+        for conn in self._dedicated:
+            self._close(conn)
+            closed += 1
+        self._dedicated.clear()
+
+        with self._writer_lock:
+            if self._writer is not None:
+                self._close(self._writer)
+                self._writer = None
+                closed += 1
+
+        logger.info(f"Closed {closed} pooled database connections")
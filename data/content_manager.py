@@ -104,90 +104,3 @@ class ContentManager:
     def get_modules_by_difficulty(self, difficulty: int) -> List[TrainingModule]:
         """Get modules by difficulty level"""
         return [m for m in self.modules.values() if m.difficulty == difficulty]
-
-def create_flashcards_table(self):
-    """Create flashcards table"""
-    query = '''
-            CREATE TABLE IF NOT EXISTS flashcards (
-                                                      id TEXT PRIMARY KEY,
-                                                      dish_name TEXT NOT NULL,
-                                                      dish_name_translation_key TEXT NOT NULL,
-                                                      dish_image TEXT,
-                                                      ingredients TEXT NOT NULL,
-                                                      ingredients_translation_keys TEXT NOT NULL,
-                                                      difficulty TEXT CHECK(difficulty IN ('easy', 'medium', 'hard')) DEFAULT 'medium',
-                category TEXT DEFAULT 'sandwiches',
-                assembly_tips TEXT,
-                created_at TEXT NOT NULL,
-                times_reviewed INTEGER DEFAULT 0,
-                mastery_level REAL DEFAULT 0.0
-                ) \
-            '''
-    self.execute_query(query)
-
-def save_flashcard(self, flashcard):
-    """Save or update a flashcard"""
-    query = '''
-        INSERT OR REPLACE INTO flashcards 
-        (id, dish_name, dish_name_translation_key, dish_image, ingredients, 
-         ingredients_translation_keys, difficulty, category, assembly_tips, 
-         created_at, times_reviewed, mastery_level)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        '''
-    params = (
-        flashcard.id,
-        flashcard.dish_name,
-        flashcard.dish_name_translation_key,
-        flashcard.dish_image,
-        ','.join(flashcard.ingredients),
-        ','.join(flashcard.ingredients_translation_keys),
-        flashcard.difficulty,
-        flashcard.category,
-        ','.join(flashcard.assembly_tips),
-        flashcard.created_at.isoformat(),
-        flashcard.times_reviewed,
-        flashcard.mastery_level
-    )
-    self.execute_query(query, params)
-
-def get_flashcards(self, category=None, difficulty=None, limit=None):
-    """Get flashcards with optional filters"""
-    query = 'SELECT * FROM flashcards WHERE 1=1'
-    params = []
-
-    if category:
-        query += ' AND category = ?'
-        params.append(category)
-
-    if difficulty:
-        query += ' AND difficulty = ?'
-        params.append(difficulty)
-
-    query += ' ORDER BY mastery_level ASC, times_reviewed ASC'
-
-    if limit:
-        query += ' LIMIT ?'
-        params.append(limit)
-
-    results = self.execute_query(query, params, fetch=True)
-    return [Flashcard.from_dict(row) for row in results]
-
-def get_flashcard_by_id(self, flashcard_id):
-    """Get a specific flashcard by ID"""
-    query = 'SELECT * FROM flashcards WHERE id = ?'
-    result = self.execute_query(query, (flashcard_id,), fetch=True)
-    return Flashcard.from_dict(result[0]) if result else None
-
-def update_flashcard_progress(self, flashcard_id, mastered=True):
-    """Update flashcard progress after review"""
-    flashcard = self.get_flashcard_by_id(flashcard_id)
-    if flashcard:
-        flashcard.times_reviewed += 1
-        if mastered:
-            # Increase mastery (simplified algorithm)
-            flashcard.mastery_level = min(1.0, flashcard.mastery_level + 0.25)
-        else:
-            # Decrease mastery if wrong
-            flashcard.mastery_level = max(0.0, flashcard.mastery_level - 0.1)
-
-        self.save_flashcard(flashcard)
@@ -1,390 +1,669 @@
 import sqlite3
 import json
-from typing import List, Dict, Optional, Any
+import hashlib
+from itertools import zip_longest
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 from pathlib import Path
 import logging
 
 from core.models import *
+from core.quantiles import KLLSketch
+from core.spaced_repetition import FSRS, Rating, ReviewState
+from core.trends import TrendAccumulator
+from data.connection_pool import ConnectionPool
+from data.write_behind import WriteBehindQueue
+from data.template_cache import TemplateCache
+from data.flashcard_stats import FlashcardStats, FlashcardStatsCache
+from data.ingredient_index import IngredientIndexCache
+from data.jobs import JobRunner
+from data.leaderboard import DEFAULT_STORE_ID, SCHEMA_VERSION as LEADERBOARD_SCHEMA_VERSION, Leaderboard
+from data.query_profiler import profiled
+from data.migrations import LATEST_VERSION, get_schema_version, migrate
 
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "lineup_pro.db"):
+    def __init__(self, db_path: str = "lineup_pro.db", pool: ConnectionPool = None,
+                 store_id: str = DEFAULT_STORE_ID):
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        self.store_id = store_id
+        # Connections are shared process-wide; every manager for the same file
+        # borrows from the same pool instead of opening its own connection.
+        self.pool = pool or ConnectionPool.shared(db_path)
+        # A shared pool is released, not closed; a pool passed in is closed with the manager
+        self._shared_pool = pool is None
+        self._released = False
+        # Session writes are committed in batches off the caller's thread
+        self.write_queue = WriteBehindQueue(self)
+        # Compiled templates, reloaded only when template content changes
+        self.template_cache = TemplateCache(self.pool)
+        # Flashcard totals and mastery breakdowns, recomputed only after flashcards change
+        self.flashcard_stats = FlashcardStatsCache(self.pool)
+        # Ingredient lookups and confusable-dish search, updated as flashcards change
+        self.ingredient_index = IngredientIndexCache(self.pool)
+        # Opt-in query timing; see enable_profiling()
+        self.profiler = self.pool.profiler
+        # Per-template leaderboards for this store, maintained as sessions are written
+        self.leaderboard = Leaderboard(self.pool, store_id=store_id)
+        # Spaced-repetition scheduler; initialize() loads this store's fitted parameters
+        self.scheduler = FSRS()
 
     def initialize(self):
         """Initialize database with schema"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+        # Warm start: the schema is current, so no DDL and no write transaction
+        with self.pool.reader() as conn:
+            current = get_schema_version(conn)
 
-        self.create_tables()
-        self.create_indexes()
+        if current < LATEST_VERSION:
+            with self.pool.writer() as conn:
+                applied = migrate(conn)
+                if current < LEADERBOARD_SCHEMA_VERSION:
+                    self.leaderboard.rebuild(conn)
+            logger.info(f"Applied {applied} schema migrations")
 
         # Seed with universal templates if empty
         if self.is_database_empty():
             self.seed_universal_templates()
 
         self.seed_flashcards()
+        self.load_scheduler_parameters()
         print("Database initialized successfully")
 
         logger.info("Database initialized successfully")
 
-    def create_tables(self):
-        """Create all database tables"""
-
-        # Users table
-        self.cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS users (
-                                                                 id TEXT PRIMARY KEY,
-                                                                 name TEXT NOT NULL,
-                                                                 role TEXT DEFAULT 'trainee',
-                                                                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                            )
-                            ''')
-
-        # Ingredients table
-        self.cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS ingredients (
-                                                                       id TEXT PRIMARY KEY,
-                                                                       name TEXT NOT NULL,
-                                                                       type TEXT NOT NULL,
-                                                                       image_path TEXT,
-                                                                       calories INTEGER DEFAULT 0,
-                                                                       allergens TEXT DEFAULT '[]',
-                                                                       placement_zones TEXT DEFAULT '["center"]'
-                            )
-                            ''')
-
-        # Templates table (not assembly_templates)
-        self.cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS templates (
-                                                                     id TEXT PRIMARY KEY,
-                                                                     name TEXT NOT NULL,
-                                                                     station TEXT NOT NULL,
-                                                                     difficulty INTEGER DEFAULT 1,
-                                                                     total_time_target INTEGER DEFAULT 60,
-                                                                     steps TEXT NOT NULL,  -- JSON array of AssemblyStep
-                                                                     description TEXT,
-                                                                     image_path TEXT,
-                                                                     common_errors TEXT DEFAULT '[]',
-                                                                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                            )
-                            ''')
-
-        # Training sessions table
-        self.cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS training_sessions (
-                                                                             id TEXT PRIMARY KEY,
-                                                                             user_id TEXT NOT NULL,
-                                                                             template_id TEXT NOT NULL,
-                                                                             mode TEXT NOT NULL,
-                                                                             start_time TIMESTAMP NOT NULL,
-                                                                             end_time TIMESTAMP,
-                                                                             score REAL DEFAULT 0.0,
-                                                                             accuracy REAL DEFAULT 0.0,
-                                                                             speed REAL DEFAULT 0.0,
-                                                                             errors TEXT DEFAULT '[]',
-                                                                             completed_steps TEXT DEFAULT '[]',
-                                                                             FOREIGN KEY (user_id) REFERENCES users (id),
-                                FOREIGN KEY (template_id) REFERENCES templates (id)
-                                )
-                            ''')
-
-        # User progress table
-        self.cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS user_progress (
-                                                                         user_id TEXT PRIMARY KEY,
-                                                                         templates_mastered TEXT DEFAULT '{}',
-                                                                         total_sessions INTEGER DEFAULT 0,
-                                                                         average_accuracy REAL DEFAULT 0.0,
-                                                                         average_speed REAL DEFAULT 0.0,
-                                                                         skill_matrix TEXT DEFAULT '{}',
-                                                                         last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                                                         FOREIGN KEY (user_id) REFERENCES users (id)
-                                )
-                            ''')
-
-        # Flashcards table - ADDED THIS
-        self.cursor.execute('''
-                            CREATE TABLE IF NOT EXISTS flashcards (
-                                                                      id TEXT PRIMARY KEY,
-                                                                      dish_name TEXT NOT NULL,
-                                                                      dish_name_translation_key TEXT NOT NULL,
-                                                                      dish_image TEXT,
-                                                                      ingredients TEXT NOT NULL,
-                                                                      ingredients_translation_keys TEXT NOT NULL,
-                                                                      difficulty TEXT CHECK(difficulty IN ('easy', 'medium', 'hard')) DEFAULT 'medium',
-                                category TEXT DEFAULT 'sandwiches',
-                                assembly_tips TEXT,
-                                created_at TEXT NOT NULL,
-                                times_reviewed INTEGER DEFAULT 0,
-                                mastery_level REAL DEFAULT 0.0
-                                )
-                            ''')
-
-        self.conn.commit()
-
-    def create_indexes(self):
-        """Create performance indexes"""
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_sessions_user ON training_sessions(user_id)",
-            "CREATE INDEX IF NOT EXISTS idx_sessions_template ON training_sessions(template_id)",
-            "CREATE INDEX IF NOT EXISTS idx_sessions_time ON training_sessions(start_time)",
-            "CREATE INDEX IF NOT EXISTS idx_templates_station ON templates(station)",
-            "CREATE INDEX IF NOT EXISTS idx_templates_difficulty ON templates(difficulty)",
-            "CREATE INDEX IF NOT EXISTS idx_flashcards_category ON flashcards(category)",
-            "CREATE INDEX IF NOT EXISTS idx_flashcards_difficulty ON flashcards(difficulty)"
-        ]
-
-        for index_sql in indexes:
-            self.cursor.execute(index_sql)
-
-        self.conn.commit()
-
+    @profiled
     def is_database_empty(self) -> bool:
         """Check if database needs seeding"""
-        self.cursor.execute("SELECT COUNT(*) as count FROM templates")
-        result = self.cursor.fetchone()
+        with self.pool.reader() as conn:
+            result = conn.execute("SELECT COUNT(*) as count FROM templates").fetchone()
         return result['count'] == 0
 
+    @profiled
     def seed_universal_templates(self):
         """Seed database with 5 universal sandwich templates"""
         from data.seed_data import UNIVERSAL_TEMPLATES
 
-        for template in UNIVERSAL_TEMPLATES:
-            self.save_template(template)
+        with self.pool.writer():
+            for template in UNIVERSAL_TEMPLATES:
+                self.save_template(template)
 
         logger.info(f"Seeded {len(UNIVERSAL_TEMPLATES)} universal templates")
 
-    def save_template(self, template):
-        """Save a template to the database"""
+    @profiled
+    def save_template(self, template: SandwichTemplate) -> bool:
+        """Save a template, its steps and their ingredients"""
         try:
-            # Skip template saving for now to avoid JSON errors
-            print(f"Warning: Skipping template save for {template.name}")
+            with self.pool.writer() as conn:
+                ingredients = {step.ingredient.id: step.ingredient for step in template.steps}
+                conn.executemany('''
+                                 INSERT INTO ingredients (id, name, type, image_path, calories, allergens, placement_zones)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?)
+                                 ON CONFLICT(id) DO UPDATE SET
+                                     name = excluded.name, type = excluded.type, image_path = excluded.image_path,
+                                     calories = excluded.calories, allergens = excluded.allergens,
+                                     placement_zones = excluded.placement_zones
+                                 ''', [(
+                                     ingredient.id,
+                                     ingredient.name,
+                                     ingredient.type.value,
+                                     ingredient.image_path,
+                                     ingredient.calories,
+                                     json.dumps(ingredient.allergens),
+                                     json.dumps(ingredient.placement_zones)
+                                 ) for ingredient in ingredients.values()])
+
+                conn.execute('''
+                             INSERT INTO templates
+                             (id, name, station, difficulty, total_time_target, steps, description, image_path, common_errors)
+                             VALUES (?, ?, ?, ?, ?, '[]', ?, ?, ?)
+                             ON CONFLICT(id) DO UPDATE SET
+                                 name = excluded.name, station = excluded.station, difficulty = excluded.difficulty,
+                                 total_time_target = excluded.total_time_target, description = excluded.description,
+                                 image_path = excluded.image_path, common_errors = excluded.common_errors
+                             ''', (
+                                 template.id,
+                                 template.name,
+                                 template.station,
+                                 template.difficulty,
+                                 template.total_time_target,
+                                 template.description,
+                                 template.image_path,
+                                 json.dumps(list(template.common_errors))
+                             ))
+
+                conn.execute("DELETE FROM template_steps WHERE template_id = ?", (template.id,))
+                conn.executemany('''
+                                 INSERT INTO template_steps
+                                 (template_id, step_order, ingredient_id, placement, quantity, time_target, points, critical)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                 ''', [(
+                                     template.id,
+                                     step.order,
+                                     step.ingredient.id,
+                                     step.placement,
+                                     step.quantity,
+                                     step.time_target,
+                                     step.points,
+                                     int(step.critical)
+                                 ) for step in template.steps])
+
+            self.template_cache.invalidate()
             return True
-
-            # The rest of your existing code...
-        except Exception as e:
-            print(f"Error saving template: {e}")
-            import traceback
-            traceback.print_exc()
+        except sqlite3.Error as e:
+            logger.error(f"Error saving template {template.id}: {e}")
             return False
 
-    def get_template(self, template_id: str) -> Optional[SandwichTemplate]:
-        """Retrieve a template by ID"""
-        self.cursor.execute(
-            "SELECT * FROM templates WHERE id = ?",
-            (template_id,)
-        )
-        row = self.cursor.fetchone()
-
-        if not row:
-            return None
+    @property
+    def template_version(self) -> Optional[str]:
+        """Content version of the templates; changes whenever a template is edited"""
+        return self.template_cache.version
 
-        return self._row_to_template(row)
+    @profiled
+    def get_template(self, template_id: str) -> Optional[SandwichTemplate]:
+        """Retrieve a template by ID (served from the template cache)"""
+        return self.template_cache.get(template_id)
 
+    @profiled
     def get_all_templates(self, station: str = None, difficulty: int = None) -> List[SandwichTemplate]:
-        """Retrieve all templates with optional filters"""
-        query = "SELECT * FROM templates"
-        params = []
-
-        if station or difficulty:
-            query += " WHERE"
-            conditions = []
-
-            if station:
-                conditions.append("station = ?")
-                params.append(station)
-
-            if difficulty:
-                conditions.append("difficulty = ?")
-                params.append(difficulty)
-
-            query += " " + " AND ".join(conditions)
-
-        query += " ORDER BY difficulty, name"
-
-        self.cursor.execute(query, params)
-        rows = self.cursor.fetchall()
-
-        return [self._row_to_template(row) for row in rows]
-
-    def _row_to_template(self, row) -> SandwichTemplate:
-        """Convert database row to SandwichTemplate object"""
-        steps_data = json.loads(row['steps'])
-        steps = []
-
-        for step_data in steps_data:
-            # Here you would need to fetch the ingredient object
-            # For simplicity, we'll create a placeholder
-            ingredient = Ingredient(
-                id=step_data['ingredient']['id'],
-                name=step_data['ingredient']['name'],
-                type=IngredientType(step_data['ingredient']['type']),
-                image_path=step_data['ingredient']['image_path']
-            )
-
-            step = AssemblyStep(
-                order=step_data['order'],
-                ingredient=ingredient,
-                placement=step_data['placement'],
-                quantity=step_data.get('quantity', 1),
-                time_target=step_data.get('time_target', 5),
-                points=step_data.get('points', 10),
-                critical=step_data.get('critical', True)
-            )
-            steps.append(step)
-
-        return SandwichTemplate(
-            id=row['id'],
-            name=row['name'],
-            station=row['station'],
-            difficulty=row['difficulty'],
-            total_time_target=row['total_time_target'],
-            steps=steps,
-            description=row['description'],
-            image_path=row['image_path'],
-            common_errors=json.loads(row['common_errors'])
-        )
+        """Retrieve all templates with optional filters, ordered by difficulty and name"""
+        return [
+            template for template in self.template_cache.all()
+            if (not station or template.station == station)
+            and (not difficulty or template.difficulty == difficulty)
+        ]
 
     def save_session(self, session: TrainingSession):
-        """Save training session to database"""
-        self.cursor.execute('''
-                            INSERT INTO training_sessions
-                            (id, user_id, template_id, mode, start_time, end_time, score, accuracy, speed, errors, completed_steps)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                session.id,
-                                session.user_id,
-                                session.template_id,
-                                session.mode.value,
-                                session.start_time.isoformat(),
-                                session.end_time.isoformat() if session.end_time else None,
-                                session.score,
-                                session.accuracy,
-                                session.speed,
-                                json.dumps(session.errors),
-                                json.dumps(session.completed_steps)
-                            ))
-
-        # Update user progress
-        self.update_user_progress(session)
-
-        self.conn.commit()
-
-    def update_user_progress(self, session: TrainingSession):
-        """Update user progress based on session results"""
-        # Get current progress
-        self.cursor.execute(
-            "SELECT * FROM user_progress WHERE user_id = ?",
-            (session.user_id,)
-        )
-        row = self.cursor.fetchone()
-
-        if row:
-            templates_mastered = json.loads(row['templates_mastered'])
-            total_sessions = row['total_sessions'] + 1
-
-            # Update best score for this template
-            current_best = templates_mastered.get(session.template_id, 0)
-            if session.score > current_best:
-                templates_mastered[session.template_id] = session.score
-
-            # Calculate new averages
-            old_accuracy = row['average_accuracy']
-            old_speed = row['average_speed']
-            new_accuracy = (old_accuracy * (total_sessions - 1) + session.accuracy) / total_sessions
-            new_speed = (old_speed * (total_sessions - 1) + session.speed) / total_sessions
-
-            self.cursor.execute('''
-                                UPDATE user_progress
-                                SET templates_mastered = ?, total_sessions = ?, average_accuracy = ?, average_speed = ?, last_updated = CURRENT_TIMESTAMP
-                                WHERE user_id = ?
-                                ''', (
-                                    json.dumps(templates_mastered),
-                                    total_sessions,
-                                    new_accuracy,
-                                    new_speed,
-                                    session.user_id
-                                ))
-        else:
-            # First session for this user
-            templates_mastered = {session.template_id: session.score}
-            self.cursor.execute('''
-                                INSERT INTO user_progress
-                                (user_id, templates_mastered, total_sessions, average_accuracy, average_speed)
-                                VALUES (?, ?, 1, ?, ?)
-                                ''', (
-                                    session.user_id,
-                                    json.dumps(templates_mastered),
-                                    session.accuracy,
-                                    session.speed
-                                ))
-
+        """Queue a training session for writing.
+
+        Returns immediately; the write-behind thread commits sessions in
+        batches. Call flush() when the data must be on disk.
+        """
+        self.write_queue.put_session(session)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until all queued sessions are committed"""
+        return self.write_queue.flush(timeout)
+
+    @profiled
+    def write_sessions(self, sessions: List[TrainingSession]):
+        """Write a batch of sessions and their progress updates in one transaction.
+
+        The aggregates are additive, so sessions already stored are skipped
+        rather than replaced and counted twice.
+        """
+        with self.pool.writer() as conn:
+            stored = {row[0] for row in conn.execute(
+                "SELECT id FROM training_sessions WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([session.id for session in sessions]),)
+            )}
+            sessions = list({session.id: session for session in sessions if session.id not in stored}.values())
+            if not sessions:
+                return
+
+            conn.executemany('''
+                             INSERT INTO training_sessions
+                             (id, user_id, template_id, mode, start_time, end_time, score, accuracy, speed, errors, completed_steps)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                             ''', [(
+                                 session.id,
+                                 session.user_id,
+                                 session.template_id,
+                                 session.mode.value,
+                                 session.start_time.isoformat(),
+                                 session.end_time.isoformat() if session.end_time else None,
+                                 session.score,
+                                 session.accuracy,
+                                 session.speed,
+                                 json.dumps(session.errors),
+                                 json.dumps(session.completed_steps)
+                             ) for session in sessions])
+
+            # Update user progress in the same transaction
+            self.update_user_progress(sessions)
+            self.update_user_trends(sessions)
+            self.update_template_sketches(sessions)
+            leaderboard_rows = self.leaderboard.record(conn, sessions)
+
+        self.leaderboard.apply(leaderboard_rows)
+
+    @profiled
+    def update_user_progress(self, sessions: List[TrainingSession]):
+        """Update user progress based on session results.
+
+        Aggregates are maintained with UPSERTs: per-(user, template) best
+        scores use MAX(), per-user running averages are folded in SQL, so the
+        cost does not depend on how many templates a user has practiced.
+        """
+        if isinstance(sessions, TrainingSession):
+            sessions = [sessions]
+
+        users = {}
+        templates = {}
+        for session in sessions:
+            user = users.setdefault(session.user_id, [0, 0.0, 0.0])
+            user[0] += 1
+            user[1] += session.accuracy
+            user[2] += session.speed
+
+            key = (session.user_id, session.template_id)
+            template = templates.setdefault(key, [0, session.score])
+            template[0] += 1
+            template[1] = max(template[1], session.score)
+
+        with self.pool.writer() as conn:
+            conn.executemany('''
+                             INSERT INTO user_progress (user_id, total_sessions, average_accuracy, average_speed)
+                             VALUES (?, ?, ?, ?)
+                             ON CONFLICT(user_id) DO UPDATE SET
+                                 average_accuracy = (average_accuracy * total_sessions + excluded.average_accuracy * excluded.total_sessions)
+                                                    / (total_sessions + excluded.total_sessions),
+                                 average_speed = (average_speed * total_sessions + excluded.average_speed * excluded.total_sessions)
+                                                 / (total_sessions + excluded.total_sessions),
+                                 total_sessions = total_sessions + excluded.total_sessions,
+                                 last_updated = CURRENT_TIMESTAMP
+                             ''', [
+                                 (user_id, count, accuracy / count, speed / count)
+                                 for user_id, (count, accuracy, speed) in users.items()
+                             ])
+
+            conn.executemany('''
+                             INSERT INTO user_template_progress (user_id, template_id, best_score, sessions)
+                             VALUES (?, ?, ?, ?)
+                             ON CONFLICT(user_id, template_id) DO UPDATE SET
+                                 best_score = MAX(best_score, excluded.best_score),
+                                 sessions = sessions + excluded.sessions,
+                                 last_updated = CURRENT_TIMESTAMP
+                             ''', [
+                                 (user_id, template_id, best, count)
+                                 for (user_id, template_id), (count, best) in templates.items()
+                             ])
+
+    @profiled
+    def update_user_trends(self, sessions: List[TrainingSession]):
+        """Fold finished sessions into the users' trend accumulators"""
+        by_user: Dict[str, List[TrainingSession]] = {}
+        for session in sorted(sessions, key=lambda s: (s.start_time, s.id)):
+            by_user.setdefault(session.user_id, []).append(session)
+
+        with self.pool.writer() as conn:
+            accumulators = {
+                row['user_id']: TrendAccumulator.from_json(row['state'])
+                for row in conn.execute(
+                    "SELECT user_id, state FROM user_trends WHERE user_id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(by_user)),)
+                )
+            }
+
+            for user_id, user_sessions in by_user.items():
+                accumulators.setdefault(user_id, TrendAccumulator()).add_sessions(user_sessions)
+
+            conn.executemany('''
+                             INSERT INTO user_trends (user_id, state) VALUES (?, ?)
+                             ON CONFLICT(user_id) DO UPDATE SET
+                                 state = excluded.state,
+                                 last_updated = CURRENT_TIMESTAMP
+                             ''', [(user_id, accumulators[user_id].to_json()) for user_id in by_user])
+
+    @profiled
+    def get_user_trends(self, user_id: str) -> Optional[TrendAccumulator]:
+        """Trend accumulator of a user; summarize with ScoringSystem.summarize_trends"""
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT state FROM user_trends WHERE user_id = ?", (user_id,)).fetchone()
+        return TrendAccumulator.from_json(row['state']) if row else None
+
+    # Session metrics summarized per template in template_sketches
+    SKETCH_METRICS = ('score', 'accuracy', 'speed', 'duration')
+
+    @staticmethod
+    def _session_metrics(session: TrainingSession) -> Dict[str, float]:
+        metrics = {'score': session.score, 'accuracy': session.accuracy, 'speed': session.speed}
+        if session.end_time:
+            metrics['duration'] = (session.end_time - session.start_time).total_seconds()
+        return metrics
+
+    @profiled
+    def update_template_sketches(self, sessions: List[TrainingSession]):
+        """Add finished sessions' metrics to their templates' quantile sketches"""
+        values: Dict[Tuple[str, str], List[float]] = {}
+        for session in sessions:
+            for metric, value in self._session_metrics(session).items():
+                values.setdefault((session.template_id, metric), []).append(value)
+
+        with self.pool.writer() as conn:
+            self.fold_into_sketches(conn, 'template_sketches', values)
+
+    @staticmethod
+    def fold_into_sketches(conn: sqlite3.Connection, table: str,
+                           values: Dict[Tuple[str, str], List[float]]):
+        """Merge values keyed by (template_id, metric) into the sketches stored in `table`"""
+        sketches = {
+            (row['template_id'], row['metric']): KLLSketch.from_json(row['sketch'])
+            for row in conn.execute(
+                f"SELECT template_id, metric, sketch FROM {table} "
+                f"WHERE template_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list({template_id for template_id, _ in values})),)
+            )
+        }
+
+        for key, metric_values in values.items():
+            sketches.setdefault(key, KLLSketch()).update_many(metric_values)
+
+        conn.executemany(f'''
+                         INSERT INTO {table} (template_id, metric, sketch) VALUES (?, ?, ?)
+                         ON CONFLICT(template_id, metric) DO UPDATE SET
+                             sketch = excluded.sketch,
+                             last_updated = CURRENT_TIMESTAMP
+                         ''', [(template_id, metric, sketches[template_id, metric].to_json())
+                               for template_id, metric in values])
+
+    @profiled
+    def get_template_sketch(self, template_id: str, metric: str) -> Optional[KLLSketch]:
+        """Quantile sketch of one metric over all sessions of a template"""
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT sketch FROM template_sketches WHERE template_id = ? AND metric = ?",
+                (template_id, metric)
+            ).fetchone()
+        return KLLSketch.from_json(row['sketch']) if row else None
+
+    def get_template_percentiles(self, template_id: str, metric: str,
+                                 fractions=(0.5, 0.9, 0.99)) -> Dict[float, Optional[float]]:
+        """Approximate percentiles of a metric on a template, e.g. {0.5: p50, 0.9: p90}"""
+        sketch = self.get_template_sketch(template_id, metric) or KLLSketch()
+        return dict(zip(fractions, sketch.quantiles(fractions)))
+
+    def get_percentile_rank(self, template_id: str, metric: str, value: float) -> Optional[float]:
+        """Approximate fraction of the template's sessions with `metric` <= `value`"""
+        sketch = self.get_template_sketch(template_id, metric)
+        return sketch.rank(value) if sketch else None
+
+    def rebuild_score_aggregates(self, template_ids: List[str] = None, workers: int = 1):
+        """Recompute everything derived from stored scores, e.g. after a regrade.
+
+        See JobRunner.rebuild_score_aggregates; `template_ids` limits the
+        sketch and leaderboard rebuild to the templates whose scores changed.
+        """
+        self.flush()
+        JobRunner(self, workers=workers).rebuild_score_aggregates(template_ids=template_ids)
+
+    # Metrics a regrade changes; durations come from the timestamps
+    REGRADED_METRICS = ('score', 'accuracy', 'speed')
+
+    @profiled
+    def rebuild_template_aggregates(self, template_ids: List[str] = None) -> int:
+        """Rebuild the score sketches and leaderboards of templates, one transaction each.
+
+        Sketches restart from the sketch of the template's rolled-up sessions
+        and add its stored sessions, so retention history is kept. With no
+        IDs every template with sessions or rollups is rebuilt. Returns the
+        number of templates rebuilt.
+        """
+        if template_ids is None:
+            with self.pool.reader() as conn:
+                template_ids = [row[0] for row in conn.execute('''
+                    SELECT template_id FROM training_sessions
+                    UNION SELECT template_id FROM session_rollups
+                    UNION SELECT template_id FROM template_rollup_sketches
+                ''')]
+
+        placeholders = ', '.join('?' * len(self.REGRADED_METRICS))
+        for template_id in template_ids:
+            with self.pool.writer() as conn:
+                sketches = {metric: KLLSketch() for metric in self.REGRADED_METRICS}
+                for row in conn.execute(
+                    f"SELECT metric, sketch FROM template_rollup_sketches "
+                    f"WHERE template_id = ? AND metric IN ({placeholders})",
+                    (template_id,) + self.REGRADED_METRICS
+                ):
+                    sketches[row['metric']] = KLLSketch.from_json(row['sketch'])
+                for row in conn.execute(
+                    "SELECT score, accuracy, speed FROM training_sessions WHERE template_id = ?", (template_id,)
+                ):
+                    for metric, sketch in sketches.items():
+                        sketch.update(row[metric])
+
+                conn.executemany('''
+                                 INSERT INTO template_sketches (template_id, metric, sketch) VALUES (?, ?, ?)
+                                 ON CONFLICT(template_id, metric) DO UPDATE SET
+                                     sketch = excluded.sketch,
+                                     last_updated = CURRENT_TIMESTAMP
+                                 ''', [(template_id, metric, sketch.to_json())
+                                       for metric, sketch in sketches.items() if sketch.n])
+                self.leaderboard.rebuild(conn, template_id)
+
+        logger.info(f"Rebuilt sketches and leaderboards of {len(template_ids)} templates")
+        return len(template_ids)
+
+    @profiled
     def get_user_progress(self, user_id: str) -> Optional[UserProgress]:
         """Get user progress statistics"""
-        self.cursor.execute(
-            "SELECT * FROM user_progress WHERE user_id = ?",
-            (user_id,)
-        )
-        row = self.cursor.fetchone()
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                                SELECT p.user_id, p.total_sessions, p.average_accuracy, p.average_speed,
+                                       p.skill_matrix, tp.template_id, tp.best_score
+                                FROM user_progress p
+                                         LEFT JOIN user_template_progress tp ON tp.user_id = p.user_id
+                                WHERE p.user_id = ?
+                                ''', (user_id,)).fetchall()
 
-        if not row:
+        if not rows:
             return None
 
+        row = rows[0]
+        skill_matrix = row['skill_matrix']
+
         return UserProgress(
             user_id=row['user_id'],
-            templates_mastered=json.loads(row['templates_mastered']),
+            templates_mastered={r['template_id']: r['best_score'] for r in rows if r['template_id'] is not None},
             total_sessions=row['total_sessions'],
             average_accuracy=row['average_accuracy'],
             average_speed=row['average_speed'],
-            skill_matrix=json.loads(row['skill_matrix'])
+            skill_matrix=json.loads(skill_matrix) if skill_matrix and skill_matrix != '{}' else {}
         )
 
+    @profiled
     def get_user_sessions(self, user_id: str, limit: int = 50) -> List[Dict]:
         """Get recent training sessions for a user"""
-        self.cursor.execute('''
-                            SELECT s.*, t.name as template_name
-                            FROM training_sessions s
-                                     JOIN templates t ON s.template_id = t.id
-                            WHERE s.user_id = ?
-                            ORDER BY s.start_time DESC
-                                LIMIT ?
-                            ''', (user_id, limit))
-
-        rows = self.cursor.fetchall()
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                                SELECT s.*, t.name as template_name
+                                FROM training_sessions s
+                                         JOIN templates t ON s.template_id = t.id
+                                WHERE s.user_id = ?
+                                ORDER BY s.start_time DESC, s.id DESC
+                                    LIMIT ?
+                                ''', (user_id, limit)).fetchall()
+
         return [dict(row) for row in rows]
 
-    def save_flashcard(self, flashcard: Flashcard):
-        """Save or update a flashcard"""
+    @profiled
+    def get_user_sessions_page(self, user_id: str, before: Tuple[str, str] = None,
+                               limit: int = 50) -> Tuple[List[Dict], Optional[Tuple[str, str]]]:
+        """Get one page of a user's sessions, newest first.
+
+        `before` is the cursor returned with the previous page. Returns the
+        rows and the cursor for the next page (None when exhausted). Each page
+        is an index range scan, however deep into the history it is.
+        """
         query = '''
-        INSERT OR REPLACE INTO flashcards 
-        (id, dish_name, dish_name_translation_key, dish_image, ingredients, 
-         ingredients_translation_keys, difficulty, category, assembly_tips, 
+                SELECT s.*, t.name as template_name
+                FROM training_sessions s
+                         JOIN templates t ON s.template_id = t.id
+                WHERE s.user_id = ?'''
+        params = [user_id]
+
+        if before:
+            query += ' AND (s.start_time, s.id) < (?, ?)'
+            params.extend(before)
+
+        query += ' ORDER BY s.start_time DESC, s.id DESC LIMIT ?'
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = [dict(row) for row in conn.execute(query, params)]
+
+        cursor = (rows[-1]['start_time'], rows[-1]['id']) if len(rows) == limit else None
+        return rows, cursor
+
+    @profiled
+    def get_session_rollup(self, user_id: str) -> Optional[Dict]:
+        """Totals of a user's sessions that retention has rolled up.
+
+        Returns None when nothing has been rolled up; otherwise a dict with
+        sessions, score_sum, accuracy_sum, speed_sum and error_counts.
+        """
+        with self.pool.reader() as conn:
+            row = conn.execute('''
+                               SELECT SUM(sessions) AS sessions, SUM(score_sum) AS score_sum,
+                                      SUM(accuracy_sum) AS accuracy_sum, SUM(speed_sum) AS speed_sum
+                               FROM session_rollups
+                               WHERE user_id = ?
+                               ''', (user_id,)).fetchone()
+            if not row['sessions']:
+                return None
+
+            error_counts = {
+                r['error_type']: r['count'] for r in conn.execute('''
+                    SELECT error_type, SUM(count) AS count
+                    FROM session_rollup_errors
+                    WHERE user_id = ?
+                    GROUP BY error_type
+                ''', (user_id,))
+            }
+
+        return dict(row, error_counts=error_counts)
+
+    @profiled
+    def get_meta(self, key: str, default: str = None) -> Optional[str]:
+        """Read a value from the app_meta table"""
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    @profiled
+    def set_meta(self, key: str, value: str):
+        """Write a value to the app_meta table"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                "INSERT INTO app_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    FLASHCARD_UPSERT = '''
+        INSERT INTO flashcards
+        (id, dish_name, dish_name_translation_key, dish_image, ingredients,
+         ingredients_translation_keys, difficulty, category, assembly_tips,
          created_at, times_reviewed, mastery_level)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, '', '', ?, ?, '', ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET {updates}
         '''
-        params = (
+
+    # Seed columns that define a flashcard's content. Progress columns
+    # (times_reviewed, mastery_level) and created_at are never overwritten.
+    FLASHCARD_CONTENT_COLUMNS = (
+        'dish_name', 'dish_name_translation_key', 'dish_image', 'difficulty', 'category'
+    )
+
+    @staticmethod
+    def _flashcard_row(flashcard: Flashcard) -> tuple:
+        """Parameters for FLASHCARD_UPSERT"""
+        return (
             flashcard.id,
             flashcard.dish_name,
             flashcard.dish_name_translation_key,
             flashcard.dish_image,
-            ','.join(flashcard.ingredients),
-            ','.join(flashcard.ingredients_translation_keys),
             flashcard.difficulty,
             flashcard.category,
-            ','.join(flashcard.assembly_tips),
             flashcard.created_at.isoformat(),
             flashcard.times_reviewed,
             flashcard.mastery_level
         )
-        self.cursor.execute(query, params)
-        self.conn.commit()
 
+    def _replace_flashcard_lists(self, conn: sqlite3.Connection, flashcards: List[Flashcard]):
+        """Rewrite the ingredient and tip child rows of the given flashcards"""
+        ids = json.dumps([f.id for f in flashcards])
+        conn.execute(
+            "DELETE FROM flashcard_ingredients WHERE flashcard_id IN (SELECT value FROM json_each(?))", (ids,)
+        )
+        conn.execute(
+            "DELETE FROM flashcard_tips WHERE flashcard_id IN (SELECT value FROM json_each(?))", (ids,)
+        )
+        conn.executemany(
+            "INSERT INTO flashcard_ingredients (flashcard_id, position, name, translation_key) VALUES (?, ?, ?, ?)",
+            [
+                (f.id, position, name, key)
+                for f in flashcards
+                for position, (name, key) in enumerate(
+                    zip_longest(f.ingredients, f.ingredients_translation_keys)
+                )
+            ]
+        )
+        conn.executemany(
+            "INSERT INTO flashcard_tips (flashcard_id, position, tip) VALUES (?, ?, ?)",
+            [(f.id, position, tip) for f in flashcards for position, tip in enumerate(f.assembly_tips)]
+        )
+
+    def _hydrate_flashcards(self, conn: sqlite3.Connection, rows) -> List[Flashcard]:
+        """Build Flashcard objects for a whole result set.
+
+        Child lists for all rows are fetched with one query per child table
+        and grouped in a single pass, instead of one lookup per card.
+        """
+        if not rows:
+            return []
+
+        ids = json.dumps([row['id'] for row in rows])
+        names, keys, tips = {}, {}, {}
+
+        for flashcard_id, name, key in conn.execute('''
+                SELECT flashcard_id, name, translation_key FROM flashcard_ingredients
+                WHERE flashcard_id IN (SELECT value FROM json_each(?))
+                ORDER BY flashcard_id, position
+                ''', (ids,)):
+            if name is not None:
+                names.setdefault(flashcard_id, []).append(name)
+            if key is not None:
+                keys.setdefault(flashcard_id, []).append(key)
+
+        for flashcard_id, tip in conn.execute('''
+                SELECT flashcard_id, tip FROM flashcard_tips
+                WHERE flashcard_id IN (SELECT value FROM json_each(?))
+                ORDER BY flashcard_id, position
+                ''', (ids,)):
+            tips.setdefault(flashcard_id, []).append(tip)
+
+        return [
+            Flashcard(
+                id=row['id'],
+                dish_name=row['dish_name'],
+                dish_name_translation_key=row['dish_name_translation_key'],
+                dish_image=row['dish_image'],
+                ingredients=names.get(row['id'], []),
+                ingredients_translation_keys=keys.get(row['id'], []),
+                difficulty=row['difficulty'],
+                category=row['category'],
+                assembly_tips=tips.get(row['id'], []),
+                created_at=datetime.fromisoformat(row['created_at']),
+                times_reviewed=row['times_reviewed'],
+                mastery_level=row['mastery_level']
+            )
+            for row in rows
+        ]
+
+    @profiled
+    def save_flashcard(self, flashcard: Flashcard):
+        """Save or update a flashcard"""
+        updates = ', '.join(
+            f"{c} = excluded.{c}"
+            for c in self.FLASHCARD_CONTENT_COLUMNS + ('created_at', 'times_reviewed', 'mastery_level')
+        )
+        with self.pool.writer() as conn:
+            conn.execute(self.FLASHCARD_UPSERT.format(updates=updates), self._flashcard_row(flashcard))
+            self._replace_flashcard_lists(conn, [flashcard])
+
+    @profiled
     def get_flashcards(self, category=None, difficulty=None, limit=None):
         """Get flashcards with optional filters"""
         query = 'SELECT * FROM flashcards WHERE 1=1'
@@ -398,52 +677,359 @@ class DatabaseManager:
             query += ' AND difficulty = ?'
             params.append(difficulty)
 
-        query += ' ORDER BY mastery_level ASC, times_reviewed ASC'
+        query += ' ORDER BY mastery_level ASC, times_reviewed ASC, id ASC'
 
         if limit:
             query += ' LIMIT ?'
             params.append(limit)
 
-        self.cursor.execute(query, params)
-        rows = self.cursor.fetchall()
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+            return self._hydrate_flashcards(conn, rows)
 
-        if not rows:
+    @profiled
+    def get_flashcards_page(self, category=None, difficulty=None, after: Tuple = None,
+                            limit: int = 20) -> Tuple[List[Flashcard], Optional[Tuple]]:
+        """Get one page of the review queue in get_flashcards() order.
+
+        `after` is the cursor returned with the previous page. Returns the
+        cards and the cursor for the next page (None when exhausted).
+        """
+        query = 'SELECT * FROM flashcards WHERE 1=1'
+        params = []
+
+        if category:
+            query += ' AND category = ?'
+            params.append(category)
+
+        if difficulty:
+            query += ' AND difficulty = ?'
+            params.append(difficulty)
+
+        if after:
+            query += ' AND (mastery_level, times_reviewed, id) > (?, ?, ?)'
+            params.extend(after)
+
+        query += ' ORDER BY mastery_level ASC, times_reviewed ASC, id ASC LIMIT ?'
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+            flashcards = self._hydrate_flashcards(conn, rows)
+
+        cursor = None
+        if len(flashcards) == limit:
+            last = flashcards[-1]
+            cursor = (last.mastery_level, last.times_reviewed, last.id)
+        return flashcards, cursor
+
+    @profiled
+    def get_confusable_flashcards(self, flashcard_id: str, k: int = 5) -> List[Tuple[Flashcard, float]]:
+        """Flashcards whose ingredients are most like this one's, with their Jaccard similarity"""
+        similar = self.ingredient_index.confusable(flashcard_id, k)
+        if not similar:
             return []
 
-        return [Flashcard.from_dict(dict(row)) for row in rows]
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT * FROM flashcards WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([flashcard_id for flashcard_id, _ in similar]),)
+            ).fetchall()
+            flashcards = {f.id: f for f in self._hydrate_flashcards(conn, rows)}
+        return [(flashcards[i], similarity) for i, similarity in similar if i in flashcards]
+
+    @profiled
+    def get_flashcard_stats(self) -> FlashcardStats:
+        """Totals, mastery buckets and per-category / per-difficulty breakdowns of all flashcards"""
+        return self.flashcard_stats.get()
+
+    @profiled
+    def get_flashcards_with_ingredient(self, ingredient_key: str) -> List[Flashcard]:
+        """Get all flashcards containing an ingredient, by its translation key"""
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                                SELECT f.* FROM flashcards f
+                                WHERE f.id IN (
+                                    SELECT flashcard_id FROM flashcard_ingredients WHERE translation_key = ?
+                                )
+                                ORDER BY f.dish_name
+                                ''', (ingredient_key,)).fetchall()
+            return self._hydrate_flashcards(conn, rows)
 
+    @profiled
     def get_flashcard_by_id(self, flashcard_id):
         """Get a specific flashcard by ID"""
         query = 'SELECT * FROM flashcards WHERE id = ?'
-        self.cursor.execute(query, (flashcard_id,))
-        row = self.cursor.fetchone()
-        return Flashcard.from_dict(dict(row)) if row else None
-
-    def update_flashcard_progress(self, flashcard_id, mastered=True):
-        """Update flashcard progress after review"""
-        flashcard = self.get_flashcard_by_id(flashcard_id)
-        if flashcard:
-            flashcard.times_reviewed += 1
-            if mastered:
-                # Increase mastery (simplified algorithm)
-                flashcard.mastery_level = min(1.0, flashcard.mastery_level + 0.25)
-            else:
-                # Decrease mastery if wrong
-                flashcard.mastery_level = max(0.0, flashcard.mastery_level - 0.1)
-
-            self.save_flashcard(flashcard)
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, (flashcard_id,)).fetchall()
+            flashcards = self._hydrate_flashcards(conn, rows)
+        return flashcards[0] if flashcards else None
+
+    # Increase mastery on success, decrease if wrong (simplified algorithm).
+    # Done in place so concurrent reviews cannot lose each other's updates.
+    FLASHCARD_REVIEW_UPDATE = '''
+        UPDATE flashcards
+        SET times_reviewed = times_reviewed + 1,
+            mastery_level = CASE WHEN ? THEN MIN(1.0, mastery_level + 0.25)
+                                 ELSE MAX(0.0, mastery_level - 0.1) END
+        WHERE id = ?
+        '''
+
+    @profiled
+    def update_flashcard_progress(self, flashcard_id, mastered=True) -> bool:
+        """Update flashcard progress after review; returns False for unknown IDs"""
+        with self.pool.writer() as conn:
+            cursor = conn.execute(self.FLASHCARD_REVIEW_UPDATE, (int(bool(mastered)), flashcard_id))
+        return cursor.rowcount > 0
+
+    @profiled
+    def update_flashcard_progress_batch(self, reviews: List[Tuple[str, bool]]) -> int:
+        """Record many (flashcard_id, mastered) reviews in one transaction"""
+        with self.pool.writer() as conn:
+            cursor = conn.executemany(
+                self.FLASHCARD_REVIEW_UPDATE,
+                [(int(bool(mastered)), flashcard_id) for flashcard_id, mastered in reviews]
+            )
+        return cursor.rowcount
+
+    SCHEDULE_UPSERT = '''
+        INSERT INTO flashcard_schedule
+        (user_id, flashcard_id, stability, difficulty, due_at, interval_days, reps, lapses, last_review)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, flashcard_id) DO UPDATE SET
+            stability = excluded.stability,
+            difficulty = excluded.difficulty,
+            due_at = excluded.due_at,
+            interval_days = excluded.interval_days,
+            reps = excluded.reps,
+            lapses = excluded.lapses,
+            last_review = excluded.last_review
+        '''
+
+    @staticmethod
+    def _review_state(row) -> Optional[ReviewState]:
+        """ReviewState of a flashcard_schedule row; None if never reviewed"""
+        if row is None or row['reps'] == 0:
+            return None
+        return ReviewState(
+            stability=row['stability'],
+            difficulty=row['difficulty'],
+            due_at=datetime.fromisoformat(row['due_at']),
+            interval_days=row['interval_days'],
+            reps=row['reps'],
+            lapses=row['lapses'],
+            last_review=datetime.fromisoformat(row['last_review'])
+        )
+
+    @profiled
+    def enroll_flashcards(self, user_id: str, now: datetime = None) -> int:
+        """Schedule every flashcard the user has no schedule for as due now"""
+        due_at = (now or datetime.now()).isoformat(timespec='seconds')
+        with self.pool.writer() as conn:
+            cursor = conn.execute('''
+                INSERT INTO flashcard_schedule (user_id, flashcard_id, due_at)
+                SELECT ?, f.id, ? FROM flashcards f
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM flashcard_schedule s WHERE s.user_id = ? AND s.flashcard_id = f.id
+                )
+                ''', (user_id, due_at, user_id))
+        return cursor.rowcount
+
+    @profiled
+    def get_due_flashcards(self, user_id: str, limit: int = 20, now: datetime = None,
+                           category=None, difficulty=None) -> List[Flashcard]:
+        """Cards due for review by a user, most overdue first.
+
+        Reads the (user_id, due_at) index in order, so the next card costs a
+        B-tree seek however large the deck is. Call enroll_flashcards() first
+        to bring cards the user has never seen into the schedule.
+        """
+        query = '''
+            SELECT f.* FROM flashcard_schedule s
+            JOIN flashcards f ON f.id = s.flashcard_id
+            WHERE s.user_id = ? AND s.due_at <= ?'''
+        params = [user_id, (now or datetime.now()).isoformat(timespec='seconds')]
 
+        if category:
+            query += ' AND f.category = ?'
+            params.append(category)
+
+        if difficulty:
+            query += ' AND f.difficulty = ?'
+            params.append(difficulty)
+
+        query += ' ORDER BY s.due_at LIMIT ?'
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+            return self._hydrate_flashcards(conn, rows)
+
+    @profiled
+    def get_flashcard_schedule(self, user_id: str, flashcard_id: str) -> Optional[ReviewState]:
+        """A user's memory state for a flashcard, or None if never reviewed"""
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT * FROM flashcard_schedule WHERE user_id = ? AND flashcard_id = ?",
+                (user_id, flashcard_id)
+            ).fetchone()
+        return self._review_state(row)
+
+    @profiled
+    def review_flashcard(self, user_id: str, flashcard_id: str, rating: Rating,
+                         now: datetime = None, duration_ms: int = None) -> Optional[ReviewState]:
+        """Log a review and reschedule the card; returns None for unknown IDs"""
+        now = (now or datetime.now()).replace(microsecond=0)
+        with self.pool.writer() as conn:
+            # Keep the card's overall counters in step
+            cursor = conn.execute(self.FLASHCARD_REVIEW_UPDATE, (int(rating != Rating.AGAIN), flashcard_id))
+            if cursor.rowcount == 0:
+                return None
+
+            row = conn.execute(
+                "SELECT * FROM flashcard_schedule WHERE user_id = ? AND flashcard_id = ?",
+                (user_id, flashcard_id)
+            ).fetchone()
+            previous = self._review_state(row)
+            state = self.scheduler.review(previous, rating, now)
+            conn.execute(
+                "INSERT INTO flashcard_reviews "
+                "(user_id, flashcard_id, reviewed_at, rating, elapsed_days, duration_ms, store_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, flashcard_id, int(now.timestamp()), int(rating),
+                 (now - previous.last_review).total_seconds() / 86400 if previous else None, duration_ms,
+                 self.store_id)
+            )
+            conn.execute(self.SCHEDULE_UPSERT, (
+                user_id, flashcard_id, state.stability, state.difficulty,
+                state.due_at.isoformat(timespec='seconds'), state.interval_days,
+                state.reps, state.lapses, state.last_review.isoformat(timespec='seconds')
+            ))
+        return state
+
+    @profiled
+    def load_scheduler_parameters(self) -> bool:
+        """Use this store's fitted FSRS weights, if any; returns whether they were found"""
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT weights FROM scheduler_parameters WHERE store_id = ?", (self.store_id,)
+            ).fetchone()
+        if row is None:
+            return False
+        self.scheduler = FSRS(json.loads(row['weights']))
+        return True
+
+    @profiled
+    def save_scheduler_parameters(self, weights, reviews: int, log_loss: float = None):
+        """Store fitted FSRS weights for this store and start scheduling with them"""
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT INTO scheduler_parameters (store_id, weights, reviews, log_loss) VALUES (?, ?, ?, ?)
+                ON CONFLICT(store_id) DO UPDATE SET
+                    weights = excluded.weights,
+                    reviews = excluded.reviews,
+                    log_loss = excluded.log_loss,
+                    fitted_at = CURRENT_TIMESTAMP
+            ''', (self.store_id, json.dumps([float(w) for w in weights]), reviews, log_loss))
+        self.scheduler = FSRS(weights)
+
+    @staticmethod
+    def _flashcard_content_hash(flashcard: Flashcard) -> str:
+        """Stable hash of a flashcard's seedable content"""
+        content = [
+            flashcard.id,
+            flashcard.dish_name,
+            flashcard.dish_name_translation_key,
+            flashcard.dish_image,
+            list(flashcard.ingredients),
+            list(flashcard.ingredients_translation_keys),
+            flashcard.difficulty,
+            flashcard.category,
+            list(flashcard.assembly_tips),
+        ]
+        return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    @profiled
     def seed_flashcards(self):
-        """Seed database with flashcards"""
+        """Seed database with flashcards.
+
+        A hash of the whole seed set is kept in app_meta so an unchanged seed
+        costs one lookup. Otherwise only rows whose per-row hash changed are
+        upserted, in a single transaction that preserves trainee progress.
+        """
         from data.seed_flashcards import SEED_FLASHCARDS
 
-        for flashcard in SEED_FLASHCARDS:
-            self.save_flashcard(flashcard)
+        row_hashes = {f.id: self._flashcard_content_hash(f) for f in SEED_FLASHCARDS}
+        seed_hash = hashlib.sha1(
+            json.dumps(sorted(row_hashes.items())).encode('utf-8')
+        ).hexdigest()
+
+        if self.get_meta('flashcards_seed_hash') == seed_hash:
+            logger.info("Flashcard seed unchanged, skipping")
+            return 0
+
+        updates = ', '.join(f"{c} = excluded.{c}" for c in self.FLASHCARD_CONTENT_COLUMNS)
+
+        with self.pool.writer() as conn:
+            stored = dict(conn.execute(
+                "SELECT row_id, content_hash FROM seed_hashes WHERE table_name = 'flashcards'"
+            ).fetchall())
+            existing = {row[0] for row in conn.execute("SELECT id FROM flashcards")}
+
+            changed = [
+                f for f in SEED_FLASHCARDS
+                if stored.get(f.id) != row_hashes[f.id] or f.id not in existing
+            ]
+
+            conn.executemany(
+                self.FLASHCARD_UPSERT.format(updates=updates),
+                [self._flashcard_row(f) for f in changed]
+            )
+            self._replace_flashcard_lists(conn, changed)
+            # Users already studying get new cards due now, so screens enroll only once per user
+            conn.execute('''
+                INSERT OR IGNORE INTO flashcard_schedule (user_id, flashcard_id, due_at)
+                SELECT u.user_id, f.value, ? FROM (SELECT DISTINCT user_id FROM flashcard_schedule) u,
+                     json_each(?) f
+                ''', (datetime.now().isoformat(timespec='seconds'),
+                      json.dumps([f.id for f in changed if f.id not in existing])))
+            conn.executemany(
+                "INSERT OR REPLACE INTO seed_hashes (table_name, row_id, content_hash) "
+                "VALUES ('flashcards', ?, ?)",
+                [(f.id, row_hashes[f.id]) for f in changed]
+            )
+            conn.execute(
+                "INSERT INTO app_meta (key, value) VALUES ('flashcards_seed_hash', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (seed_hash,)
+            )
+
+        logger.info(f"Seeded {len(changed)} of {len(SEED_FLASHCARDS)} flashcards")
+        return len(changed)
+
+    def enable_profiling(self, enabled: bool = True, slow_query_ms: float = None):
+        """Turn query timing and the slow-query log on or off"""
+        self.profiler.configure(enabled, slow_query_ms)
+
+    def dump_query_stats(self) -> str:
+        """Log per-query latency stats collected while profiling was on"""
+        return self.profiler.dump()
+
+    def close_all_connections(self):
+        """Flush queued writes, then release this manager's hold on the connection pool.
 
-        logger.info(f"Seeded {len(SEED_FLASHCARDS)} flashcards")
+        A shared pool is only drained once every manager using it has closed.
+        """
+        self.write_queue.stop()
+        for cache in (self.template_cache, self.flashcard_stats, self.ingredient_index):
+            cache.close()
+        if not self._shared_pool:
+            self.pool.close_all()
+        elif not self._released:
+            self._released = True
+            self.pool.release()
 
     def close(self):
         """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed")
+        self.close_all_connections()
+        logger.info("Database connection closed")
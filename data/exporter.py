@@ -0,0 +1,124 @@
+"""
+Streaming export of training history.
+
+Rows are read with fetchmany() and written to a gzip stream batch by
+batch, so memory use does not depend on how many sessions are exported.
+NDJSON lines are built by SQLite itself (json_object), which avoids
+parsing and re-serializing the JSON columns in Python.
+"""
+
+import csv
+import gzip
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_COLUMNS = (
+    'id', 'user_id', 'template_id', 'mode', 'start_time', 'end_time',
+    'score', 'accuracy', 'speed', 'errors', 'completed_steps'
+)
+
+
+class SessionExporter:
+    """Exports training_sessions to gzip-compressed NDJSON or CSV"""
+
+    FORMATS = ('ndjson', 'csv')
+
+    def __init__(self, db, export_dir: str = "exports/", batch_size: int = 1000):
+        self.db = db
+        self.export_dir = Path(export_dir)
+        self.batch_size = batch_size
+
+    def export(self, fmt: str = 'ndjson', path: str = None, start: datetime = None, end: datetime = None,
+               user_id: str = None, template_id: str = None,
+               progress: Callable[[int], None] = None) -> int:
+        """Export sessions matching the filters; returns the number of rows written.
+
+        `start` is inclusive and `end` exclusive, both compared to start_time.
+        The file is written under a temporary name and renamed when complete.
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        if path is None:
+            self.export_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = self.export_dir / f"sessions_{stamp}.{fmt}.gz"
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.part')
+
+        query, params = self._build_query(fmt, start, end, user_id, template_id)
+
+        # Queued sessions should be part of the export
+        self.db.flush()
+
+        rows_written = 0
+        try:
+            with self.db.pool.reader() as conn, \
+                    gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as out:
+                cursor = conn.execute(query, params)
+
+                if fmt == 'csv':
+                    writer = csv.writer(out)
+                    writer.writerow(SESSION_COLUMNS)
+
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+
+                    if fmt == 'csv':
+                        writer.writerows(rows)
+                    else:
+                        out.write('\n'.join(row[0] for row in rows))
+                        out.write('\n')
+
+                    rows_written += len(rows)
+                    if progress:
+                        progress(rows_written)
+
+            os.replace(tmp_path, path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        logger.info(f"Exported {rows_written} sessions to {path}")
+        return rows_written
+
+    def _build_query(self, fmt: str, start: Optional[datetime], end: Optional[datetime],
+                     user_id: Optional[str], template_id: Optional[str]):
+        """SELECT for the requested format and filters"""
+        if fmt == 'ndjson':
+            fields = ', '.join(
+                f"'{c}', json({c})" if c in ('errors', 'completed_steps') else f"'{c}', {c}"
+                for c in SESSION_COLUMNS
+            )
+            query = f"SELECT json_object({fields}) FROM training_sessions WHERE 1=1"
+        else:
+            query = f"SELECT {', '.join(SESSION_COLUMNS)} FROM training_sessions WHERE 1=1"
+
+        params = []
+
+        if start:
+            query += ' AND start_time >= ?'
+            params.append(start.isoformat())
+
+        if end:
+            query += ' AND start_time < ?'
+            params.append(end.isoformat())
+
+        if user_id:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+
+        if template_id:
+            query += ' AND template_id = ?'
+            params.append(template_id)
+
+        # Ordering by start_time alone lets the time indexes stream rows without a sort
+        query += ' ORDER BY start_time'
+        return query, params
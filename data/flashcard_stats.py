@@ -0,0 +1,137 @@
+"""
+Aggregate flashcard statistics, computed in SQL and cached.
+
+One GROUP BY over the flashcards table (answered from the category /
+difficulty queue index) yields a row per (category, difficulty) cell with
+its totals and mastery buckets; the overall and per-category and
+per-difficulty figures are sums of those cells. Results are cached until
+a flashcard is written: triggers bump a counter in app_meta on every
+insert, delete or review update of flashcards, and the cache polls PRAGMA
+data_version the same way the template cache does.
+"""
+
+import threading
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Mapping, Optional
+import logging
+
+from data.query_profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+STATS_VERSION_KEY = 'flashcard_stats_version'
+
+# Mastery buckets of reviewed cards: below LEARNING_BELOW is learning, above MASTERED_ABOVE is mastered
+LEARNING_BELOW = 0.4
+MASTERED_ABOVE = 0.7
+
+STATS_QUERY = f'''
+    SELECT category, difficulty,
+           COUNT(*) AS total,
+           SUM(times_reviewed = 0) AS new,
+           SUM(times_reviewed > 0 AND mastery_level < {LEARNING_BELOW}) AS learning,
+           SUM(times_reviewed > 0 AND mastery_level >= {LEARNING_BELOW}
+               AND mastery_level <= {MASTERED_ABOVE}) AS familiar,
+           SUM(times_reviewed > 0 AND mastery_level > {MASTERED_ABOVE}) AS mastered,
+           SUM(mastery_level) AS mastery_sum,
+           SUM(times_reviewed) AS reviews
+    FROM flashcards
+    GROUP BY category, difficulty
+'''
+
+
+@dataclass(frozen=True)
+class MasteryCounts:
+    """Card counts by mastery bucket for a group of flashcards"""
+    total: int = 0
+    new: int = 0  # never reviewed
+    learning: int = 0
+    familiar: int = 0
+    mastered: int = 0
+    mastery_sum: float = 0.0
+    reviews: int = 0
+
+    @property
+    def average_mastery(self) -> float:
+        return self.mastery_sum / self.total if self.total else 0.0
+
+    @property
+    def mastered_fraction(self) -> float:
+        return self.mastered / self.total if self.total else 0.0
+
+    def __add__(self, other: 'MasteryCounts') -> 'MasteryCounts':
+        return MasteryCounts(*(getattr(self, f.name) + getattr(other, f.name) for f in fields(self)))
+
+
+@dataclass(frozen=True)
+class FlashcardStats:
+    overall: MasteryCounts = MasteryCounts()
+    by_category: Mapping[str, MasteryCounts] = field(default_factory=lambda: MappingProxyType({}))
+    by_difficulty: Mapping[str, MasteryCounts] = field(default_factory=lambda: MappingProxyType({}))
+
+
+class FlashcardStatsCache:
+    """Read-through cache of FlashcardStats for one database"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.profiler = pool.profiler
+        self._conn = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._stats_version = None
+        self._stats: Optional[FlashcardStats] = None
+
+    def get(self) -> FlashcardStats:
+        """Current statistics, recomputed only if flashcards changed since the last call"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.pool.dedicated_reader()
+
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version and self._stats is not None:
+                return self._stats
+            self._data_version = data_version
+
+            # Read the version and the stats from one snapshot
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM app_meta WHERE key = ?", (STATS_VERSION_KEY,)
+                ).fetchone()
+                stats_version = row['value'] if row else '0'
+                if stats_version != self._stats_version or self._stats is None:
+                    self._stats = self._load(self._conn)
+                    self._stats_version = stats_version
+            finally:
+                self._conn.rollback()
+            return self._stats
+
+    def invalidate(self):
+        """Force a recompute on next access"""
+        with self._lock:
+            self._data_version = None
+            self._stats_version = None
+            self._stats = None
+
+    def close(self):
+        """Return the dedicated connection to the pool; the next access reopens it"""
+        with self._lock:
+            if self._conn is not None:
+                self.pool.close_dedicated(self._conn)
+                self._conn = None
+            self._data_version = None
+
+    @profiled(name='flashcard_stats.load')
+    def _load(self, conn) -> FlashcardStats:
+        overall = MasteryCounts()
+        by_category, by_difficulty = {}, {}
+        for row in conn.execute(STATS_QUERY):
+            cell = MasteryCounts(*(row[f.name] or 0 for f in fields(MasteryCounts)))
+            overall += cell
+            by_category[row['category']] = by_category.get(row['category'], MasteryCounts()) + cell
+            by_difficulty[row['difficulty']] = by_difficulty.get(row['difficulty'], MasteryCounts()) + cell
+
+        logger.debug(f"Computed flashcard statistics for {overall.total} cards")
+        return FlashcardStats(overall, MappingProxyType(by_category), MappingProxyType(by_difficulty))
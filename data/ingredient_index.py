@@ -0,0 +1,122 @@
+"""
+In-memory ingredient index of the flashcard deck.
+
+Keeps a core.ingredient_similarity.IngredientIndex of every flashcard's
+ingredient translation keys. It is built on first use. After that,
+triggers record the ID of every flashcard whose ingredients are written in
+flashcard_content_changes. When PRAGMA data_version shows another
+connection has committed, only the flashcards logged since the last
+refresh are re-read, and the entries applied are deleted. If entries this
+cache has not applied yet were deleted by another connection, the index is
+rebuilt from scratch.
+"""
+
+import json
+import threading
+from typing import List, Tuple
+import logging
+
+from core.ingredient_similarity import IngredientIndex
+from data.query_profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+LOAD_INGREDIENTS = '''
+    SELECT f.id, i.translation_key FROM flashcards f
+    LEFT JOIN flashcard_ingredients i ON i.flashcard_id = f.id AND i.translation_key IS NOT NULL
+    {where}
+    ORDER BY f.id
+'''
+
+
+class IngredientIndexCache:
+    """IngredientIndex over the flashcards table, kept current incrementally"""
+
+    def __init__(self, pool, **index_options):
+        self.pool = pool
+        self.profiler = pool.profiler
+        self.index_options = index_options
+        self._conn = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._seq = None  # last flashcard_content_changes entry applied
+        self._index = None
+
+    def flashcards_with(self, *keys: str) -> List[str]:
+        """IDs of the flashcards containing every given ingredient key, in ID order"""
+        with self._lock:
+            self._refresh()
+            return sorted(self._index.containing(*keys))
+
+    def confusable(self, flashcard_id: str, k: int = 5, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """Up to `k` flashcards with the most similar ingredients, as (ID, Jaccard similarity)"""
+        with self._lock:
+            self._refresh()
+            return self._index.similar(flashcard_id, k, min_similarity)
+
+    def invalidate(self):
+        """Force a full rebuild on next access"""
+        with self._lock:
+            self._data_version = None
+            self._seq = None
+            self._index = None
+
+    def close(self):
+        """Return the dedicated connection to the pool; the next access reopens it"""
+        with self._lock:
+            if self._conn is not None:
+                self.pool.close_dedicated(self._conn)
+                self._conn = None
+            self._data_version = None
+
+    @profiled(name='ingredient_index.refresh')
+    def _refresh(self):
+        """Apply changes committed since the last call; the caller holds the lock"""
+        if self._conn is None:
+            self._conn = self.pool.dedicated_reader()
+
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version and self._index is not None:
+            return
+        self._data_version = data_version
+
+        # Read the change log position and the rows it covers from one snapshot
+        self._conn.execute("BEGIN")
+        try:
+            # sqlite_sequence keeps the highest seq handed out even once the log is pruned
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'flashcard_content_changes'"
+            ).fetchone()[0]
+            oldest = self._conn.execute("SELECT MIN(seq) FROM flashcard_content_changes").fetchone()[0]
+            if self._index is not None and seq != self._seq and (oldest is None or oldest > self._seq + 1):
+                logger.debug("Ingredient change log was pruned past this index, rebuilding")
+                self._index = None
+
+            if self._index is None:
+                self._index = IngredientIndex(**self.index_options)
+                self._load(self._conn, '')
+                logger.info(f"Built ingredient index of {len(self._index)} flashcards")
+            elif seq != self._seq:
+                changed = [row[0] for row in self._conn.execute(
+                    "SELECT DISTINCT flashcard_id FROM flashcard_content_changes WHERE seq > ?", (self._seq,)
+                )]
+                for flashcard_id in changed:
+                    self._index.remove(flashcard_id)
+                self._load(self._conn, 'WHERE f.id IN (SELECT value FROM json_each(?))', (json.dumps(changed),))
+                logger.debug(f"Re-indexed ingredients of {len(changed)} flashcards")
+            self._seq = seq
+        finally:
+            self._conn.rollback()
+
+        if oldest is not None:
+            with self.pool.writer() as conn:
+                conn.execute("DELETE FROM flashcard_content_changes WHERE seq <= ?", (seq,))
+
+    def _load(self, conn, where: str, params: tuple = ()):
+        keys_by_card = {}
+        for flashcard_id, key in conn.execute(LOAD_INGREDIENTS.format(where=where), params):
+            keys = keys_by_card.setdefault(flashcard_id, [])
+            if key is not None:
+                keys.append(key)
+        for flashcard_id, keys in keys_by_card.items():
+            self._index.add(flashcard_id, keys)
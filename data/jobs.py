@@ -0,0 +1,435 @@
+"""
+Parallel maintenance jobs: regrading stored sessions, recomputing the
+progress aggregates and rebuilding trend accumulators.
+
+A job splits its keys (template IDs for regrading, user IDs otherwise)
+into contiguous ranges of roughly equal session counts and fans them out
+to a ProcessPoolExecutor. Workers open the database read-only through an
+SQLite URI and return plain rows; this process merges each range through
+the pool's single writer in its own transaction, so a cancelled job
+leaves finished ranges applied and the rest untouched.
+
+Workers read a snapshot. Sessions committed after it (rowid above the
+snapshot's highest) have already been added to the live aggregates, so
+recompute jobs fold them into the snapshot's results while merging.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from core.batch_scoring import BatchScorer
+from core.scoring_system import ScoringSystem
+from core.trends import TrendAccumulator
+from data.query_profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+KeyRange = Tuple[str, str]
+
+# Sessions per key, over raw sessions and rollups; ranges are balanced on these
+USER_WEIGHTS = '''
+    SELECT user_id, SUM(n) FROM (
+        SELECT user_id, COUNT(*) AS n FROM training_sessions GROUP BY user_id
+        UNION ALL
+        SELECT user_id, SUM(sessions) FROM session_rollups GROUP BY user_id
+    ) GROUP BY user_id ORDER BY user_id
+'''
+
+TEMPLATE_WEIGHTS = '''
+    SELECT template_id, COUNT(*) FROM training_sessions GROUP BY template_id ORDER BY template_id
+'''
+
+# Progress totals of a user range over raw sessions (rowid above a mark) and rollups
+USER_TOTALS = '''
+    SELECT user_id, SUM(n), SUM(accuracy_sum), SUM(speed_sum) FROM (
+        SELECT user_id, COUNT(*) AS n, SUM(accuracy) AS accuracy_sum, SUM(speed) AS speed_sum
+        FROM training_sessions WHERE user_id BETWEEN :low AND :high AND rowid > :after GROUP BY user_id
+        UNION ALL
+        SELECT user_id, SUM(sessions), SUM(accuracy_sum), SUM(speed_sum)
+        FROM session_rollups WHERE user_id BETWEEN :low AND :high AND :rollups GROUP BY user_id
+    ) GROUP BY user_id
+'''
+
+TEMPLATE_TOTALS = '''
+    SELECT user_id, template_id, SUM(n), MAX(best) FROM (
+        SELECT user_id, template_id, COUNT(*) AS n, MAX(score) AS best
+        FROM training_sessions WHERE user_id BETWEEN :low AND :high AND rowid > :after
+        GROUP BY user_id, template_id
+        UNION ALL
+        SELECT user_id, template_id, SUM(sessions), MAX(best_score)
+        FROM session_rollups WHERE user_id BETWEEN :low AND :high AND :rollups
+        GROUP BY user_id, template_id
+    ) GROUP BY user_id, template_id
+'''
+
+
+def split_ranges(weights: List[Tuple[str, int]], count: int) -> List[KeyRange]:
+    """Split sorted (key, weight) pairs into at most `count` contiguous ranges of similar weight"""
+    total = sum(weight for _, weight in weights)
+    if not weights:
+        return []
+    target = total / max(1, count)
+
+    ranges = []
+    first = weights[0][0]
+    accumulated = 0
+    for i, (key, weight) in enumerate(weights):
+        accumulated += weight
+        is_last = i == len(weights) - 1
+        if is_last or (accumulated >= target * (len(ranges) + 1) and len(ranges) < count - 1):
+            ranges.append((first, key))
+            if not is_last:
+                first = weights[i + 1][0]
+    return ranges
+
+
+def _high_water(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM training_sessions").fetchone()[0]
+
+
+# Shard functions run in worker processes against a read-only connection and
+# return (rowid high-water mark of their snapshot, rows for the merge step)
+
+def regrade_shard(conn: sqlite3.Connection, key_range: KeyRange, params: Dict):
+    scoring = ScoringSystem()
+    scoring.accuracy_weight, scoring.speed_weight = params['weights']
+    scorer = BatchScorer(scoring)
+
+    columns = scorer.read_columns(conn, 's.template_id BETWEEN ? AND ?', key_range)
+    results = scorer.score(columns, params['templates'])
+    return 0, [
+        (float(score), float(accuracy), float(speed), session_id)
+        for score, accuracy, speed, session_id
+        in zip(results.score, results.accuracy, results.speed, results.ids)
+    ]
+
+
+def progress_shard(conn: sqlite3.Connection, key_range: KeyRange, params: Dict):
+    high_water = _high_water(conn)
+    args = {'low': key_range[0], 'high': key_range[1], 'after': 0, 'rollups': True}
+    users = conn.execute(USER_TOTALS, args).fetchall()
+    templates = conn.execute(TEMPLATE_TOTALS, args).fetchall()
+    return high_water, ([tuple(row) for row in users], [tuple(row) for row in templates])
+
+
+def trends_shard(conn: sqlite3.Connection, key_range: KeyRange, params: Dict):
+    high_water = _high_water(conn)
+    accumulators: Dict[str, TrendAccumulator] = {}
+
+    # Rolled-up sessions are older than any stored session
+    for row in conn.execute('''
+        SELECT user_id, SUM(sessions), SUM(score_sum), SUM(accuracy_sum), SUM(speed_sum)
+        FROM session_rollups WHERE user_id BETWEEN ? AND ? GROUP BY user_id
+    ''', key_range):
+        accumulators.setdefault(row[0], TrendAccumulator()).add_rollup(row[1], row[2], row[3], row[4])
+    for row in conn.execute('''
+        SELECT user_id, error_type, SUM(count) FROM session_rollup_errors
+        WHERE user_id BETWEEN ? AND ? GROUP BY user_id, error_type
+    ''', key_range):
+        accumulators.setdefault(row[0], TrendAccumulator()).error_counts[row[1]] += row[2]
+
+    _add_sessions(accumulators, conn.execute(
+        "SELECT user_id, score, accuracy, speed, errors FROM training_sessions "
+        "WHERE user_id BETWEEN ? AND ? ORDER BY start_time, id", key_range
+    ))
+    return high_water, [(user_id, accumulator.to_json()) for user_id, accumulator in accumulators.items()]
+
+
+def _add_sessions(accumulators: Dict[str, TrendAccumulator], rows):
+    for user_id, score, accuracy, speed, errors in rows:
+        accumulators.setdefault(user_id, TrendAccumulator()).add(score, accuracy, speed, json.loads(errors or '[]'))
+
+
+# Merge functions run in the app process inside the pool's writer transaction
+
+def merge_regrade(conn: sqlite3.Connection, key_range: KeyRange, high_water: int, rows) -> int:
+    conn.executemany("UPDATE training_sessions SET score = ?, accuracy = ?, speed = ? WHERE id = ?", rows)
+    return len(rows)
+
+
+def merge_progress(conn: sqlite3.Connection, key_range: KeyRange, high_water: int, rows) -> int:
+    users = {row[0]: list(row[1:]) for row in rows[0]}
+    templates = {(row[0], row[1]): list(row[2:]) for row in rows[1]}
+
+    # Only raw sessions can be late; rollups absorb sessions the snapshot already counted
+    args = {'low': key_range[0], 'high': key_range[1], 'after': high_water, 'rollups': False}
+    for user_id, count, accuracy_sum, speed_sum in conn.execute(USER_TOTALS, args):
+        totals = users.setdefault(user_id, [0, 0.0, 0.0])
+        totals[0] += count
+        totals[1] += accuracy_sum
+        totals[2] += speed_sum
+    for user_id, template_id, count, best in conn.execute(TEMPLATE_TOTALS, args):
+        totals = templates.setdefault((user_id, template_id), [0, best])
+        totals[0] += count
+        totals[1] = max(totals[1], best)
+
+    conn.executemany('''
+        INSERT INTO user_progress (user_id, total_sessions, average_accuracy, average_speed)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            total_sessions = excluded.total_sessions,
+            average_accuracy = excluded.average_accuracy,
+            average_speed = excluded.average_speed,
+            last_updated = CURRENT_TIMESTAMP
+    ''', [
+        (user_id, count, accuracy_sum / count, speed_sum / count)
+        for user_id, (count, accuracy_sum, speed_sum) in users.items() if count
+    ])
+    conn.executemany('''
+        INSERT INTO user_template_progress (user_id, template_id, best_score, sessions)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, template_id) DO UPDATE SET
+            best_score = excluded.best_score,
+            sessions = excluded.sessions,
+            last_updated = CURRENT_TIMESTAMP
+    ''', [(user_id, template_id, best, count) for (user_id, template_id), (count, best) in templates.items()])
+    return len(users)
+
+
+def merge_trends(conn: sqlite3.Connection, key_range: KeyRange, high_water: int, rows) -> int:
+    accumulators = {user_id: TrendAccumulator.from_json(state) for user_id, state in rows}
+    _add_sessions(accumulators, conn.execute(
+        "SELECT user_id, score, accuracy, speed, errors FROM training_sessions "
+        "WHERE user_id BETWEEN ? AND ? AND rowid > ? ORDER BY start_time, id", key_range + (high_water,)
+    ))
+    conn.executemany('''
+        INSERT INTO user_trends (user_id, state) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            state = excluded.state,
+            last_updated = CURRENT_TIMESTAMP
+    ''', [(user_id, accumulator.to_json()) for user_id, accumulator in accumulators.items()])
+    return len(accumulators)
+
+
+# name -> (key weights query, shard function, merge function)
+JOBS = {
+    'regrade': (TEMPLATE_WEIGHTS, regrade_shard, merge_regrade),
+    'progress': (USER_WEIGHTS, progress_shard, merge_progress),
+    'trends': (USER_WEIGHTS, trends_shard, merge_trends),
+}
+
+
+_worker_conn: Optional[sqlite3.Connection] = None
+
+
+def read_only_uri(db_path: str) -> str:
+    return Path(db_path).resolve().as_uri() + '?mode=ro'
+
+
+def _init_worker(uri: str):
+    global _worker_conn
+    _worker_conn = sqlite3.connect(uri, uri=True)
+
+
+def read_shard(conn: sqlite3.Connection, name: str, key_range: KeyRange, params: Dict):
+    """Run a job's shard function in one read transaction, so it sees a single snapshot"""
+    conn.execute('BEGIN')
+    try:
+        return JOBS[name][1](conn, key_range, params)
+    finally:
+        conn.rollback()
+
+
+def _run_shard(name: str, key_range: KeyRange, params: Dict):
+    """Entry point of a worker task"""
+    return read_shard(_worker_conn, name, key_range, params)
+
+
+class Job:
+    """State of one submitted job; progress is counted in key ranges"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = 'pending'  # running, done, cancelled or failed
+        self.total = 0
+        self.done = 0
+        self.updated = 0
+        self.error: Optional[str] = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Stop after the ranges already being merged; pending ranges are dropped"""
+        self._cancel.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._finished.wait(timeout)
+
+
+class JobRunner:
+    """Runs maintenance jobs on a process pool, one job at a time"""
+
+    def __init__(self, db, workers: int = 0, ranges_per_worker: int = 4):
+        self.db = db
+        self.profiler = db.profiler
+        self.workers = workers or os.cpu_count() or 1
+        self.ranges_per_worker = ranges_per_worker
+
+        self.job: Optional[Job] = None
+        self._thread = None
+
+    @property
+    def busy(self) -> bool:
+        return self.job is not None and not self.job._finished.is_set()
+
+    def start(self, name: str, on_progress: Callable[[Job], None] = None) -> Job:
+        """Run a job in a background thread; `on_progress` is called from that thread"""
+        if name not in JOBS:
+            raise ValueError(f"Unknown job: {name}")
+        if self.busy:
+            raise RuntimeError(f"Job {self.job.name} is already running")
+
+        self.job = Job(name)
+        self._thread = threading.Thread(target=self.run, args=(self.job, on_progress),
+                                        name=f'lineup-job-{name}', daemon=True)
+        self._thread.start()
+        return self.job
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def stop(self, timeout: float = None):
+        """Cancel the running job and wait for it to wind down"""
+        self.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self, job: Job, on_progress: Callable[[Job], None] = None) -> Job:
+        """Run a job to completion in the calling thread"""
+        notify = on_progress or (lambda _: None)
+        job.state = 'running'
+        try:
+            # Shards must see every queued session
+            self.db.flush()
+            ranges = self._run_ranges(job, notify)
+            if job.name == 'regrade' and ranges:
+                # Stored scores changed under everything aggregated from them; a
+                # cancelled regrade still rebuilds for the ranges it applied
+                self.rebuild_score_aggregates(self._templates_in(ranges))
+            job.state = 'cancelled' if job.cancelled else 'done'
+        except Exception as e:
+            logger.error(f"Job {job.name} failed: {e}")
+            job.state = 'failed'
+            job.error = str(e)
+        finally:
+            logger.info(f"Job {job.name} {job.state}: {job.done}/{job.total} ranges, {job.updated} rows")
+            notify(job)
+            job._finished.set()
+        return job
+
+    def rebuild_score_aggregates(self, template_ids: List[str] = None):
+        """Recompute progress and trends range by range, then the templates' sketches and boards
+
+        Every range and template commits on its own, so the writer is never
+        held for the whole rebuild. `template_ids` limits the sketch and
+        leaderboard rebuild; progress and trends always cover every user.
+        """
+        for name in ('progress', 'trends'):
+            self._run_ranges(Job(name))
+        self.db.rebuild_template_aggregates(template_ids)
+
+    def _run_ranges(self, job: Job, notify: Callable[[Job], None] = None) -> List[KeyRange]:
+        """Shard a job's keys and merge each range as it finishes; returns the merged ranges"""
+        weights_query, _, merge = JOBS[job.name]
+        notify = notify or (lambda _: None)
+        ranges = split_ranges(self._weights(weights_query), self.workers * self.ranges_per_worker)
+        job.total = len(ranges)
+        notify(job)
+
+        merged = []
+        params = self._params(job.name)
+        for key_range, (high_water, rows) in self._map(job, ranges, params):
+            job.updated += self._merge(merge, key_range, high_water, rows)
+            job.done += 1
+            merged.append(key_range)
+            notify(job)
+        return merged
+
+    def _templates_in(self, ranges: List[KeyRange]) -> List[str]:
+        with self.db.pool.reader() as conn:
+            return sorted({
+                row[0]
+                for key_range in ranges
+                for row in conn.execute(
+                    "SELECT DISTINCT template_id FROM training_sessions WHERE template_id BETWEEN ? AND ?",
+                    key_range
+                )
+            })
+
+    @profiled(name='jobs.weights')
+    def _weights(self, query: str) -> List[Tuple[str, int]]:
+        with self.db.pool.reader() as conn:
+            return [tuple(row) for row in conn.execute(query)]
+
+    @profiled(name='jobs.merge')
+    def _merge(self, merge: Callable, key_range: KeyRange, high_water: int, rows) -> int:
+        """Apply one shard's result in its own writer transaction"""
+        with self.db.pool.writer() as conn:
+            return merge(conn, key_range, high_water, rows)
+
+    def _params(self, name: str) -> Dict:
+        if name != 'regrade':
+            return {}
+        scoring = ScoringSystem()
+        return {
+            'templates': {template.id: template for template in self.db.template_cache.all()},
+            'weights': (scoring.accuracy_weight, scoring.speed_weight),
+        }
+
+    def _map(self, job: Job, ranges: List[KeyRange], params: Dict):
+        """Yield (range, shard result) as shards finish, stopping when the job is cancelled"""
+        uri = read_only_uri(self.db.db_path)
+        executor = self._executor(uri, min(self.workers, len(ranges)))
+
+        if executor is None:
+            conn = sqlite3.connect(uri, uri=True)
+            try:
+                for key_range in ranges:
+                    if job.cancelled:
+                        return
+                    yield key_range, read_shard(conn, job.name, key_range, params)
+            finally:
+                conn.close()
+            return
+
+        try:
+            pending = {executor.submit(_run_shard, job.name, key_range, params): key_range
+                       for key_range in ranges}
+            while pending and not job.cancelled:
+                finished, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key_range = pending.pop(future)
+                    if not job.cancelled:
+                        yield key_range, future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _executor(self, uri: str, workers: int) -> Optional[ProcessPoolExecutor]:
+        """Process pool for the shards, or None to run them in this thread"""
+        if workers <= 1:
+            return None
+        # Spawned workers re-import the app's main module; keep Kivy off their command line
+        os.environ.setdefault('KIVY_NO_ARGS', '1')
+        try:
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker, initargs=(uri,))
+        except (ImportError, NotImplementedError, OSError) as e:
+            # No process support (e.g. Android)
+            logger.warning(f"Process pool unavailable, running job in-process: {e}")
+            return None
@@ -0,0 +1,231 @@
+"""
+Leaderboards per template, time window and store.
+
+Every saved session upserts the user's best score into one board per
+period (day, week, month, all time) in the same transaction that stores
+the session, so reading a board is an index range scan rather than a scan
+of training_sessions. The top entries of recently read boards are also
+kept in memory and updated in place as sessions are committed; because a
+user's best score only ever rises, the cached top N stays exact.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from data.query_profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('day', 'week', 'month', 'all')
+
+DEFAULT_STORE_ID = 'default'
+
+# Migration that created leaderboard_entries; older databases are backfilled
+SCHEMA_VERSION = 10
+
+UPSERT_ENTRY = '''
+    INSERT INTO leaderboard_entries
+    (store_id, template_id, period, period_start, user_id, best_score, achieved_at, session_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(store_id, template_id, period, period_start, user_id) DO UPDATE SET
+        best_score = excluded.best_score,
+        achieved_at = excluded.achieved_at,
+        session_id = excluded.session_id
+    WHERE excluded.best_score > best_score
+'''
+
+BoardKey = Tuple[str, str, str, str]  # store_id, template_id, period, period_start
+
+
+def period_start(period: str, when: datetime) -> str:
+    """Start date of the `period` window containing `when` ('' for all time)"""
+    if period == 'day':
+        return when.date().isoformat()
+    if period == 'week':
+        return (when.date() - timedelta(days=when.weekday())).isoformat()
+    if period == 'month':
+        return when.date().replace(day=1).isoformat()
+    if period == 'all':
+        return ''
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+def _sort_key(entry: Dict):
+    return -entry['best_score'], entry['achieved_at'], entry['user_id']
+
+
+class Leaderboard:
+    """Reads and maintains leaderboard_entries for one store"""
+
+    def __init__(self, pool, store_id: str = DEFAULT_STORE_ID, size: int = 20, max_cached_boards: int = 64):
+        self.pool = pool
+        self.profiler = pool.profiler
+        self.store_id = store_id
+        self.size = size
+        self.max_cached_boards = max_cached_boards
+
+        self._boards: 'OrderedDict[BoardKey, List[Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every apply(), so a board loaded concurrently is not cached stale
+        self._generation = 0
+
+    def board_key(self, template_id: str, period: str = 'week', when: datetime = None,
+                  store_id: str = None) -> BoardKey:
+        return (store_id or self.store_id, template_id, period, period_start(period, when or datetime.now()))
+
+    def entry_rows(self, sessions: Iterable) -> List[tuple]:
+        """UPSERT_ENTRY parameters for every board a batch of sessions touches"""
+        return [
+            (self.store_id, session.template_id, period, period_start(period, session.start_time),
+             session.user_id, session.score, session.start_time.isoformat(), session.id)
+            for session in sessions
+            for period in PERIODS
+        ]
+
+    def record(self, conn, sessions: Iterable) -> List[tuple]:
+        """Upsert sessions into their boards within the caller's write transaction.
+
+        Pass the returned rows to apply() once the transaction has committed.
+        """
+        rows = self.entry_rows(sessions)
+        conn.executemany(UPSERT_ENTRY, rows)
+        return rows
+
+    def apply(self, rows: Iterable[tuple]):
+        """Update cached boards with committed rows"""
+        with self._lock:
+            self._generation += 1
+            for store_id, template_id, period, start, user_id, score, achieved_at, session_id in rows:
+                board = self._boards.get((store_id, template_id, period, start))
+                if board is None:
+                    continue
+
+                current = next((e for e in board if e['user_id'] == user_id), None)
+                if current is not None:
+                    if score <= current['best_score']:
+                        continue
+                    board.remove(current)
+                elif len(board) >= self.size and score <= board[-1]['best_score']:
+                    continue
+
+                board.append({'user_id': user_id, 'best_score': score,
+                              'achieved_at': achieved_at, 'session_id': session_id})
+                board.sort(key=_sort_key)
+                del board[self.size:]
+
+    def top(self, template_id: str, period: str = 'week', when: datetime = None,
+            store_id: str = None, limit: int = None) -> List[Dict]:
+        """Best entries of a board, highest score first (earlier achievement wins ties)"""
+        limit = limit or self.size
+        key = self.board_key(template_id, period, when, store_id)
+        if limit > self.size:
+            return self._load(key, limit)
+
+        with self._lock:
+            board = self._boards.get(key)
+            if board is not None:
+                self._boards.move_to_end(key)
+                return [dict(entry) for entry in board[:limit]]
+            generation = self._generation
+
+        board = self._load(key, self.size)
+        with self._lock:
+            if generation != self._generation:
+                return [dict(entry) for entry in board[:limit]]
+            self._boards[key] = board
+            while len(self._boards) > self.max_cached_boards:
+                self._boards.popitem(last=False)
+            return [dict(entry) for entry in board[:limit]]
+
+    @profiled(name='leaderboard.rank')
+    def rank(self, user_id: str, template_id: str, period: str = 'week', when: datetime = None,
+             store_id: str = None) -> Optional[int]:
+        """1-based rank of a user on a board, or None if they have no entry"""
+        for position, entry in enumerate(self.top(template_id, period, when, store_id), start=1):
+            if entry['user_id'] == user_id:
+                return position
+
+        key = self.board_key(template_id, period, when, store_id)
+        with self.pool.reader() as conn:
+            own = conn.execute(
+                "SELECT best_score, achieved_at FROM leaderboard_entries "
+                "WHERE store_id = ? AND template_id = ? AND period = ? AND period_start = ? AND user_id = ?",
+                key + (user_id,)
+            ).fetchone()
+            if own is None:
+                return None
+
+            ahead = conn.execute('''
+                SELECT COUNT(*) FROM leaderboard_entries
+                WHERE store_id = ? AND template_id = ? AND period = ? AND period_start = ?
+                  AND (best_score > ? OR (best_score = ? AND (achieved_at, user_id) < (?, ?)))
+            ''', key + (own['best_score'], own['best_score'], own['achieved_at'], user_id)).fetchone()[0]
+        return ahead + 1
+
+    def invalidate(self):
+        """Drop all cached boards"""
+        with self._lock:
+            self._generation += 1
+            self._boards.clear()
+
+    @profiled(name='leaderboard.rebuild')
+    def rebuild(self, conn, template_id: str = None):
+        """Refill this store's boards, or one template's, from stored sessions and retention rollups"""
+        where, args = ("WHERE template_id = ?", (template_id,)) if template_id else ("", ())
+        if template_id:
+            conn.execute("DELETE FROM leaderboard_entries WHERE store_id = ? AND template_id = ?",
+                         (self.store_id, template_id))
+        else:
+            conn.execute("DELETE FROM leaderboard_entries WHERE store_id = ?", (self.store_id,))
+
+        # Rollups keep the best score per day; the day stands in for the achievement time
+        rows = []
+        for row in conn.execute(f"SELECT user_id, template_id, day, best_score FROM session_rollups {where}", args):
+            day = datetime.fromisoformat(row['day'])
+            rows.extend(
+                (self.store_id, row['template_id'], period, period_start(period, day),
+                 row['user_id'], row['best_score'], row['day'], None)
+                for period in PERIODS
+            )
+        conn.executemany(UPSERT_ENTRY, rows)
+
+        cursor = conn.execute(
+            f"SELECT id, user_id, template_id, start_time, score FROM training_sessions {where}", args
+        )
+        while True:
+            batch = cursor.fetchmany(1000)
+            if not batch:
+                break
+            conn.executemany(UPSERT_ENTRY, [
+                (self.store_id, row['template_id'], period,
+                 period_start(period, datetime.fromisoformat(row['start_time'])),
+                 row['user_id'], row['score'], row['start_time'], row['id'])
+                for row in batch
+                for period in PERIODS
+            ])
+
+        self.invalidate()
+
+    @profiled(name='leaderboard.prune')
+    def prune(self, conn, before: datetime, periods: Tuple[str, ...] = ('day', 'week')):
+        """Delete boards of the given periods that ended before `before`"""
+        for period in periods:
+            conn.execute(
+                "DELETE FROM leaderboard_entries WHERE period = ? AND period_start < ?",
+                (period, period_start(period, before))
+            )
+        self.invalidate()
+
+    @profiled(name='leaderboard.load')
+    def _load(self, key: BoardKey, limit: int) -> List[Dict]:
+        with self.pool.reader() as conn:
+            return [dict(row) for row in conn.execute('''
+                SELECT user_id, best_score, achieved_at, session_id
+                FROM leaderboard_entries
+                WHERE store_id = ? AND template_id = ? AND period = ? AND period_start = ?
+                ORDER BY best_score DESC, achieved_at, user_id
+                LIMIT ?
+            ''', key + (limit,))]
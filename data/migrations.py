@@ -0,0 +1,610 @@
+"""
+Schema migrations keyed on PRAGMA user_version.
+
+Each migration is applied exactly once, in order; pending migrations run
+in a single transaction together with the user_version bump. A database
+that is already current costs one PRAGMA read on startup.
+
+Migrations use IF NOT EXISTS so databases created before the migration
+runner existed (user_version 0 with tables already present) upgrade
+cleanly. Never edit a released migration; append a new one.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from itertools import zip_longest
+from typing import Callable, List, Tuple
+import logging
+
+from core.quantiles import KLLSketch
+from core.trends import TrendAccumulator
+from data.flashcard_stats import STATS_VERSION_KEY
+from data.template_cache import CONTENT_VERSION_KEY
+
+logger = logging.getLogger(__name__)
+
+
+def _create_base_schema(conn: sqlite3.Connection):
+    """Users, ingredients, templates, sessions, progress and flashcards"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            role TEXT DEFAULT 'trainee',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            image_path TEXT,
+            calories INTEGER DEFAULT 0,
+            allergens TEXT DEFAULT '[]',
+            placement_zones TEXT DEFAULT '["center"]'
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS templates (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            station TEXT NOT NULL,
+            difficulty INTEGER DEFAULT 1,
+            total_time_target INTEGER DEFAULT 60,
+            steps TEXT NOT NULL,  -- legacy JSON column, steps live in template_steps
+            description TEXT,
+            image_path TEXT,
+            common_errors TEXT DEFAULT '[]',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS training_sessions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            template_id TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            start_time TIMESTAMP NOT NULL,
+            end_time TIMESTAMP,
+            score REAL DEFAULT 0.0,
+            accuracy REAL DEFAULT 0.0,
+            speed REAL DEFAULT 0.0,
+            errors TEXT DEFAULT '[]',
+            completed_steps TEXT DEFAULT '[]',
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (template_id) REFERENCES templates (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            user_id TEXT PRIMARY KEY,
+            templates_mastered TEXT DEFAULT '{}',
+            total_sessions INTEGER DEFAULT 0,
+            average_accuracy REAL DEFAULT 0.0,
+            average_speed REAL DEFAULT 0.0,
+            skill_matrix TEXT DEFAULT '{}',
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flashcards (
+            id TEXT PRIMARY KEY,
+            dish_name TEXT NOT NULL,
+            dish_name_translation_key TEXT NOT NULL,
+            dish_image TEXT,
+            ingredients TEXT NOT NULL,
+            ingredients_translation_keys TEXT NOT NULL,
+            difficulty TEXT CHECK(difficulty IN ('easy', 'medium', 'hard')) DEFAULT 'medium',
+            category TEXT DEFAULT 'sandwiches',
+            assembly_tips TEXT,
+            created_at TEXT NOT NULL,
+            times_reviewed INTEGER DEFAULT 0,
+            mastery_level REAL DEFAULT 0.0
+        )
+    ''')
+
+    for index_sql in [
+        "CREATE INDEX IF NOT EXISTS idx_sessions_template ON training_sessions(template_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_time ON training_sessions(start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_templates_station ON templates(station)",
+        "CREATE INDEX IF NOT EXISTS idx_templates_difficulty ON templates(difficulty)",
+    ]:
+        conn.execute(index_sql)
+
+
+def _create_seed_metadata(conn: sqlite3.Connection):
+    """Key/value metadata and per-row seed hashes"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS seed_hashes (
+            table_name TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            PRIMARY KEY (table_name, row_id)
+        )
+    ''')
+
+
+def _create_user_template_progress(conn: sqlite3.Connection):
+    """Per-(user, template) best scores, replacing the templates_mastered JSON blob"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_template_progress (
+            user_id TEXT NOT NULL,
+            template_id TEXT NOT NULL,
+            best_score REAL DEFAULT 0.0,
+            sessions INTEGER DEFAULT 0,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, template_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Carry over best scores stored in the old JSON column
+    conn.execute('''
+        INSERT OR IGNORE INTO user_template_progress (user_id, template_id, best_score)
+        SELECT p.user_id, j.key, j.value
+        FROM user_progress p, json_each(p.templates_mastered) j
+    ''')
+
+
+def _create_template_steps(conn: sqlite3.Connection):
+    """Normalized template steps plus content-version triggers for the template cache"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS template_steps (
+            template_id TEXT NOT NULL,
+            step_order INTEGER NOT NULL,
+            ingredient_id TEXT NOT NULL,
+            placement TEXT NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            time_target INTEGER DEFAULT 5,
+            points INTEGER DEFAULT 10,
+            critical INTEGER DEFAULT 1,
+            PRIMARY KEY (template_id, step_order),
+            FOREIGN KEY (template_id) REFERENCES templates (id),
+            FOREIGN KEY (ingredient_id) REFERENCES ingredients (id)
+        ) WITHOUT ROWID
+    ''')
+
+    for table in ('templates', 'template_steps', 'ingredients'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO app_meta (key, value) VALUES ('{CONTENT_VERSION_KEY}', '1')
+                    ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+                END
+            ''')
+
+
+def _create_flashcard_lists(conn: sqlite3.Connection):
+    """Flashcard ingredient and tip lists, one row per list entry"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flashcard_ingredients (
+            flashcard_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            translation_key TEXT,
+            PRIMARY KEY (flashcard_id, position),
+            FOREIGN KEY (flashcard_id) REFERENCES flashcards (id)
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flashcard_tips (
+            flashcard_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            tip TEXT NOT NULL,
+            PRIMARY KEY (flashcard_id, position),
+            FOREIGN KEY (flashcard_id) REFERENCES flashcards (id)
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_flashcard_ingredients_key "
+        "ON flashcard_ingredients(translation_key, flashcard_id)"
+    )
+
+    # Move comma-joined columns into the child tables
+    def split(value):
+        return value.split(',') if value else []
+
+    rows = conn.execute(
+        "SELECT id, ingredients, ingredients_translation_keys, assembly_tips FROM flashcards"
+    ).fetchall()
+    conn.executemany(
+        "INSERT OR IGNORE INTO flashcard_ingredients (flashcard_id, position, name, translation_key) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (row['id'], position, name, key)
+            for row in rows
+            for position, (name, key) in enumerate(
+                zip_longest(split(row['ingredients']), split(row['ingredients_translation_keys']))
+            )
+        ]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO flashcard_tips (flashcard_id, position, tip) VALUES (?, ?, ?)",
+        [
+            (row['id'], position, tip)
+            for row in rows
+            for position, tip in enumerate(split(row['assembly_tips']))
+        ]
+    )
+    conn.execute("UPDATE flashcards SET ingredients = '', ingredients_translation_keys = '', assembly_tips = ''")
+
+    # Comma splitting may have broken seeded tips; make the next seed rewrite them
+    conn.execute("DELETE FROM seed_hashes WHERE table_name = 'flashcards'")
+    conn.execute("DELETE FROM app_meta WHERE key = 'flashcards_seed_hash'")
+
+
+def _create_queue_indexes(conn: sqlite3.Connection):
+    """Composite indexes matching the review queue and session history order"""
+    for index_sql in [
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_time ON training_sessions(user_id, start_time, id)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_queue ON flashcards(mastery_level, times_reviewed, id)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_category_queue "
+        "ON flashcards(category, mastery_level, times_reviewed, id)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_difficulty_queue "
+        "ON flashcards(difficulty, mastery_level, times_reviewed, id)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_category_difficulty_queue "
+        "ON flashcards(category, difficulty, mastery_level, times_reviewed, id)",
+        # Superseded by the composite indexes above
+        "DROP INDEX IF EXISTS idx_sessions_user",
+        "DROP INDEX IF EXISTS idx_flashcards_category",
+        "DROP INDEX IF EXISTS idx_flashcards_difficulty",
+    ]:
+        conn.execute(index_sql)
+
+
+def _create_change_log(conn: sqlite3.Connection):
+    """Append-only log of changed rows for delta sync, filled by triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,  -- JSON array of the primary key values
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Flashcard content is seeded on every device; only review progress is synced
+    tracked = [
+        ('training_sessions', ('id',), 'UPDATE'),
+        ('user_progress', ('user_id',), 'UPDATE'),
+        ('user_template_progress', ('user_id', 'template_id'), 'UPDATE'),
+        ('flashcards', ('id',), 'UPDATE OF times_reviewed, mastery_level'),
+    ]
+    for table, key_columns, update_event in tracked:
+        for event, ref in (('INSERT', 'NEW'), (update_event, 'NEW'), ('DELETE', 'OLD')):
+            if table == 'flashcards' and event == 'INSERT':
+                continue
+            row_key = ', '.join(f"{ref}.{c}" for c in key_columns)
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.split()[0].lower()}_changelog
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_key) VALUES ('{table}', json_array({row_key}));
+                END
+            ''')
+
+
+def _create_session_rollups(conn: sqlite3.Connection):
+    """Daily per-(user, template) aggregates of sessions removed by retention"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_rollups (
+            user_id TEXT NOT NULL,
+            template_id TEXT NOT NULL,
+            day TEXT NOT NULL,  -- YYYY-MM-DD of start_time
+            sessions INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0.0,
+            accuracy_sum REAL NOT NULL DEFAULT 0.0,
+            speed_sum REAL NOT NULL DEFAULT 0.0,
+            best_score REAL NOT NULL DEFAULT 0.0,
+            PRIMARY KEY (user_id, template_id, day)
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_rollup_errors (
+            user_id TEXT NOT NULL,
+            template_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            error_type TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, template_id, day, error_type)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _create_user_trends(conn: sqlite3.Connection):
+    """Per-user trend accumulators, backfilled from rollups and stored sessions"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_trends (
+            user_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,  -- TrendAccumulator JSON
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+    accumulators = {}
+
+    # Rolled-up sessions are older than any stored session
+    for row in conn.execute('''
+        SELECT user_id, SUM(sessions), SUM(score_sum), SUM(accuracy_sum), SUM(speed_sum)
+        FROM session_rollups GROUP BY user_id
+    '''):
+        accumulators.setdefault(row[0], TrendAccumulator()).add_rollup(row[1], row[2], row[3], row[4])
+    for row in conn.execute(
+        "SELECT user_id, error_type, SUM(count) FROM session_rollup_errors GROUP BY user_id, error_type"
+    ):
+        accumulators.setdefault(row[0], TrendAccumulator()).error_counts[row[1]] += row[2]
+
+    for row in conn.execute(
+        "SELECT user_id, score, accuracy, speed, errors FROM training_sessions ORDER BY start_time, id"
+    ):
+        accumulators.setdefault(row[0], TrendAccumulator()).add(
+            row[1], row[2], row[3], json.loads(row[4] or '[]')
+        )
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO user_trends (user_id, state) VALUES (?, ?)",
+        [(user_id, accumulator.to_json()) for user_id, accumulator in accumulators.items()]
+    )
+
+
+def _create_leaderboards(conn: sqlite3.Connection):
+    """Best score per user on each (store, template, period) leaderboard"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard_entries (
+            store_id TEXT NOT NULL,
+            template_id TEXT NOT NULL,
+            period TEXT NOT NULL,  -- day, week, month or all
+            period_start TEXT NOT NULL,  -- YYYY-MM-DD, '' for all time
+            user_id TEXT NOT NULL,
+            best_score REAL NOT NULL,
+            achieved_at TIMESTAMP NOT NULL,
+            session_id TEXT,
+            PRIMARY KEY (store_id, template_id, period, period_start, user_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard_entries"
+        "(store_id, template_id, period, period_start, best_score DESC, achieved_at, user_id)"
+    )
+
+
+def _create_template_sketches(conn: sqlite3.Connection):
+    """Per-template quantile sketches of session metrics, synced to the hub"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS template_sketches (
+            template_id TEXT NOT NULL,
+            metric TEXT NOT NULL,  -- score, accuracy, speed or duration
+            sketch TEXT NOT NULL,  -- KLLSketch JSON
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (template_id, metric)
+        ) WITHOUT ROWID
+    ''')
+
+    for event in ('INSERT', 'UPDATE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_template_sketches_{event.lower()}_changelog
+            AFTER {event} ON template_sketches
+            BEGIN
+                INSERT INTO change_log (table_name, row_key)
+                VALUES ('template_sketches', json_array(NEW.template_id, NEW.metric));
+            END
+        ''')
+
+    # Backfill from stored sessions; rolled-up sessions have no distribution left
+    sketches = {}
+    for row in conn.execute(
+        "SELECT template_id, start_time, end_time, score, accuracy, speed FROM training_sessions"
+    ):
+        metrics = {'score': row['score'], 'accuracy': row['accuracy'], 'speed': row['speed']}
+        if row['end_time']:
+            metrics['duration'] = (datetime.fromisoformat(row['end_time']) -
+                                   datetime.fromisoformat(row['start_time'])).total_seconds()
+        for metric, value in metrics.items():
+            sketches.setdefault((row['template_id'], metric), KLLSketch()).update(value)
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO template_sketches (template_id, metric, sketch) VALUES (?, ?, ?)",
+        [(template_id, metric, sketch.to_json()) for (template_id, metric), sketch in sketches.items()]
+    )
+
+
+def _create_flashcard_schedule(conn: sqlite3.Connection):
+    """Per-user spaced-repetition state of each flashcard, indexed by due time"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flashcard_schedule (
+            user_id TEXT NOT NULL,
+            flashcard_id TEXT NOT NULL,
+            stability REAL,  -- days; NULL until the first review
+            difficulty REAL,
+            due_at TIMESTAMP NOT NULL,
+            interval_days REAL DEFAULT 0,
+            reps INTEGER DEFAULT 0,
+            lapses INTEGER DEFAULT 0,
+            last_review TIMESTAMP,
+            PRIMARY KEY (user_id, flashcard_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_flashcard_schedule_due ON flashcard_schedule(user_id, due_at)"
+    )
+
+    # Cards enrolled but never reviewed are derivable and not synced
+    for event, row, when in (('INSERT', 'NEW', 'WHEN NEW.reps > 0'), ('UPDATE', 'NEW', 'WHEN NEW.reps > 0'),
+                             ('DELETE', 'OLD', '')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_flashcard_schedule_{event.lower()}_changelog
+            AFTER {event} ON flashcard_schedule {when}
+            BEGIN
+                INSERT INTO change_log (table_name, row_key)
+                VALUES ('flashcard_schedule', json_array({row}.user_id, {row}.flashcard_id));
+            END
+        ''')
+
+
+def _create_flashcard_reviews(conn: sqlite3.Connection):
+    """Append-only log of flashcard reviews and the scheduler parameters fitted to it"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flashcard_reviews (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            flashcard_id TEXT NOT NULL,
+            reviewed_at INTEGER NOT NULL,  -- Unix seconds
+            rating INTEGER NOT NULL,  -- 1 again, 2 hard, 3 good, 4 easy
+            elapsed_days REAL,  -- since the previous review of the card; NULL on the first
+            duration_ms INTEGER  -- time taken to answer, when known
+        )
+    ''')
+    for event in ('UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_flashcard_reviews_no_{event.lower()}
+            BEFORE {event} ON flashcard_reviews
+            BEGIN
+                SELECT RAISE(ABORT, 'flashcard_reviews is append-only');
+            END
+        ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_flashcard_reviews_insert_changelog
+        AFTER INSERT ON flashcard_reviews
+        BEGIN
+            INSERT INTO change_log (table_name, row_key) VALUES ('flashcard_reviews', json_array(NEW.id));
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_parameters (
+            store_id TEXT PRIMARY KEY,
+            weights TEXT NOT NULL,  -- JSON array of FSRS weights
+            reviews INTEGER NOT NULL,  -- reviews the weights were fitted on
+            log_loss REAL,
+            fitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+
+def _create_flashcard_stats_version(conn: sqlite3.Connection):
+    """Counter bumped whenever flashcard statistics may change, for the stats cache"""
+    for event in ('INSERT', 'DELETE', 'UPDATE OF category, difficulty, times_reviewed, mastery_level'):
+        name = event.split()[0].lower()
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_flashcards_{name}_stats_version
+            AFTER {event} ON flashcards
+            BEGIN
+                INSERT INTO app_meta (key, value) VALUES ('{STATS_VERSION_KEY}', '1')
+                ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+            END
+        ''')
+
+
+def _create_flashcard_content_changes(conn: sqlite3.Connection):
+    """Log of flashcards whose ingredients changed, read by the ingredient index"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flashcard_content_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            flashcard_id TEXT NOT NULL
+        )
+    ''')
+    for table, id_column in (('flashcards', 'id'), ('flashcard_ingredients', 'flashcard_id')):
+        for event, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            if table == 'flashcards' and event == 'UPDATE':
+                continue
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_content_changes
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO flashcard_content_changes (flashcard_id) VALUES ({ref}.{id_column});
+                END
+            ''')
+
+def _add_flashcard_review_store(conn: sqlite3.Connection):
+    """Store each review was logged in, so scheduler weights can be fitted per store"""
+    # NULL on reviews logged before this column existed
+    conn.execute("ALTER TABLE flashcard_reviews ADD COLUMN store_id TEXT")
+
+
+def _create_template_rollup_sketches(conn: sqlite3.Connection):
+    """Quantile sketches of the sessions retention has rolled up, per template.
+
+    A regrade rebuilds template_sketches from these plus the stored
+    sessions. Sessions rolled up before this table existed survive only in
+    template_sketches.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS template_rollup_sketches (
+            template_id TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            sketch TEXT NOT NULL,  -- KLLSketch JSON
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (template_id, metric)
+        ) WITHOUT ROWID
+    ''')
+
+
+# (version, description, apply) -- append only
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base schema", _create_base_schema),
+    (2, "seed metadata", _create_seed_metadata),
+    (3, "user template progress", _create_user_template_progress),
+    (4, "normalized template steps", _create_template_steps),
+    (5, "flashcard list tables", _create_flashcard_lists),
+    (6, "queue and history indexes", _create_queue_indexes),
+    (7, "sync change log", _create_change_log),
+    (8, "session rollups", _create_session_rollups),
+    (9, "user trend accumulators", _create_user_trends),
+    (10, "leaderboards", _create_leaderboards),
+    (11, "template quantile sketches", _create_template_sketches),
+    (12, "flashcard review schedule", _create_flashcard_schedule),
+    (13, "flashcard review log", _create_flashcard_reviews),
+    (14, "flashcard stats version", _create_flashcard_stats_version),
+    (15, "flashcard content changes", _create_flashcard_content_changes),
+    (16, "flashcard review store", _add_flashcard_review_store),
+    (17, "template rollup sketches", _create_template_rollup_sketches),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database header"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations in one transaction; returns the number applied.
+
+    `conn` must be the writer connection; the caller commits.
+    """
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return 0
+
+    # DDL does not open a transaction implicitly, so start one explicitly
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+    for version, description, apply in pending:
+        logger.info(f"Applying migration {version}: {description}")
+        apply(conn)
+
+    conn.execute(f"PRAGMA user_version = {pending[-1][0]}")
+    return len(pending)
@@ -0,0 +1,174 @@
+"""
+Opt-in query instrumentation for the data layer.
+
+DatabaseManager methods, and the entry points of the other data-layer
+classes, are timed as named queries and their latencies kept in coarse
+histograms. While enabled, the pool installs a trace callback on its
+connections so the SQL run by a slow call can be logged together with its
+EXPLAIN QUERY PLAN. When disabled, a profiled call costs
+one attribute check and no trace callback is installed.
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class QueryStats:
+    """Latency statistics for one named query"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms: float, slow: bool):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if slow:
+            self.slow += 1
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'avg_ms': self.total_ms / self.count if self.count else 0.0,
+            'max_ms': self.max_ms,
+            'slow': self.slow,
+            'histogram': {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class QueryProfiler:
+    """Per-pool registry of query timings and the slow-query log"""
+
+    def __init__(self, pool, slow_query_ms: float = 50.0):
+        self.pool = pool
+        self.slow_query_ms = slow_query_ms
+        self.enabled = False
+        self._stats: Dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def configure(self, enabled: bool, slow_query_ms: float = None):
+        """Turn instrumentation on or off"""
+        if slow_query_ms is not None:
+            self.slow_query_ms = slow_query_ms
+        self.enabled = bool(enabled)
+        self.pool.set_trace_callback(self._trace if self.enabled else None)
+        logger.info(f"Query instrumentation {'enabled' if self.enabled else 'disabled'}")
+
+    def _trace(self, statement: str):
+        """sqlite3 trace callback; runs on the thread executing the statement"""
+        for frame in getattr(self._local, 'frames', ()):
+            frame.append(statement)
+
+    @contextmanager
+    def measure(self, name: str):
+        """Time a named query and collect the statements it runs"""
+        frames = getattr(self._local, 'frames', None)
+        if frames is None:
+            frames = self._local.frames = []
+
+        statements: List[str] = []
+        frames.append(statements)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            frames.pop()
+            slow = elapsed_ms > self.slow_query_ms
+
+            with self._lock:
+                self._stats.setdefault(name, QueryStats()).add(elapsed_ms, slow)
+
+            if slow:
+                self._log_slow(name, elapsed_ms, statements)
+
+    def _log_slow(self, name: str, elapsed_ms: float, statements: List[str]):
+        """Log a slow call with the plan of every statement it ran"""
+        lines = [f"Slow query {name}: {elapsed_ms:.1f} ms"]
+
+        # Hide the EXPLAIN statements from any enclosing measurement
+        frames, self._local.frames = self._local.frames, []
+        try:
+            with self.pool.reader() as conn:
+                for statement in statements:
+                    lines.append(f"  SQL: {' '.join(statement.split())}")
+                    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+                        continue
+                    try:
+                        for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}"):
+                            lines.append(f"    PLAN: {row['detail']}")
+                    except Exception as e:
+                        lines.append(f"    PLAN unavailable: {e}")
+        except Exception as e:
+            lines.append(f"  (could not capture plans: {e})")
+        finally:
+            self._local.frames = frames
+
+        logger.warning("\n".join(lines))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return the current stats keyed by query name"""
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+
+    def dump(self) -> str:
+        """Log the current stats and return them as text"""
+        lines = ["Query stats (name: count, avg, max, slow):"]
+        for name, stats in self.snapshot().items():
+            lines.append(
+                f"  {name}: {stats['count']}, {stats['avg_ms']:.2f} ms, "
+                f"{stats['max_ms']:.2f} ms, {stats['slow']}"
+            )
+        text = "\n".join(lines)
+        logger.info(text)
+        return text
+
+    def reset(self):
+        """Clear all collected stats"""
+        with self._lock:
+            self._stats.clear()
+
+
+def profiled(method=None, *, name: str = None):
+    """Time a method as a named query when its object's profiler is on.
+
+    DatabaseManager methods use it bare and are named after the method.
+    Other data-layer classes expose `profiler` too and pass a name, e.g.
+    @profiled(name='leaderboard.rank').
+    """
+    if method is None:
+        return functools.partial(profiled, name=name)
+    name = name or method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+        with profiler.measure(name):
+            return method(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,249 @@
+"""
+Retention of old training sessions.
+
+Sessions older than `retention_days` are folded into daily per-(user,
+template) rollups (count, score/accuracy/speed sums, best score and error
+type counts), which is everything the trend analysis needs, and the raw
+rows are deleted in bounded chunks so the writer is never held for long.
+The newest `keep_recent` sessions of each user are always kept raw for the
+"recent" half of the trend. Freed pages are returned to the filesystem
+with incremental vacuum (new databases are created with it; older files
+are converted once with `python -m data.retention --enable-incremental-vacuum`).
+
+Sessions with changes the hub has not acknowledged yet are kept until a
+sync ships them; expiring them first would ship them as deletions. When
+sync is off nothing ever acknowledges the change log, so each run empties
+it first.
+"""
+
+import argparse
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+import logging
+
+from data.query_profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+LAST_RUN_KEY = 'retention_last_run'
+
+# Old sessions that are not among their user's newest `keep_recent` and
+# have no changes waiting to be synced (the hub must get them first)
+SELECT_EXPIRED = '''
+    SELECT id FROM training_sessions s
+    WHERE s.start_time < :cutoff
+      AND json_array(s.id) NOT IN (
+          SELECT row_key FROM change_log WHERE table_name = 'training_sessions'
+      )
+      AND (SELECT COUNT(*) FROM (
+              SELECT 1 FROM training_sessions n
+              WHERE n.user_id = s.user_id AND (n.start_time, n.id) > (s.start_time, s.id)
+              LIMIT :keep_recent
+          )) >= :keep_recent
+    ORDER BY s.start_time
+    LIMIT :chunk_size
+'''
+
+ROLLUP_SESSIONS = '''
+    INSERT INTO session_rollups
+    (user_id, template_id, day, sessions, score_sum, accuracy_sum, speed_sum, best_score)
+    SELECT user_id, template_id, substr(start_time, 1, 10),
+           COUNT(*), SUM(score), SUM(accuracy), SUM(speed), MAX(score)
+    FROM training_sessions
+    WHERE id IN (SELECT value FROM json_each(:ids))
+    GROUP BY user_id, template_id, substr(start_time, 1, 10)
+    ON CONFLICT(user_id, template_id, day) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        score_sum = score_sum + excluded.score_sum,
+        accuracy_sum = accuracy_sum + excluded.accuracy_sum,
+        speed_sum = speed_sum + excluded.speed_sum,
+        best_score = MAX(best_score, excluded.best_score)
+'''
+
+ROLLUP_ERRORS = '''
+    INSERT INTO session_rollup_errors (user_id, template_id, day, error_type, count)
+    SELECT s.user_id, s.template_id, substr(s.start_time, 1, 10),
+           COALESCE(CASE WHEN e.type = 'object' THEN json_extract(e.value, '$.type') END, 'unknown'),
+           COUNT(*)
+    FROM training_sessions s, json_each(s.errors) e
+    WHERE s.id IN (SELECT value FROM json_each(:ids))
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT(user_id, template_id, day, error_type) DO UPDATE SET
+        count = count + excluded.count
+'''
+
+
+class RetentionJob:
+    """Rolls up and deletes expired sessions, then reclaims free pages"""
+
+    def __init__(self, db, retention_days: int = 90, keep_recent: int = 5, chunk_size: int = 500,
+                 vacuum_pages: int = 1024, interval_hours: float = 24, sync_enabled: bool = True):
+        self.db = db
+        self.profiler = db.profiler
+        self.retention_days = retention_days
+        self.keep_recent = keep_recent
+        self.chunk_size = chunk_size
+        self.vacuum_pages = vacuum_pages
+        self.interval_hours = interval_hours
+        # Whether a SyncClient ships change_log; if not, retention prunes it
+        self.sync_enabled = sync_enabled
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread that runs the job every `interval_hours`"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lineup-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop after the current chunk; the remaining rows are handled next run"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def seconds_until_due(self) -> float:
+        """Time until the next run is due, based on the last recorded run"""
+        last_run = self.db.get_meta(LAST_RUN_KEY)
+        if not last_run:
+            return 0.0
+        elapsed = (datetime.now() - datetime.fromisoformat(last_run)).total_seconds()
+        return max(0.0, self.interval_hours * 3600 - elapsed)
+
+    def _run(self):
+        while not self._stop.wait(self.seconds_until_due()):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Retention job failed: {e}")
+                if self._stop.wait(min(300, self.interval_hours * 3600)):
+                    break
+
+    def run(self, now: datetime = None) -> Dict[str, int]:
+        """Roll up and delete expired sessions; returns counts of what was done"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=self.retention_days)).isoformat()
+
+        # Queued sessions must not be missed by the keep_recent check
+        self.db.flush()
+
+        changes_pruned = 0 if self.sync_enabled else self._prune_change_log()
+
+        rolled_up = 0
+        while not self._stop.is_set():
+            deleted = self._compact_chunk(cutoff)
+            if not deleted:
+                break
+            rolled_up += deleted
+
+        # Day and week boards outside the retention window are no longer shown
+        with self.db.pool.writer() as conn:
+            self.db.leaderboard.prune(conn, now - timedelta(days=self.retention_days))
+
+        pages_freed = 0 if self._stop.is_set() else self._vacuum()
+        self.db.set_meta(LAST_RUN_KEY, datetime.now().isoformat())
+
+        if rolled_up or pages_freed:
+            logger.info(f"Retention rolled up {rolled_up} sessions, freed {pages_freed} pages")
+        return {'sessions_rolled_up': rolled_up, 'pages_freed': pages_freed, 'changes_pruned': changes_pruned}
+
+    @profiled(name='retention.prune_change_log')
+    def _prune_change_log(self) -> int:
+        """Drop the whole change_log; nothing ships it while sync is disabled"""
+        with self.db.pool.writer() as conn:
+            return conn.execute("DELETE FROM change_log").rowcount
+
+    @profiled(name='retention.compact_chunk')
+    def _compact_chunk(self, cutoff: str) -> int:
+        """Roll up and delete one chunk of expired sessions in one transaction"""
+        with self.db.pool.writer() as conn:
+            ids = [row['id'] for row in conn.execute(SELECT_EXPIRED, {
+                'cutoff': cutoff,
+                'keep_recent': self.keep_recent,
+                'chunk_size': self.chunk_size,
+            })]
+            if not ids:
+                return 0
+
+            params = {'ids': json.dumps(ids)}
+            conn.execute(ROLLUP_SESSIONS, params)
+            conn.execute(ROLLUP_ERRORS, params)
+            self._rollup_sketches(conn, params)
+
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            conn.execute("DELETE FROM training_sessions WHERE id IN (SELECT value FROM json_each(:ids))", params)
+            # Expiry is local housekeeping, not a deletion the hub should replay
+            conn.execute(
+                "DELETE FROM change_log WHERE seq > ? AND table_name = 'training_sessions'", (last_seq,)
+            )
+        return len(ids)
+
+    def _rollup_sketches(self, conn, params: Dict):
+        """Keep expiring sessions in per-template sketches, so a score rebuild can restart from them"""
+        metrics = self.db.REGRADED_METRICS
+        values = {}
+        for row in conn.execute(
+            f"SELECT template_id, {', '.join(metrics)} FROM training_sessions "
+            f"WHERE id IN (SELECT value FROM json_each(:ids))", params
+        ):
+            for metric in metrics:
+                values.setdefault((row['template_id'], metric), []).append(row[metric])
+        if values:
+            self.db.fold_into_sketches(conn, 'template_rollup_sketches', values)
+
+    @profiled(name='retention.vacuum')
+    def _vacuum(self) -> int:
+        """Release up to `vacuum_pages` free pages; returns the number released"""
+        with self.db.pool.writer() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                logger.debug("Incremental vacuum is off; run enable_incremental_vacuum() to turn it on")
+                return 0
+
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+            free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return free_before - free_after
+
+    @profiled(name='retention.enable_incremental_vacuum')
+    def enable_incremental_vacuum(self) -> bool:
+        """Switch a database created before incremental vacuum over to it.
+
+        auto_vacuum can only be changed by rebuilding the whole file, which
+        holds the writer throughout, so this is a maintenance action and is
+        never run by the scheduled job. Returns False if already enabled.
+        """
+        with self.db.pool.writer() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            logger.info("Rebuilding database for incremental auto-vacuum")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database retention maintenance")
+    parser.add_argument('--db', default='lineup_pro.db')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help="rebuild the file once so freed pages can be released incrementally")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from data.database import DatabaseManager
+    db = DatabaseManager(args.db)
+    db.initialize()
+    try:
+        if args.enable_incremental_vacuum:
+            changed = RetentionJob(db).enable_incremental_vacuum()
+            print("Incremental vacuum enabled" if changed else "Incremental vacuum was already enabled")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -164,16 +164,10 @@ def seed_flashcards():
     """Seed initial flashcards data"""
     from data.database import DatabaseManager
 
-    # Save to database
+    # Schema creation and seeding happen in initialize(); unchanged seeds are skipped
     db = DatabaseManager()
     db.initialize()
 
-    # Ensure flashcards table exists
-    db.create_flashcards_table()
-
-    for flashcard in SEED_FLASHCARDS:
-        db.save_flashcard(flashcard)
-
     print(f"Seeded {len(SEED_FLASHCARDS)} flashcards")
 
 
@@ -0,0 +1,218 @@
+"""
+Delta sync of training data to a store hub.
+
+Triggers append the key of every changed row to change_log. The client
+reads entries past the last acknowledged sequence number (the watermark),
+collapses repeated changes to the same row, attaches the current row
+contents (or null for deleted rows) and POSTs the batch as gzip JSON.
+The watermark only advances when the server acknowledges a batch, so an
+interrupted sync resumes by resending the same batch; the server treats
+batches at or below its recorded sequence for a device as duplicates.
+"""
+
+import gzip
+import json
+import random
+import threading
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, List, Tuple
+import logging
+
+from data.query_profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+# table -> (primary key columns, columns shipped to the hub)
+SYNC_TABLES = {
+    'training_sessions': (('id',), '*'),
+    'user_progress': (('user_id',), '*'),
+    'user_template_progress': (('user_id', 'template_id'), '*'),
+    'flashcards': (('id',), 'id, times_reviewed, mastery_level'),
+    'template_sketches': (('template_id', 'metric'), '*'),
+    'flashcard_schedule': (('user_id', 'flashcard_id'), '*'),
+    'flashcard_reviews': (('id',), '*'),
+}
+
+WATERMARK_KEY = 'sync_watermark'
+DEVICE_ID_KEY = 'sync_device_id'
+
+
+class SyncError(Exception):
+    """A batch could not be delivered to the sync server"""
+
+
+class SyncClient:
+    """Pushes change_log batches to `server_url` every `interval_minutes`"""
+
+    def __init__(self, db, server_url: str, batch_size: int = 500, interval_minutes: float = 15,
+                 max_attempts: int = 5, backoff: float = 1.0, timeout: float = 10.0):
+        self.db = db
+        self.profiler = db.profiler
+        self.server_url = server_url
+        self.batch_size = batch_size
+        self.interval_minutes = interval_minutes
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._sync_lock = threading.Lock()
+
+    @property
+    def device_id(self) -> str:
+        """Stable identifier of this device, created on first use"""
+        device_id = self.db.get_meta(DEVICE_ID_KEY)
+        if device_id is None:
+            device_id = uuid.uuid4().hex
+            self.db.set_meta(DEVICE_ID_KEY, device_id)
+        return device_id
+
+    @property
+    def watermark(self) -> int:
+        """Highest change_log sequence number acknowledged by the server"""
+        return int(self.db.get_meta(WATERMARK_KEY, '0'))
+
+    def start(self):
+        """Start the background sync thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lineup-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop the sync thread; an unacknowledged batch is resent next time"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_now()
+            except Exception as e:
+                logger.error(f"Sync failed: {e}")
+            if self._stop.wait(self.interval_minutes * 60):
+                break
+
+    def sync_now(self) -> int:
+        """Push every pending change; returns the number of rows shipped"""
+        with self._sync_lock:
+            # Sessions still in the write-behind queue belong in this sync
+            self.db.flush()
+
+            device_id = self.device_id
+            shipped = 0
+            while not self._stop.is_set():
+                watermark = self.watermark
+                last_seq, changes = self._next_batch(watermark)
+                if not changes:
+                    break
+
+                ack = self._post({
+                    'device_id': device_id,
+                    'after_seq': watermark,
+                    'last_seq': last_seq,
+                    'changes': changes,
+                })
+                if ack < last_seq:
+                    raise SyncError(f"Server acknowledged {ack}, expected {last_seq}")
+
+                self._acknowledge(last_seq)
+                shipped += len(changes)
+
+            if shipped:
+                logger.info(f"Synced {shipped} changed rows")
+            return shipped
+
+    @profiled(name='sync.next_batch')
+    def _next_batch(self, watermark: int) -> Tuple[int, List[Dict]]:
+        """Read the next batch of changes past `watermark` with current row contents"""
+        with self.db.pool.reader() as conn:
+            entries = conn.execute(
+                "SELECT seq, table_name, row_key FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                (watermark, self.batch_size)
+            ).fetchall()
+            if not entries:
+                return watermark, []
+
+            # Later changes to a row supersede earlier ones
+            keys_by_table: Dict[str, Dict[str, None]] = {}
+            for entry in entries:
+                if entry['table_name'] in SYNC_TABLES:
+                    keys_by_table.setdefault(entry['table_name'], {})[entry['row_key']] = None
+
+            changes = []
+            for table, row_keys in keys_by_table.items():
+                rows = self._fetch_rows(conn, table, list(row_keys))
+                for row_key in row_keys:
+                    changes.append({
+                        'table': table,
+                        'key': json.loads(row_key),
+                        'row': rows.get(row_key),
+                    })
+
+        return entries[-1]['seq'], changes
+
+    @staticmethod
+    def _fetch_rows(conn, table: str, row_keys: List[str]) -> Dict[str, Dict]:
+        """Current contents of the given rows keyed by their change_log row_key"""
+        key_columns, columns = SYNC_TABLES[table]
+        key_list = ', '.join(key_columns)
+        extracts = ', '.join(f"json_extract(value, '$[{i}]')" for i in range(len(key_columns)))
+
+        rows = conn.execute(
+            f"SELECT json_array({key_list}) AS row_key, {columns} FROM {table} "
+            f"WHERE ({key_list}) IN (SELECT {extracts} FROM json_each(?))",
+            ('[' + ', '.join(row_keys) + ']',)
+        )
+
+        result = {}
+        for row in rows:
+            data = dict(row)
+            result[data.pop('row_key')] = data
+        return result
+
+    def _post(self, batch: Dict) -> int:
+        """Send one batch, retrying transient failures; returns the acknowledged seq"""
+        body = gzip.compress(json.dumps(batch, separators=(',', ':')).encode('utf-8'))
+        request = urllib.request.Request(
+            self.server_url, data=body, method='POST',
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        )
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return int(json.loads(response.read().decode('utf-8'))['ack'])
+            except urllib.error.HTTPError as e:
+                # Client errors will not succeed on retry
+                if e.code < 500:
+                    raise SyncError(f"Server rejected batch: HTTP {e.code}") from e
+                error = e
+            except (urllib.error.URLError, OSError) as e:
+                error = e
+
+            if attempt == self.max_attempts:
+                break
+            delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning(f"Sync attempt {attempt} failed ({error}); retrying in {delay:.1f}s")
+            if self._stop.wait(delay):
+                break
+
+        raise SyncError(f"Could not reach sync server: {error}")
+
+    @profiled(name='sync.acknowledge')
+    def _acknowledge(self, last_seq: int):
+        """Advance the watermark and drop the delivered change_log entries"""
+        with self.db.pool.writer() as conn:
+            conn.execute(
+                "INSERT INTO app_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (WATERMARK_KEY, str(last_seq))
+            )
+            conn.execute("DELETE FROM change_log WHERE seq <= ?", (last_seq,))
+
@@ -0,0 +1,196 @@
+"""
+Local stand-in for the store sync hub, for testing and development.
+
+Accepts the gzip JSON batches sent by SyncClient on POST and keeps the
+latest copy of every row per device in a SQLite database. Batches are
+idempotent: a batch whose last_seq is not past the device's recorded
+sequence is acknowledged without being applied again.
+
+Run standalone with:  python -m data.sync_server --port 8765 --db hub.db
+"""
+
+import argparse
+import gzip
+import json
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+import logging
+
+from core.quantiles import KLLSketch
+
+logger = logging.getLogger(__name__)
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    """Handles batch uploads for a SyncServer"""
+
+    def do_POST(self):
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            batch = json.loads(body.decode('utf-8'))
+        except (ValueError, OSError) as e:
+            self._respond(400, {'error': f"Malformed batch: {e}"})
+            return
+
+        hub = self.server.hub
+        if hub.fail_requests > 0:
+            hub.fail_requests -= 1
+            self._respond(503, {'error': 'Unavailable'})
+            return
+
+        try:
+            ack = hub.apply_batch(batch)
+        except (KeyError, TypeError) as e:
+            self._respond(400, {'error': f"Malformed batch: {e}"})
+            return
+        self._respond(200, {'ack': ack})
+
+    def _respond(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class SyncServer:
+    """In-process sync hub listening on `host`:`port` (0 picks a free port)"""
+
+    def __init__(self, db_path: str = ":memory:", host: str = "127.0.0.1", port: int = 0):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._init_schema()
+
+        # Number of upcoming requests to answer with 503, for exercising retries
+        self.fail_requests = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), SyncRequestHandler)
+        self.httpd.hub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/sync"
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_devices (
+                    device_id TEXT PRIMARY KEY,
+                    last_seq INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_rows (
+                    device_id TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    row_key TEXT NOT NULL,
+                    payload TEXT,  -- NULL when the row was deleted
+                    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (device_id, table_name, row_key)
+                ) WITHOUT ROWID
+            ''')
+
+    def start(self):
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.1},
+                                        name='lineup-sync-hub', daemon=True)
+        self._thread.start()
+        logger.info(f"Sync hub listening on {self.url}")
+
+    def stop(self):
+        """Stop serving and close the hub database"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self.conn.close()
+
+    def apply_batch(self, batch: Dict) -> int:
+        """Store a batch and return the device's acknowledged sequence number"""
+        device_id = batch['device_id']
+        last_seq = int(batch['last_seq'])
+
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT last_seq FROM sync_devices WHERE device_id = ?", (device_id,)
+            ).fetchone()
+            if row and row['last_seq'] >= last_seq:
+                return row['last_seq']
+
+            self.conn.executemany(
+                "INSERT INTO sync_rows (device_id, table_name, row_key, payload) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(device_id, table_name, row_key) DO UPDATE SET "
+                "payload = excluded.payload, received_at = CURRENT_TIMESTAMP",
+                [
+                    (device_id, change['table'], json.dumps(change['key']),
+                     None if change['row'] is None else json.dumps(change['row']))
+                    for change in batch['changes']
+                ]
+            )
+            self.conn.execute(
+                "INSERT INTO sync_devices (device_id, last_seq) VALUES (?, ?) "
+                "ON CONFLICT(device_id) DO UPDATE SET last_seq = excluded.last_seq",
+                (device_id, last_seq)
+            )
+        return last_seq
+
+    def rows(self, table_name: str) -> List[Dict]:
+        """Latest payload of every received row of `table_name` (None when deleted)"""
+        with self._lock:
+            return [
+                {
+                    'device_id': row['device_id'],
+                    'key': json.loads(row['row_key']),
+                    'row': json.loads(row['payload']) if row['payload'] is not None else None,
+                }
+                for row in self.conn.execute(
+                    "SELECT device_id, row_key, payload FROM sync_rows WHERE table_name = ? "
+                    "ORDER BY device_id, row_key",
+                    (table_name,)
+                )
+            ]
+
+    def merged_sketch(self, template_id: str, metric: str) -> KLLSketch:
+        """Store-wide quantile sketch of a template metric.
+
+        Each device ships its cumulative sketch, so the latest one per device
+        is merged once and nothing is counted twice.
+        """
+        return KLLSketch.merged(
+            KLLSketch.from_json(entry['row']['sketch'])
+            for entry in self.rows('template_sketches')
+            if entry['key'] == [template_id, metric] and entry['row'] is not None
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local LineUp Pro sync hub")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', default='sync_hub.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = SyncServer(args.db, args.host, args.port)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        server.conn.close()
+
+
+if __name__ == '__main__':
+    main()
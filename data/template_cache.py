@@ -0,0 +1,148 @@
+"""
+In-memory cache of compiled SandwichTemplate objects.
+
+Templates are loaded from the normalized templates / template_steps /
+ingredients tables once and then served from a dictionary. The cache keeps
+its own connection and polls PRAGMA data_version, which only changes when
+another connection commits; a content version counter maintained by
+triggers tells template edits apart from unrelated writes.
+"""
+
+import json
+import threading
+from types import MappingProxyType
+from typing import List, Mapping, Optional
+import logging
+
+from core.models import AssemblyStep, Ingredient, IngredientType, SandwichTemplate
+
+logger = logging.getLogger(__name__)
+
+CONTENT_VERSION_KEY = 'template_content_version'
+
+
+class TemplateCache:
+    """Read-through cache of templates, shared by everything using one pool.
+
+    Cached templates are shared objects (steps are stored as tuples) and
+    must be treated as read-only.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._conn = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._content_version = None
+        self._templates: Mapping[str, SandwichTemplate] = MappingProxyType({})
+        self._ordered: List[SandwichTemplate] = []
+
+    @property
+    def version(self) -> Optional[str]:
+        """Content version of the currently cached templates"""
+        self._refresh()
+        return self._content_version
+
+    def get(self, template_id: str) -> Optional[SandwichTemplate]:
+        """Return a cached template by ID"""
+        self._refresh()
+        return self._templates.get(template_id)
+
+    def all(self) -> List[SandwichTemplate]:
+        """Return all cached templates ordered by difficulty, name"""
+        self._refresh()
+        return list(self._ordered)
+
+    def invalidate(self):
+        """Force a reload on next access"""
+        with self._lock:
+            self._data_version = None
+            self._content_version = None
+
+    def close(self):
+        """Return the dedicated connection to the pool; the next access reopens it"""
+        with self._lock:
+            if self._conn is not None:
+                self.pool.close_dedicated(self._conn)
+                self._conn = None
+            self._data_version = None
+
+    def _refresh(self):
+        """Reload if another connection changed template content"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.pool.dedicated_reader()
+
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+
+            row = self._conn.execute(
+                "SELECT value FROM app_meta WHERE key = ?", (CONTENT_VERSION_KEY,)
+            ).fetchone()
+            content_version = row['value'] if row else '0'
+            if content_version == self._content_version:
+                return
+
+            self._load(self._conn)
+            self._content_version = content_version
+
+    def _load(self, conn):
+        """Build every template with two queries"""
+        ingredients = {}
+        steps_by_template = {}
+
+        step_rows = conn.execute('''
+            SELECT s.template_id, s.step_order, s.placement, s.quantity, s.time_target,
+                   s.points, s.critical, i.id AS ingredient_id, i.name, i.type,
+                   i.image_path, i.calories, i.allergens, i.placement_zones
+            FROM template_steps s
+                     JOIN ingredients i ON i.id = s.ingredient_id
+            ORDER BY s.template_id, s.step_order
+        ''').fetchall()
+
+        for row in step_rows:
+            ingredient = ingredients.get(row['ingredient_id'])
+            if ingredient is None:
+                ingredient = Ingredient(
+                    id=row['ingredient_id'],
+                    name=row['name'],
+                    type=IngredientType(row['type']),
+                    image_path=row['image_path'],
+                    calories=row['calories'],
+                    allergens=json.loads(row['allergens']),
+                    placement_zones=json.loads(row['placement_zones'])
+                )
+                ingredients[ingredient.id] = ingredient
+
+            steps_by_template.setdefault(row['template_id'], []).append(AssemblyStep(
+                order=row['step_order'],
+                ingredient=ingredient,
+                placement=row['placement'],
+                quantity=row['quantity'],
+                time_target=row['time_target'],
+                points=row['points'],
+                critical=bool(row['critical'])
+            ))
+
+        templates = {}
+        ordered = []
+        for row in conn.execute("SELECT * FROM templates ORDER BY difficulty, name"):
+            template = SandwichTemplate(
+                id=row['id'],
+                name=row['name'],
+                station=row['station'],
+                difficulty=row['difficulty'],
+                total_time_target=row['total_time_target'],
+                steps=tuple(steps_by_template.get(row['id'], ())),
+                description=row['description'] or "",
+                image_path=row['image_path'] or "",
+                common_errors=tuple(json.loads(row['common_errors']))
+            )
+            templates[template.id] = template
+            ordered.append(template)
+
+        self._templates = MappingProxyType(templates)
+        self._ordered = ordered
+        logger.info(f"Loaded {len(templates)} templates into cache")
@@ -0,0 +1,163 @@
+"""
+Write-behind queue for training sessions.
+
+Sessions are handed off from the UI thread and committed by a single
+background writer thread, in batches, so an fsync never lands on a frame.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+import logging
+
+from core.models import TrainingSession
+
+logger = logging.getLogger(__name__)
+
+
+class _FlushRequest:
+    """Marker put on the queue by flush(); set once everything before it is committed"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.success = True
+
+
+_STOP = object()
+
+
+def _is_busy(error: Exception) -> bool:
+    """True for SQLITE_BUSY / SQLITE_LOCKED, the errors worth retrying as a batch"""
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class WriteBehindQueue:
+    """Buffers session writes and commits them in batches on one writer thread"""
+
+    def __init__(self, db, batch_size: int = 25, flush_interval: float = 2.0):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        # Sessions that could not be written on their own, kept for inspection
+        self.failed: List[TrainingSession] = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the writer thread if it is not running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='lineup-write-behind', daemon=True
+                )
+                self._thread.start()
+
+    def put_session(self, session: TrainingSession):
+        """Queue a session (and the progress update it implies) for writing"""
+        self.start()
+        self._queue.put(session)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far is committed"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+
+        request = _FlushRequest()
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            return False
+        return request.success
+
+    def stop(self, timeout: float = None) -> bool:
+        """Flush pending writes and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+
+        flushed = self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return flushed
+
+    def _run(self):
+        """Writer loop: collect, coalesce, commit on size or time threshold"""
+        pending: Dict[str, TrainingSession] = {}
+        deadline = None
+
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._commit(pending)
+                return
+
+            if isinstance(item, TrainingSession):
+                # A session saved twice before commit only needs its last state
+                pending[item.id] = item
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(pending) < self.batch_size:
+                    continue
+
+            committed = self._commit(pending)
+            if not pending:
+                deadline = None
+            elif deadline is not None:
+                # Retry the failed batch on the next interval
+                deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, _FlushRequest):
+                item.success = committed
+                item.done.set()
+
+    def _commit(self, pending: Dict[str, TrainingSession]) -> bool:
+        """Commit a batch and report whether every session was written.
+
+        If the database is busy or locked the batch stays pending for the
+        next interval. Any other error, including other OperationalErrors
+        such as disk I/O or a missing table, is retried one session at a
+        time so a single bad row cannot hold back the rest; sessions that
+        still fail are logged and moved to `failed`.
+        """
+        if not pending:
+            return True
+
+        try:
+            self.db.write_sessions(list(pending.values()))
+        except Exception as e:
+            if _is_busy(e):
+                logger.error(f"Error writing {len(pending)} queued sessions, will retry: {e}")
+                return False
+            logger.error(f"Error writing {len(pending)} queued sessions, writing one at a time: {e}")
+            return self._commit_each(pending)
+
+        pending.clear()
+        return True
+
+    def _commit_each(self, pending: Dict[str, TrainingSession]) -> bool:
+        """Write sessions individually; busy/locked ones stay pending, broken ones are dropped"""
+        written = True
+        for session_id, session in list(pending.items()):
+            try:
+                self.db.write_sessions([session])
+            except Exception as e:
+                if _is_busy(e):
+                    logger.error(f"Error writing session {session_id}, will retry: {e}")
+                    written = False
+                    continue
+                logger.error(f"Dropping session {session_id} that cannot be written: {e}")
+                self.failed.append(session)
+                written = False
+            del pending[session_id]
+        return written
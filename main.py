@@ -20,7 +20,6 @@ except ImportError:
     print("Warning: KivyMD not available, using regular Kivy")
 
 from kivy.uix.screenmanager import ScreenManager
-from kivy.core.window import Window
 from kivy.logger import Logger
 
 # Import screens with fallbacks
@@ -137,11 +136,73 @@ class LineUpPro(MDApp):
         # Initialize database
         try:
             from data.database import DatabaseManager
-            self.database = DatabaseManager()
+            db_path = self.config_manager.get('paths.database', 'lineup_pro.db') if self.config_manager else 'lineup_pro.db'
+            # Single app-owned manager; screens and widgets borrow it instead of opening their own
+            store_id = self.config_manager.get('data.store_id', 'default') if self.config_manager else 'default'
+            self.database = DatabaseManager(db_path, store_id=store_id)
+            if self.config_manager and self.config_manager.get('app.developer_mode', False):
+                self.database.enable_profiling(
+                    slow_query_ms=self.config_manager.get('data.slow_query_ms', 50)
+                )
+            self.database.initialize()
         except ImportError as e:
             Logger.warning(f"DatabaseManager import failed: {e}")
             self.database = None
 
+        # Trainee whose reviews and sessions this device records
+        self.user_id = self.config_manager.get('app.user_id', 'trainee') if self.config_manager else 'trainee'
+
+        # Scoring resolves templates through the database's template cache
+        from core.scoring_system import ScoringSystem
+        self.scoring_system = ScoringSystem(self.database)
+
+        # Schedule online backups of the database
+        self.backup_scheduler = None
+        if self.database and self.config_manager and self.config_manager.get('data.auto_backup', False):
+            from data.backup import BackupScheduler
+            self.backup_scheduler = BackupScheduler(
+                self.database.db_path,
+                backup_dir=self.config_manager.get('paths.backups', 'backups/'),
+                interval_hours=self.config_manager.get('data.backup_interval_hours', 24),
+                keep=self.config_manager.get('data.backup_keep', 7)
+            )
+            self.backup_scheduler.start()
+
+        # Training history exports, started from the settings screen
+        self.session_exporter = None
+        if self.database:
+            from data.exporter import SessionExporter
+            self.session_exporter = SessionExporter(
+                self.database,
+                export_dir=self.config_manager.get('paths.exports', 'exports/') if self.config_manager else 'exports/'
+            )
+
+        # Push training data to the store hub
+        self.sync_client = None
+        sync_url = self.config_manager.get('data.sync_server_url', '') if self.config_manager else ''
+        if self.database and sync_url and self.config_manager.get('data.sync_enabled', False):
+            from data.sync import SyncClient
+            self.sync_client = SyncClient(
+                self.database, sync_url,
+                interval_minutes=self.config_manager.get('data.sync_interval_minutes', 15)
+            )
+            self.sync_client.start()
+
+        # Roll up and purge old training sessions; off unless data.retention_days is set
+        self.retention_job = None
+        retention_days = self.config_manager.get('data.retention_days', 0) if self.config_manager else 0
+        if self.database and retention_days:
+            from data.retention import RetentionJob
+            self.retention_job = RetentionJob(self.database, retention_days=retention_days,
+                                              sync_enabled=self.sync_client is not None)
+            self.retention_job.start()
+
+        # Regrading and recompute jobs, run on demand from the settings screen
+        self.job_runner = None
+        if self.database and self.config_manager and self.config_manager.get('data.maintenance_jobs', False):
+            from data.jobs import JobRunner
+            self.job_runner = JobRunner(self.database, workers=self.config_manager.get('data.job_workers', 0))
+
         # Create screen manager
         self.sm = ScreenManager()
 
@@ -163,11 +224,24 @@ class LineUpPro(MDApp):
 
     def on_stop(self):
         """Clean up when app stops"""
+        if getattr(self, 'backup_scheduler', None):
+            self.backup_scheduler.stop(timeout=5)
+        if getattr(self, 'sync_client', None):
+            self.sync_client.stop(timeout=5)
+        if getattr(self, 'retention_job', None):
+            self.retention_job.stop(timeout=5)
+        if getattr(self, 'job_runner', None):
+            self.job_runner.stop(timeout=5)
         if hasattr(self, 'database') and self.database:
+            # Commit queued sessions before the pool goes away
+            self.database.flush()
             self.database.close_all_connections()
 
 
 if __name__ == '__main__':
+    # Imported here so processes that re-import this module (job workers) open no window
+    from kivy.core.window import Window
+
     # Set window size for development
     Window.size = (800, 600)
 
@@ -0,0 +1,63 @@
+"""Tests for scheduled online backups"""
+import os
+import sqlite3
+import threading
+import unittest
+from unittest import mock
+
+from data.backup import BackupScheduler
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class TestBackupScheduler(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backup_dir = os.path.join(self.tmp_dir, 'backups')
+        self.scheduler = BackupScheduler(self.db_path, backup_dir=self.backup_dir,
+                                         keep=2, pages_per_step=1, step_pause=0)
+
+    def test_backup_is_complete_copy(self):
+        self.db.save_session(make_session('s1'))
+        self.db.flush(timeout=5)
+
+        path = self.scheduler.backup_now()
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM flashcards").fetchone()[0], 5)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM training_sessions").fetchone()[0], 1)
+        conn.close()
+
+    def test_backup_completes_during_writes(self):
+        done = threading.Event()
+
+        def write_loop():
+            i = 0
+            while not done.is_set():
+                self.db.update_flashcard_progress('flash_001', mastered=i % 2 == 0)
+                i += 1
+
+        writer = threading.Thread(target=write_loop)
+        writer.start()
+        try:
+            path = self.scheduler.backup_now()
+        finally:
+            done.set()
+            writer.join()
+        self.assertIsNotNone(path)
+
+    def test_rotation_keeps_newest(self):
+        paths = [self.scheduler.backup_now() for _ in range(3)]
+        self.assertEqual(self.scheduler.list_backups(), paths[1:])
+
+    def test_failed_integrity_check_is_not_promoted(self):
+        with mock.patch.object(BackupScheduler, '_quick_check', return_value='page 3 is never used'):
+            self.assertIsNone(self.scheduler.backup_now())
+        self.assertEqual(os.listdir(self.backup_dir), [])
+
+    def test_due_immediately_without_backups(self):
+        self.assertEqual(self.scheduler.seconds_until_due(), 0.0)
+        self.scheduler.backup_now()
+        self.assertGreater(self.scheduler.seconds_until_due(), 23 * 3600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Tests for vectorized batch scoring"""
+import copy
+import random
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from core import batch_scoring
+from core.batch_scoring import BatchScorer
+from core.models import TrainingMode
+from core.scoring_system import ScoringSystem
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class TestBatchScoring(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.templates = {t.id: t for t in self.db.get_all_templates()}
+        rng = random.Random(42)
+
+        self.sessions = []
+        for i in range(300):
+            template = rng.choice(list(self.templates.values()))
+            session = make_session(f's{i}', template_id=template.id)
+            session.mode = rng.choice(list(TrainingMode))
+            session.end_time = session.start_time + timedelta(
+                microseconds=rng.randint(1, template.total_time_target * 3 * 10 ** 6))
+            session.completed_steps = rng.sample(range(len(template.steps)), rng.randint(0, len(template.steps)))
+            session.errors = [
+                {'type': 'wrong_order', 'critical': rng.random() < 0.2} if rng.random() < 0.8
+                else {'type': 'overtime'}
+                for _ in range(rng.randint(0, 3))
+            ]
+            self.sessions.append(session)
+        self.sessions[0].end_time = None
+
+        self.db.write_sessions(self.sessions)
+        self.scoring = ScoringSystem(self.db)
+        self.scoring.accuracy_weight = 0.6
+        self.scoring.speed_weight = 0.4
+
+    def expected(self):
+        return [self.scoring.calculate_session_score(copy.deepcopy(s)) for s in self.sessions]
+
+    def assert_matches(self, results):
+        for i, expected in enumerate(self.expected()):
+            self.assertEqual(results.ids[i], self.sessions[i].id)
+            for key in ('score', 'accuracy', 'speed', 'grade', 'passed'):
+                self.assertEqual(getattr(results, key)[i], expected[key], (i, key))
+
+    def test_matches_per_session_scoring(self):
+        scorer = BatchScorer(self.scoring)
+        self.assert_matches(scorer.score(scorer.load_columns(self.db), self.templates))
+
+    def test_python_fallback_matches(self):
+        with mock.patch.object(batch_scoring, 'NUMPY_AVAILABLE', False):
+            scorer = BatchScorer(self.scoring)
+            self.assert_matches(scorer.score(scorer.load_columns(self.db), self.templates))
+
+    def test_missing_template_scores_zero(self):
+        scorer = BatchScorer(self.scoring)
+        results = scorer.score(scorer.load_columns(self.db), {})
+        self.assertEqual(set(results.grade), {'F'})
+        self.assertEqual(max(results.score), 0.0)
+
+    def test_regrade_updates_sessions(self):
+        self.assertEqual(BatchScorer(self.scoring).regrade(self.db), 300)
+
+        expected = self.expected()
+        stored = {row['id']: row for row in self.db.get_user_sessions('user_1', limit=300)}
+        for session, result in zip(self.sessions, expected):
+            self.assertEqual(stored[session.id]['score'], result['score'])
+            self.assertEqual(stored[session.id]['speed'], result['speed'])
+
+    def test_regrade_rebuilds_score_aggregates(self):
+        with self.db.pool.writer() as conn:
+            conn.execute("UPDATE training_sessions SET score = 100, accuracy = 1, speed = 1")
+        self.db.rebuild_score_aggregates()
+        BatchScorer(self.scoring).regrade(self.db)
+
+        expected = self.expected()
+        scores = [result['score'] for result in expected]
+        progress = self.db.get_user_progress('user_1')
+        for template_id, best in progress.templates_mastered.items():
+            self.assertEqual(best, max(score for session, score in zip(self.sessions, scores)
+                                       if session.template_id == template_id))
+        self.assertAlmostEqual(progress.average_accuracy, sum(r['accuracy'] for r in expected) / len(expected))
+        self.assertLessEqual(set(self.db.get_user_trends('user_1').recent_scores), set(scores))
+        self.assertEqual(self.db.get_template_sketch(self.sessions[0].template_id, 'score').n,
+                         sum(s.template_id == self.sessions[0].template_id for s in self.sessions))
+        leader = self.db.leaderboard.top(self.sessions[0].template_id, 'all')[0]
+        self.assertEqual(leader['best_score'], max(score for session, score in zip(self.sessions, scores)
+                                                   if session.template_id == self.sessions[0].template_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,436 @@
+"""Tests for the SQLite data layer"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+from core.models import TrainingSession, TrainingMode
+from data.connection_pool import ConnectionPool
+from data.database import DatabaseManager
+from data.migrations import LATEST_VERSION, migrate
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Creates a fresh database file per test"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'test.db')
+        self.db = DatabaseManager(self.db_path)
+        self.db.initialize()
+
+    def tearDown(self):
+        self.db.close_all_connections()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class TestConnectionPool(DatabaseTestCase):
+    def test_managers_share_pool(self):
+        other = DatabaseManager(self.db_path)
+        self.assertIs(other.pool, self.db.pool)
+        other.close_all_connections()
+
+    def test_closing_one_manager_keeps_the_shared_pool_open(self):
+        other = DatabaseManager(self.db_path)
+        other.get_flashcard_stats()
+        other.close_all_connections()
+        other.close_all_connections()
+
+        self.assertEqual(len(self.db.get_flashcards()), 5)
+        self.assertIs(ConnectionPool.shared(self.db_path), self.db.pool)
+        self.db.pool.release()
+
+    def test_closed_connections_are_forgotten(self):
+        pool = self.db.pool
+        self.db.get_flashcard_stats()
+        self.db.get_confusable_flashcards('flash_001')
+        opened = len(pool._connections)
+        self.db.flashcard_stats.close()
+        self.db.ingredient_index.close()
+        self.assertEqual(len(pool._connections), opened - 2)
+
+        self.db.close_all_connections()
+        self.assertEqual(pool._connections, [])
+
+    def test_wal_mode(self):
+        with self.db.pool.reader() as conn:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_readers_are_read_only(self):
+        with self.db.pool.reader() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM flashcards")
+
+    def test_writer_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.pool.writer() as conn:
+                conn.execute("DELETE FROM flashcards")
+                raise RuntimeError("abort")
+        self.assertEqual(len(self.db.get_flashcards()), 5)
+
+    def test_close_all_connections_drains_pool(self):
+        pool = self.db.pool
+        self.db.close_all_connections()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            with pool.reader():
+                pass
+        self.assertIsNot(ConnectionPool.shared(self.db_path), pool)
+
+
+class TestMigrations(DatabaseTestCase):
+    def test_schema_is_current(self):
+        with self.db.pool.reader() as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], LATEST_VERSION)
+        with self.db.pool.writer() as conn:
+            self.assertEqual(migrate(conn), 0)
+
+    def test_warm_start_does_not_write(self):
+        def no_writes():
+            raise AssertionError("warm start opened a write transaction")
+
+        self.db.pool.writer = no_writes
+        try:
+            self.db.initialize()
+        finally:
+            del self.db.pool.writer
+
+    def test_failed_migration_rolls_back(self):
+        fresh_path = os.path.join(self.tmp_dir, 'fresh.db')
+        pool = ConnectionPool(fresh_path)
+        with self.assertRaises(sqlite3.OperationalError):
+            with pool.writer() as conn:
+                migrate(conn)
+                conn.execute("SELECT * FROM missing_table")
+        with pool.reader() as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 0)
+            self.assertIsNone(conn.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'flashcards'"
+            ).fetchone())
+        pool.close_all()
+
+
+class TestSeeding(DatabaseTestCase):
+    def test_unchanged_seed_is_skipped(self):
+        self.assertEqual(self.db.seed_flashcards(), 0)
+
+    def test_reseed_keeps_progress(self):
+        self.db.update_flashcard_progress('flash_001', mastered=True)
+        self.db.set_meta('flashcards_seed_hash', 'stale')
+
+        self.db.seed_flashcards()
+
+        card = self.db.get_flashcard_by_id('flash_001')
+        self.assertEqual(card.times_reviewed, 1)
+        self.assertAlmostEqual(card.mastery_level, 0.25)
+
+    def test_only_changed_rows_are_applied(self):
+        with self.db.pool.writer() as conn:
+            conn.execute("UPDATE seed_hashes SET content_hash = 'old' WHERE row_id = 'flash_002'")
+            conn.execute("UPDATE flashcards SET dish_name = 'Renamed' WHERE id = 'flash_002'")
+        self.db.set_meta('flashcards_seed_hash', 'stale')
+
+        self.assertEqual(self.db.seed_flashcards(), 1)
+        self.assertEqual(self.db.get_flashcard_by_id('flash_002').dish_name, 'Quarter Pounder')
+
+
+class TestFlashcards(DatabaseTestCase):
+    def test_lists_round_trip_with_commas(self):
+        card = self.db.get_flashcard_by_id('flash_004')
+        self.assertEqual(card.assembly_tips[0], 'Fry at 175°C for 3 minutes')
+        card.assembly_tips = ['Salt, then shake', 'Serve hot']
+        self.db.save_flashcard(card)
+
+        stored = self.db.get_flashcard_by_id('flash_004')
+        self.assertEqual(stored.assembly_tips, ['Salt, then shake', 'Serve hot'])
+        self.assertEqual(stored.ingredients, ['Potatoes', 'Vegetable Oil', 'Salt'])
+
+    def test_empty_tips_stay_empty(self):
+        self.assertEqual(self.db.get_flashcard_by_id('flash_003').assembly_tips, [])
+
+    def test_review_updates_in_place(self):
+        self.assertTrue(self.db.update_flashcard_progress('flash_001', mastered=True))
+        self.assertTrue(self.db.update_flashcard_progress('flash_001', mastered=False))
+        self.assertFalse(self.db.update_flashcard_progress('missing', mastered=True))
+
+        card = self.db.get_flashcard_by_id('flash_001')
+        self.assertEqual(card.times_reviewed, 2)
+        self.assertAlmostEqual(card.mastery_level, 0.15)
+        self.assertEqual(len(card.ingredients), 9)
+
+    def test_review_batch(self):
+        reviews = [('flash_002', True)] * 5 + [('flash_003', False), ('flash_004', True)]
+        self.assertEqual(self.db.update_flashcard_progress_batch(reviews), 7)
+
+        self.assertEqual(self.db.get_flashcard_by_id('flash_002').mastery_level, 1.0)
+        self.assertEqual(self.db.get_flashcard_by_id('flash_003').mastery_level, 0.0)
+        self.assertEqual(self.db.get_flashcard_by_id('flash_003').times_reviewed, 1)
+
+    def test_flashcards_with_ingredient(self):
+        names = [f.dish_name for f in self.db.get_flashcards_with_ingredient('ingredient_pickles')]
+        self.assertEqual(names, ['Big Hit', 'Chicken Sandwich'])
+
+    def test_legacy_comma_columns_are_migrated(self):
+        legacy_path = os.path.join(self.tmp_dir, 'legacy.db')
+        conn = sqlite3.connect(legacy_path)
+        conn.execute('''CREATE TABLE flashcards (
+            id TEXT PRIMARY KEY, dish_name TEXT NOT NULL, dish_name_translation_key TEXT NOT NULL,
+            dish_image TEXT, ingredients TEXT NOT NULL, ingredients_translation_keys TEXT NOT NULL,
+            difficulty TEXT DEFAULT 'medium', category TEXT DEFAULT 'sandwiches', assembly_tips TEXT,
+            created_at TEXT NOT NULL, times_reviewed INTEGER DEFAULT 0, mastery_level REAL DEFAULT 0.0)''')
+        conn.execute(
+            "INSERT INTO flashcards VALUES ('custom_1', 'Wrap', 'dish_wrap', '', 'Tortilla,Chicken', "
+            "'ingredient_tortilla,ingredient_chicken', 'easy', 'sandwiches', 'Roll tight', "
+            "'2026-01-01T00:00:00', 3, 0.5)"
+        )
+        conn.commit()
+        conn.close()
+
+        legacy = DatabaseManager(legacy_path)
+        legacy.initialize()
+        card = legacy.get_flashcard_by_id('custom_1')
+        legacy.close_all_connections()
+
+        self.assertEqual(card.ingredients, ['Tortilla', 'Chicken'])
+        self.assertEqual(card.ingredients_translation_keys, ['ingredient_tortilla', 'ingredient_chicken'])
+        self.assertEqual(card.assembly_tips, ['Roll tight'])
+        self.assertEqual(card.times_reviewed, 3)
+
+
+class TestPagination(DatabaseTestCase):
+    def assert_no_sort(self, sql, params):
+        with self.db.pool.reader() as conn:
+            plan = ' '.join(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_flashcard_pages_match_full_queue(self):
+        self.db.update_flashcard_progress_batch([('flash_002', True), ('flash_005', False)])
+        expected = [f.id for f in self.db.get_flashcards()]
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = self.db.get_flashcards_page(after=cursor, limit=2)
+            seen.extend(f.id for f in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_flashcard_queue_uses_index(self):
+        self.assert_no_sort(
+            'SELECT * FROM flashcards WHERE category = ? AND (mastery_level, times_reviewed, id) > (?, ?, ?) '
+            'ORDER BY mastery_level ASC, times_reviewed ASC, id ASC LIMIT 20',
+            ('sandwiches', 0.0, 0, '')
+        )
+
+    def test_session_pages(self):
+        start = datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(5):
+            self.db.save_session(make_session(f's{i}', start=start + timedelta(minutes=i)))
+        self.db.flush(timeout=5)
+
+        first, cursor = self.db.get_user_sessions_page('user_1', limit=3)
+        second, end = self.db.get_user_sessions_page('user_1', before=cursor, limit=3)
+
+        self.assertEqual([r['id'] for r in first + second], ['s4', 's3', 's2', 's1', 's0'])
+        self.assertIsNone(end)
+        self.assertEqual(first[0]['template_name'], 'Classic Burger')
+
+    def test_session_history_uses_index(self):
+        self.assert_no_sort(
+            'SELECT s.*, t.name FROM training_sessions s JOIN templates t ON s.template_id = t.id '
+            'WHERE s.user_id = ? AND (s.start_time, s.id) < (?, ?) ORDER BY s.start_time DESC, s.id DESC LIMIT 50',
+            ('user_1', '2027', '')
+        )
+
+
+class TestQueryProfiler(DatabaseTestCase):
+    def test_disabled_by_default(self):
+        self.db.get_flashcards()
+        self.assertEqual(self.db.profiler.snapshot(), {})
+
+    def test_records_named_queries(self):
+        self.db.enable_profiling(slow_query_ms=10000)
+        self.db.get_flashcards()
+        self.db.get_flashcards(category='sides')
+        self.db.get_flashcard_by_id('flash_001')
+
+        stats = self.db.profiler.snapshot()
+        self.assertEqual(stats['get_flashcards']['count'], 2)
+        self.assertEqual(stats['get_flashcard_by_id']['count'], 1)
+        self.assertIn('get_flashcards', self.db.dump_query_stats())
+
+    def test_slow_queries_logged_with_plan(self):
+        self.db.enable_profiling(slow_query_ms=0)
+        with self.assertLogs('data.query_profiler', level='WARNING') as logs:
+            self.db.get_flashcards(category='sandwiches')
+
+        output = '\n'.join(logs.output)
+        self.assertIn('Slow query get_flashcards', output)
+        self.assertIn("category = 'sandwiches'", output)
+        self.assertIn('PLAN:', output)
+
+    def test_records_other_data_layer_queries(self):
+        from data.jobs import Job, JobRunner
+        from data.retention import RetentionJob
+
+        self.db.enable_profiling(slow_query_ms=10000)
+        self.db.write_sessions([make_session('s1')])
+        self.db.leaderboard.rank('user_1', 'template_001', 'all')
+        self.db.get_flashcard_stats()
+        self.db.get_confusable_flashcards('flash_001')
+        RetentionJob(self.db, sync_enabled=False).run()
+        JobRunner(self.db, workers=1).run(Job('progress'))
+
+        stats = self.db.profiler.snapshot()
+        for name in ('leaderboard.load', 'leaderboard.rank', 'flashcard_stats.load', 'ingredient_index.refresh',
+                     'retention.prune_change_log', 'retention.compact_chunk', 'leaderboard.prune',
+                     'jobs.weights', 'jobs.merge'):
+            self.assertIn(name, stats)
+
+    def test_disable_stops_recording(self):
+        self.db.enable_profiling(slow_query_ms=10000)
+        self.db.enable_profiling(False)
+        self.db.get_flashcards()
+        self.assertEqual(self.db.profiler.snapshot(), {})
+
+
+class TestTemplates(DatabaseTestCase):
+    def test_seeded_template_round_trip(self):
+        template = self.db.get_template('template_001')
+        self.assertEqual(template.name, 'Classic Burger')
+        self.assertEqual([step.order for step in template.steps], list(range(1, 9)))
+        self.assertEqual(template.steps[1].ingredient.name, 'Beef Patty')
+        self.assertIn('Sauce applied to wrong bun', template.common_errors)
+
+    def test_lookups_reuse_cached_objects(self):
+        self.assertIs(self.db.get_template('template_001'), self.db.get_template('template_001'))
+        self.assertEqual(self.db.get_all_templates(station='Grill')[0].id, 'template_001')
+        self.assertEqual(self.db.get_all_templates(station='Fry'), [])
+
+    def test_unrelated_writes_keep_cache(self):
+        template = self.db.get_template('template_001')
+        self.db.save_session(make_session('s1'))
+        self.db.flush(timeout=5)
+        self.assertIs(self.db.get_template('template_001'), template)
+
+    def test_external_edit_invalidates_cache(self):
+        self.db.get_template('template_001')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE templates SET name = 'Deluxe Burger' WHERE id = 'template_001'")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self.db.get_template('template_001').name, 'Deluxe Burger')
+
+
+def make_session(session_id, user_id='user_1', template_id='template_001', score=80.0,
+                 accuracy=0.8, speed=0.9, start=None):
+    start = start or datetime(2026, 1, 1, 12, 0, 0)
+    return TrainingSession(
+        id=session_id,
+        user_id=user_id,
+        template_id=template_id,
+        mode=TrainingMode.PRACTICE,
+        start_time=start,
+        end_time=start + timedelta(seconds=40),
+        score=score,
+        accuracy=accuracy,
+        speed=speed
+    )
+
+
+class TestWriteBehind(DatabaseTestCase):
+    def test_sessions_committed_on_flush(self):
+        self.db.save_session(make_session('s1', score=70.0, accuracy=0.6))
+        self.db.save_session(make_session('s2', score=90.0, accuracy=1.0))
+        self.assertTrue(self.db.flush(timeout=5))
+
+        progress = self.db.get_user_progress('user_1')
+        self.assertEqual(progress.total_sessions, 2)
+        self.assertAlmostEqual(progress.average_accuracy, 0.8)
+        self.assertEqual(progress.templates_mastered['template_001'], 90.0)
+
+    def test_duplicate_session_is_coalesced(self):
+        self.db.save_session(make_session('s1', score=50.0))
+        self.db.save_session(make_session('s1', score=60.0))
+        self.db.flush(timeout=5)
+
+        progress = self.db.get_user_progress('user_1')
+        self.assertEqual(progress.total_sessions, 1)
+        self.assertEqual(progress.templates_mastered['template_001'], 60.0)
+
+    def test_committed_session_is_not_counted_twice(self):
+        self.db.save_session(make_session('s1', score=50.0))
+        self.db.flush(timeout=5)
+        self.db.save_session(make_session('s1', score=90.0))
+        self.db.write_sessions([make_session('s1', score=95.0), make_session('s2', score=60.0)])
+        self.db.flush(timeout=5)
+
+        progress = self.db.get_user_progress('user_1')
+        self.assertEqual(progress.total_sessions, 2)
+        self.assertEqual(progress.templates_mastered['template_001'], 60.0)
+        self.assertEqual(self.db.get_template_sketch('template_001', 'score').n, 2)
+
+    def test_progress_aggregates_across_batches(self):
+        self.db.save_session(make_session('s1', score=70.0, accuracy=0.5, speed=1.0))
+        self.db.flush(timeout=5)
+        self.db.save_session(make_session('s2', score=60.0, accuracy=1.0, speed=0.4))
+        self.db.save_session(make_session('s3', template_id='template_002', score=85.0, accuracy=0.9, speed=0.7))
+        self.db.flush(timeout=5)
+
+        progress = self.db.get_user_progress('user_1')
+        self.assertEqual(progress.total_sessions, 3)
+        self.assertAlmostEqual(progress.average_accuracy, 0.8)
+        self.assertAlmostEqual(progress.average_speed, 0.7)
+        self.assertEqual(progress.templates_mastered, {'template_001': 70.0, 'template_002': 85.0})
+
+    def test_bad_session_does_not_block_the_batch(self):
+        bad = make_session('s2')
+        bad.errors = [object()]
+        for session in (make_session('s1'), bad, make_session('s3')):
+            self.db.save_session(session)
+        self.assertFalse(self.db.flush(timeout=5))
+
+        self.assertEqual(self.db.get_user_progress('user_1').total_sessions, 2)
+        self.assertEqual(self.db.write_queue.failed, [bad])
+        self.db.save_session(make_session('s4'))
+        self.assertTrue(self.db.flush(timeout=5))
+
+    def test_only_busy_errors_retry_the_batch(self):
+        write_sessions = self.db.write_sessions
+        errors = [sqlite3.OperationalError('database is locked')]
+
+        def flaky(sessions):
+            if errors:
+                raise errors.pop()
+            write_sessions(sessions)
+
+        with mock.patch.object(self.db, 'write_sessions', side_effect=flaky):
+            self.db.save_session(make_session('s1'))
+            self.assertFalse(self.db.flush(timeout=5))
+            self.assertEqual(self.db.write_queue.failed, [])
+
+            # Still pending, written with the next batch
+            self.assertTrue(self.db.flush(timeout=5))
+            self.assertEqual(self.db.get_user_progress('user_1').total_sessions, 1)
+
+            errors.extend([sqlite3.OperationalError('disk I/O error')] * 2)
+            broken = make_session('s2')
+            self.db.save_session(broken)
+            self.assertFalse(self.db.flush(timeout=5))
+            self.assertEqual(self.db.write_queue.failed, [broken])
+
+    def test_close_flushes_pending_sessions(self):
+        self.db.save_session(make_session('s1'))
+        self.db.close_all_connections()
+
+        reopened = DatabaseManager(self.db_path)
+        self.assertEqual(reopened.get_user_progress('user_1').total_sessions, 1)
+        reopened.close_all_connections()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Tests for the streaming session exporter"""
+import csv
+import gzip
+import json
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from data.exporter import SessionExporter
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class TestSessionExporter(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        start = datetime(2026, 3, 1, 9, 0, 0)
+        for i in range(7):
+            session = make_session(
+                f's{i}',
+                user_id='user_1' if i % 2 == 0 else 'user_2',
+                start=start + timedelta(days=i)
+            )
+            session.errors = [{'type': 'wrong_order', 'critical': i == 3}]
+            session.completed_steps = [1, 2, 3]
+            self.db.save_session(session)
+        self.exporter = SessionExporter(self.db, export_dir=self.tmp_dir, batch_size=2)
+
+    def test_ndjson_export(self):
+        path = os.path.join(self.tmp_dir, 'out.ndjson.gz')
+        self.assertEqual(self.exporter.export(path=path), 7)
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([r['id'] for r in rows], [f's{i}' for i in range(7)])
+        self.assertEqual(rows[3]['errors'], [{'type': 'wrong_order', 'critical': True}])
+        self.assertEqual(rows[0]['completed_steps'], [1, 2, 3])
+
+    def test_csv_export_with_filters(self):
+        path = os.path.join(self.tmp_dir, 'out.csv.gz')
+        count = self.exporter.export(
+            fmt='csv', path=path, user_id='user_1',
+            start=datetime(2026, 3, 2), end=datetime(2026, 3, 6)
+        )
+        self.assertEqual(count, 2)
+
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r['id'] for r in rows], ['s2', 's4'])
+        self.assertEqual(rows[0]['mode'], 'practice')
+
+    def test_default_path_and_progress(self):
+        seen = []
+        self.exporter.export(template_id='template_001', progress=seen.append)
+        self.assertEqual(seen, [2, 4, 6, 7])
+        files = [f for f in os.listdir(self.tmp_dir) if f.startswith('sessions_')]
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('.ndjson.gz'))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.exporter.export(fmt='xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Tests for cached flashcard statistics"""
+import unittest
+
+from core.spaced_repetition import Rating
+from data.flashcard_stats import STATS_QUERY, MasteryCounts
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class TestFlashcardStats(DatabaseTestCase):
+    def review(self, flashcard_id, mastered=True):
+        self.db.review_flashcard('user_1', flashcard_id, Rating.GOOD if mastered else Rating.AGAIN)
+
+    def test_matches_the_flashcards(self):
+        for _ in range(4):
+            self.review('flash_001')
+        self.review('flash_002')
+        self.review('flash_003', mastered=False)
+
+        flashcards = self.db.get_flashcards()
+        stats = self.db.get_flashcard_stats()
+        overall = stats.overall
+        self.assertEqual(overall.total, len(flashcards))
+        self.assertEqual(overall.new, sum(f.times_reviewed == 0 for f in flashcards))
+        self.assertEqual(overall.mastered, sum(f.mastery_level > 0.7 for f in flashcards))
+        self.assertEqual((overall.new, overall.learning, overall.mastered), (len(flashcards) - 3, 2, 1))
+        self.assertEqual(overall.new + overall.learning + overall.familiar + overall.mastered, overall.total)
+        self.assertAlmostEqual(overall.average_mastery, sum(f.mastery_level for f in flashcards) / len(flashcards))
+        self.assertEqual(overall.reviews, 6)
+
+        for key, groups in (('category', stats.by_category), ('difficulty', stats.by_difficulty)):
+            self.assertEqual(sum(groups.values(), MasteryCounts()), overall)
+            for value, counts in groups.items():
+                self.assertEqual(counts.total, sum(getattr(f, key) == value for f in flashcards))
+
+    def test_cached_until_a_review(self):
+        stats = self.db.get_flashcard_stats()
+        self.assertIs(self.db.get_flashcard_stats(), stats)
+
+        # Writes that do not touch flashcards keep the cached result
+        self.db.write_sessions([make_session('s1')])
+        self.assertIs(self.db.get_flashcard_stats(), stats)
+
+        self.review('flash_001')
+        updated = self.db.get_flashcard_stats()
+        self.assertEqual(updated.overall.new, stats.overall.new - 1)
+
+    def test_empty_deck(self):
+        with self.db.pool.writer() as conn:
+            for table in ('flashcard_ingredients', 'flashcard_tips', 'flashcard_schedule', 'flashcards'):
+                conn.execute(f"DELETE FROM {table}")
+
+        overall = self.db.get_flashcard_stats().overall
+        self.assertEqual(overall, MasteryCounts())
+        self.assertEqual((overall.average_mastery, overall.mastered_fraction), (0.0, 0.0))
+
+    def test_single_index_scan(self):
+        with self.db.pool.reader() as conn:
+            plan = ' '.join(row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN " + STATS_QUERY))
+        self.assertIn('COVERING INDEX', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
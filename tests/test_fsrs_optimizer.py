@@ -0,0 +1,197 @@
+"""Tests for the flashcard review log and offline FSRS fitting"""
+import sqlite3
+import unittest
+from datetime import datetime, timedelta
+
+from core.fsrs_optimizer import NUMPY_AVAILABLE
+from core.spaced_repetition import DEFAULT_WEIGHTS, FSRS, Rating
+from data.database import DatabaseManager
+from tests.test_database import DatabaseTestCase
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+    from core.fsrs_optimizer import FSRSOptimizer, ReviewHistories
+
+NOW = datetime(2026, 3, 1, 9, 0, 0)
+DAY = 86400
+
+
+def simulate(n_cards, weights=DEFAULT_WEIGHTS, n_reviews=8, seed=1):
+    """Review columns of simulated learners that recall with the model's probability"""
+    rng = np.random.default_rng(seed)
+    fsrs = FSRS(weights)
+    columns = ([], [], [], [])
+    for card in range(n_cards):
+        state, now = None, NOW + timedelta(hours=int(rng.integers(0, 24 * 30)))
+        for _ in range(n_reviews):
+            if state is None:
+                rating = int(rng.choice([1, 2, 3, 4], p=[0.3, 0.1, 0.5, 0.1]))
+            elif rng.random() < fsrs.retrievability(state, now):
+                rating = int(rng.choice([2, 3, 4], p=[0.2, 0.7, 0.1]))
+            else:
+                rating = 1
+            for column, value in zip(columns, ('user_1', f'card_{card:05d}', int(now.timestamp()), rating)):
+                column.append(value)
+            state = fsrs.review(state, Rating(rating), now)
+            # Learners come back early or late
+            now = state.due_at + timedelta(days=float(rng.uniform(-0.3, 1.5) * state.interval_days))
+    return columns
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy not installed")
+class TestReviewHistories(unittest.TestCase):
+    def test_first_review_of_each_day_is_kept(self):
+        histories = ReviewHistories.from_columns(
+            ['u1'] * 5 + ['u2'] * 2,
+            ['a', 'a', 'a', 'a', 'b', 'a', 'a'],
+            [0, 3600, DAY, 3 * DAY, 0, 0, 100],
+            [1, 3, 3, 4, 3, 3, 3],
+        )
+        # u1/b and u2/a each span a single day and predict nothing
+        self.assertEqual(histories.count, 1)
+        self.assertEqual(histories.predictions, 2)
+        self.assertEqual(histories.delta.tolist(), [0, 1, 2])
+        self.assertEqual(histories.rating.tolist(), [1, 3, 4])
+        self.assertEqual(histories.step.tolist(), [0, 1, 2])
+
+    def test_empty(self):
+        histories = ReviewHistories.from_columns([], [], [], [])
+        self.assertEqual((histories.count, histories.predictions), (0, 0))
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy not installed")
+class TestFSRSOptimizer(unittest.TestCase):
+    def test_gradient_matches_finite_differences(self):
+        optimizer = FSRSOptimizer(batch_size=64)
+        histories = ReviewHistories.from_columns(*simulate(100))
+        batch = next(optimizer._batches(histories, shuffle=False))
+        w = np.array(DEFAULT_WEIGHTS)
+
+        _, grad, count = optimizer._evaluate(w, batch)
+        self.assertGreater(count, 0)
+        for i in range(len(w)):
+            eps = 1e-6 * max(1.0, w[i])
+            step = np.eye(len(w))[i] * eps
+            numeric = (optimizer._evaluate(w + step, batch)[0] - optimizer._evaluate(w - step, batch)[0]) / (2 * eps)
+            self.assertAlmostEqual(grad[i], numeric, delta=1e-4 * max(1.0, abs(numeric)))
+
+    def test_loss_matches_the_scheduler(self):
+        columns = simulate(5)
+        histories = ReviewHistories.from_columns(*columns)
+        fsrs, total, state, card = FSRS(), 0.0, None, None
+        for _, card_id, reviewed_at, rating in zip(*columns):
+            now = datetime.fromtimestamp(reviewed_at // DAY * DAY)
+            if card_id != card:
+                state, card = None, card_id
+            elif now == state.last_review:
+                continue
+            else:
+                r = fsrs.retrievability(state, now)
+                total -= np.log(r if rating > 1 else 1 - r)
+            state = fsrs.review(state, Rating(rating), now)
+
+        self.assertAlmostEqual(FSRSOptimizer().log_loss(histories), total / histories.predictions)
+
+    def test_fit_recovers_better_weights(self):
+        true_weights = list(DEFAULT_WEIGHTS)
+        true_weights[2], true_weights[8], true_weights[10] = 8.0, 1.2, 1.6
+        histories = ReviewHistories.from_columns(*simulate(1500, true_weights, seed=2))
+        optimizer = FSRSOptimizer(epochs=3)
+
+        result = optimizer.fit(histories)
+        self.assertLess(result.log_loss_after, result.log_loss_before)
+        self.assertLess(result.log_loss_after, optimizer.log_loss(histories, true_weights) + 0.005)
+        weights = np.array(result.weights)
+        self.assertTrue(np.all((optimizer.lower <= weights) & (weights <= optimizer.upper)))
+
+
+class TestReviewLog(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.enroll_flashcards('user_1', now=NOW)
+
+    def reviews(self):
+        with self.db.pool.reader() as conn:
+            return [tuple(row) for row in conn.execute(
+                "SELECT user_id, flashcard_id, reviewed_at, rating, elapsed_days, duration_ms "
+                "FROM flashcard_reviews ORDER BY id")]
+
+    def test_reviews_are_logged(self):
+        self.db.review_flashcard('user_1', 'flash_001', Rating.AGAIN, now=NOW, duration_ms=4200)
+        self.db.review_flashcard('user_1', 'flash_001', Rating.GOOD, now=NOW + timedelta(hours=12))
+        self.db.review_flashcard('user_1', 'missing', Rating.GOOD, now=NOW)
+
+        stamp = int(NOW.timestamp())
+        self.assertEqual(self.reviews(), [
+            ('user_1', 'flash_001', stamp, 1, None, 4200),
+            ('user_1', 'flash_001', stamp + 12 * 3600, 3, 0.5, None),
+        ])
+
+    def test_log_is_append_only(self):
+        self.db.review_flashcard('user_1', 'flash_001', Rating.GOOD, now=NOW)
+        for statement in ("UPDATE flashcard_reviews SET rating = 4", "DELETE FROM flashcard_reviews"):
+            with self.assertRaises(sqlite3.IntegrityError):
+                with self.db.pool.writer() as conn:
+                    conn.execute(statement)
+        self.assertEqual(len(self.reviews()), 1)
+
+    def test_parameters_are_per_store_and_reloaded(self):
+        weights = list(DEFAULT_WEIGHTS)
+        weights[2] = 6.0
+        self.db.save_scheduler_parameters(weights, reviews=1234, log_loss=0.31)
+        self.assertEqual(self.db.scheduler.w, tuple(weights))
+
+        reopened = DatabaseManager(self.db_path)
+        reopened.initialize()
+        self.assertEqual(reopened.scheduler.w, tuple(weights))
+
+        other = DatabaseManager(self.db_path, store_id='store_2')
+        self.assertFalse(other.load_scheduler_parameters())
+        self.assertEqual(other.scheduler.w, DEFAULT_WEIGHTS)
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "NumPy not installed")
+    def test_tune(self):
+        optimizer = FSRSOptimizer(epochs=2)
+        self.assertIsNone(optimizer.tune(self.db))
+
+        true_weights = list(DEFAULT_WEIGHTS)
+        true_weights[2], true_weights[10] = 8.0, 1.6
+        users, cards, times, ratings = simulate(400, true_weights, seed=4)
+        with self.db.pool.writer() as conn:
+            conn.executemany(
+                "INSERT INTO flashcard_reviews (user_id, flashcard_id, reviewed_at, rating) VALUES (?, ?, ?, ?)",
+                zip(users, cards, times, ratings)
+            )
+
+        result = optimizer.tune(self.db, min_reviews=1000)
+        self.assertLess(result.log_loss_after, result.log_loss_before)
+        self.assertEqual(self.db.scheduler.w, result.weights)
+        with self.db.pool.reader() as conn:
+            row = conn.execute("SELECT reviews, log_loss FROM scheduler_parameters WHERE store_id = ?",
+                               (self.db.store_id,)).fetchone()
+        self.assertEqual(tuple(row), (result.reviews, result.log_loss_after))
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "NumPy not installed")
+    def test_fit_uses_only_the_stores_reviews(self):
+        self.db.review_flashcard('user_1', 'flash_001', Rating.GOOD, now=NOW)
+        with self.db.pool.reader() as conn:
+            self.assertEqual(conn.execute("SELECT store_id FROM flashcard_reviews").fetchone()[0],
+                             self.db.store_id)
+
+        users, cards, times, ratings = simulate(100, seed=5)
+        with self.db.pool.writer() as conn:
+            conn.executemany(
+                "INSERT INTO flashcard_reviews (user_id, flashcard_id, reviewed_at, rating, store_id) "
+                "VALUES (?, ?, ?, ?, 'store_2')",
+                zip(users, cards, times, ratings)
+            )
+
+        optimizer = FSRSOptimizer()
+        self.assertEqual(optimizer.load_histories(self.db).predictions, 0)
+        other = DatabaseManager(self.db_path, store_id='store_2')
+        self.assertGreater(optimizer.load_histories(other).predictions, 0)
+        other.close_all_connections()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""Tests for the ingredient inverted index and confusable-dish search"""
+import random
+import unittest
+from dataclasses import replace
+
+from core.ingredient_similarity import IngredientIndex
+from tests.test_database import DatabaseTestCase
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b)
+
+
+class TestIngredientIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = IngredientIndex()
+        self.index.add('burger', ['bun', 'patty', 'cheese', 'pickles', 'onions'])
+        self.index.add('cheeseburger', ['bun', 'patty', 'cheese', 'cheese', 'pickles', 'ketchup'])
+        self.index.add('chicken', ['bun', 'chicken', 'mayo', 'lettuce'])
+        self.index.add('fries', ['potatoes', 'salt'])
+
+    def test_containing(self):
+        self.assertEqual(self.index.containing('pickles'), {'burger', 'cheeseburger'})
+        self.assertEqual(self.index.containing('bun', 'mayo'), {'chicken'})
+        self.assertEqual(self.index.containing('bun', 'salt'), set())
+        self.assertEqual(self.index.containing('missing'), set())
+
+    def test_similar_ranks_by_jaccard(self):
+        similar = self.index.similar('burger', k=2)
+        self.assertEqual([dish for dish, _ in similar], ['cheeseburger', 'chicken'])
+        self.assertAlmostEqual(similar[0][1], 4 / 6)
+        self.assertEqual(self.index.similar('fries'), [])
+        self.assertEqual(self.index.similar('missing'), [])
+        self.assertEqual(self.index.similar('burger', min_similarity=0.5), similar[:1])
+
+    def test_replace_and_remove(self):
+        self.index.add('fries', ['potatoes', 'salt', 'pickles'])
+        self.assertEqual(self.index.containing('pickles'), {'burger', 'cheeseburger', 'fries'})
+
+        self.index.add('cheeseburger', ['potatoes', 'salt'])
+        self.assertEqual(self.index.similar('fries', k=1)[0][0], 'cheeseburger')
+        self.assertNotIn('cheeseburger', self.index.containing('bun'))
+
+        self.index.remove('cheeseburger')
+        self.index.remove('cheeseburger')
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn('cheeseburger', [dish for dish, _ in self.index.similar('burger')])
+        self.assertNotIn('ketchup', self.index.postings)
+
+    def test_signature_agreement_estimates_jaccard(self):
+        rng = random.Random(2)
+        vocab = [f'i{n}' for n in range(60)]
+        for _ in range(20):
+            a, b = rng.sample(vocab, 12), rng.sample(vocab, 12)
+            sig_a, sig_b = self.index.signature(a), self.index.signature(b)
+            agreement = sum(x == y for x, y in zip(sig_a, sig_b)) / self.index.num_perm
+            self.assertAlmostEqual(agreement, jaccard(a, b), delta=0.15)
+
+    def test_finds_near_duplicates_in_a_large_menu(self):
+        rng = random.Random(4)
+        vocab = [f'i{n}' for n in range(300)]
+        index = IngredientIndex()
+        dishes = {f'd{n}': rng.sample(vocab, 8) for n in range(2000)}
+        for n in range(50):
+            variant = list(dishes[f'd{n}'])
+            variant[0] = rng.choice(vocab[200:])
+            dishes[f'v{n}'] = variant
+        for dish, keys in dishes.items():
+            index.add(dish, keys)
+
+        found = sum(index.similar(f'v{n}', k=1)[0][0] == f'd{n}' for n in range(50))
+        self.assertGreaterEqual(found, 48)
+
+    def test_band_layout(self):
+        self.assertEqual(IngredientIndex(num_perm=128, bands=32).rows, 4)
+        with self.assertRaises(ValueError):
+            IngredientIndex(num_perm=100, bands=64)
+
+
+class TestIngredientIndexCache(DatabaseTestCase):
+    def test_burgers_are_confusable(self):
+        similar = self.db.get_confusable_flashcards('flash_001', k=1)
+        self.assertEqual([f.id for f, _ in similar], ['flash_002'])
+        self.assertAlmostEqual(similar[0][1], 3 / 13)
+        self.assertEqual(similar[0][0].dish_name, 'Quarter Pounder')
+        self.assertEqual(self.db.get_confusable_flashcards('missing'), [])
+
+    def test_matches_the_ingredient_query(self):
+        for key in ('ingredient_pickles', 'ingredient_onions', 'ingredient_lettuce'):
+            expected = sorted(f.id for f in self.db.get_flashcards_with_ingredient(key))
+            self.assertEqual(self.db.ingredient_index.flashcards_with(key), expected)
+
+    def test_flashcard_changes_are_applied_incrementally(self):
+        index = self.db.ingredient_index
+        self.assertEqual(index.flashcards_with('ingredient_pickles'), ['flash_001', 'flash_003'])
+        built = index._index
+
+        card = self.db.get_flashcard_by_id('flash_004')
+        self.db.save_flashcard(replace(
+            card,
+            ingredients=card.ingredients + ['Pickles'],
+            ingredients_translation_keys=card.ingredients_translation_keys + ['ingredient_pickles']
+        ))
+        new_card = replace(card, id='flash_new', ingredients_translation_keys=['ingredient_pickles'])
+        self.db.save_flashcard(new_card)
+
+        self.assertEqual(index.flashcards_with('ingredient_pickles'),
+                         ['flash_001', 'flash_003', 'flash_004', 'flash_new'])
+        self.assertIs(index._index, built)
+
+        with self.db.pool.writer() as conn:
+            conn.execute("DELETE FROM flashcard_ingredients WHERE flashcard_id = 'flash_new'")
+            conn.execute("DELETE FROM flashcards WHERE id = 'flash_new'")
+        self.assertEqual(index.flashcards_with('ingredient_pickles'), ['flash_001', 'flash_003', 'flash_004'])
+        self.assertNotIn('flash_new', index._index)
+
+
+    def change_log_size(self):
+        with self.db.pool.reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM flashcard_content_changes").fetchone()[0]
+
+    def add_pickles(self, flashcard_id):
+        card = self.db.get_flashcard_by_id('flash_004')
+        self.db.save_flashcard(replace(card, id=flashcard_id, ingredients_translation_keys=['ingredient_pickles']))
+
+    def test_applied_changes_are_pruned(self):
+        index = self.db.ingredient_index
+        index.flashcards_with('ingredient_pickles')
+        self.assertEqual(self.change_log_size(), 0)
+
+        self.add_pickles('flash_new')
+        self.assertGreater(self.change_log_size(), 0)
+        self.assertIn('flash_new', index.flashcards_with('ingredient_pickles'))
+        self.assertEqual(self.change_log_size(), 0)
+
+    def test_rebuilds_when_another_connection_pruned_the_log(self):
+        index = self.db.ingredient_index
+        index.flashcards_with('ingredient_pickles')
+        built = index._index
+
+        self.add_pickles('flash_new')
+        with self.db.pool.writer() as conn:
+            conn.execute("DELETE FROM flashcard_content_changes")
+        self.assertIn('flash_new', index.flashcards_with('ingredient_pickles'))
+        self.assertIsNot(index._index, built)
+
+
+if __name__ == '__main__':
+    unittest.main()
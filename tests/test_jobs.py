@@ -0,0 +1,217 @@
+"""Tests for parallel maintenance jobs"""
+import json
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from core.batch_scoring import BatchScorer
+from data import jobs
+from data.jobs import Job, JobRunner, split_ranges
+from data.retention import RetentionJob
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class TestSplitRanges(unittest.TestCase):
+    def test_ranges_cover_keys_in_order(self):
+        weights = [(f'u{i:02d}', 1) for i in range(10)]
+        self.assertEqual(split_ranges(weights, 3), [('u00', 'u03'), ('u04', 'u06'), ('u07', 'u09')])
+
+    def test_heavy_keys_get_their_own_range(self):
+        weights = [('a', 1), ('b', 100), ('c', 1), ('d', 1)]
+        self.assertEqual(split_ranges(weights, 2), [('a', 'b'), ('c', 'd')])
+
+    def test_edge_cases(self):
+        self.assertEqual(split_ranges([], 4), [])
+        self.assertEqual(split_ranges([('a', 5)], 4), [('a', 'a')])
+
+
+class JobTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(3)
+        templates = [t.id for t in self.db.get_all_templates()]
+        self.sessions = []
+        for i in range(120):
+            session = make_session(f's{i:03d}', user_id=f'user_{i % 7}', template_id=rng.choice(templates),
+                                   score=rng.uniform(30, 100), accuracy=rng.random(), speed=rng.random(),
+                                   start=datetime(2026, 1, 1) + timedelta(hours=i))
+            session.errors = [{'type': rng.choice(['wrong_order', 'overtime'])} for _ in range(rng.randint(0, 2))]
+            self.sessions.append(session)
+        self.db.write_sessions(self.sessions)
+
+    def snapshot(self, table, order):
+        with self.db.pool.reader() as conn:
+            return [tuple(row) for row in conn.execute(f"SELECT * FROM {table} ORDER BY {order}")]
+
+    def progress(self):
+        with self.db.pool.reader() as conn:
+            users = [tuple(row) for row in conn.execute(
+                "SELECT user_id, total_sessions, average_accuracy, average_speed FROM user_progress ORDER BY 1")]
+            templates = [tuple(row) for row in conn.execute(
+                "SELECT user_id, template_id, best_score, sessions FROM user_template_progress ORDER BY 1, 2")]
+        return users, templates
+
+    def trends(self):
+        return {user_id: json.loads(state) for user_id, state, _ in self.snapshot('user_trends', 'user_id')}
+
+    def wipe(self):
+        with self.db.pool.writer() as conn:
+            conn.execute("UPDATE user_progress SET total_sessions = 0, average_accuracy = 0, average_speed = 0")
+            conn.execute("UPDATE user_template_progress SET best_score = 0, sessions = 0")
+            conn.execute("DELETE FROM user_trends")
+
+    def assertProgressEqual(self, actual, expected):
+        (users, templates), (expected_users, expected_templates) = actual, expected
+        self.assertEqual(templates, expected_templates)
+        self.assertEqual([u[:2] for u in users], [u[:2] for u in expected_users])
+        for user, expected_user in zip(users, expected_users):
+            self.assertAlmostEqual(user[2], expected_user[2])
+            self.assertAlmostEqual(user[3], expected_user[3])
+
+    def assertTrendsEqual(self, actual, expected):
+        self.assertEqual(actual.keys(), expected.keys())
+        for user_id, state in expected.items():
+            self.assertEqual(actual[user_id]['recent_scores'], state['recent_scores'])
+            self.assertEqual(actual[user_id]['error_counts'], state['error_counts'])
+            for metric in ('score', 'accuracy', 'speed'):
+                for got, want in zip(actual[user_id][metric], state[metric]):
+                    self.assertAlmostEqual(got, want)
+
+
+class TestJobsInProcess(JobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.runner = JobRunner(self.db, workers=1, ranges_per_worker=3)
+
+    def run_job(self, name):
+        job = self.runner.run(Job(name))
+        self.assertEqual(job.state, 'done', job.error)
+        self.assertEqual(job.done, job.total)
+        return job
+
+    def test_progress_is_recomputed(self):
+        expected = self.progress()
+        self.wipe()
+        self.run_job('progress')
+        self.assertProgressEqual(self.progress(), expected)
+
+    def test_progress_includes_rollups(self):
+        RetentionJob(self.db, retention_days=1, keep_recent=2, sync_enabled=False).run(now=datetime(2026, 3, 1))
+        expected = self.progress()
+        self.wipe()
+        self.run_job('progress')
+        self.assertProgressEqual(self.progress(), expected)
+
+    def test_trends_are_rebuilt(self):
+        expected = self.trends()
+        self.wipe()
+        self.run_job('trends')
+        self.assertTrendsEqual(self.trends(), expected)
+
+    def test_regrade_updates_scores(self):
+        scorer = BatchScorer()
+        expected = scorer.score(scorer.load_columns(self.db), {t.id: t for t in self.db.get_all_templates()})
+        with self.db.pool.writer() as conn:
+            conn.execute("UPDATE training_sessions SET score = -1")
+        job = self.run_job('regrade')
+
+        self.assertEqual(job.updated, len(self.sessions))
+        with self.db.pool.reader() as conn:
+            scores = dict(conn.execute("SELECT id, score FROM training_sessions").fetchall())
+        self.assertEqual(scores, {i: float(score) for i, score in zip(expected.ids, expected.score)})
+        # Leaderboards are rebuilt from the new scores
+        best = self.db.leaderboard.top(self.sessions[0].template_id, 'all')[0]
+        self.assertEqual(best['best_score'], scores[best['session_id']])
+
+        # So is everything else aggregated from scores
+        best = {}
+        for session in self.sessions:
+            key = (session.user_id, session.template_id)
+            best[key] = max(best.get(key, 0.0), scores[session.id])
+        self.assertEqual({(u, t): b for u, t, b, _ in self.progress()[1]}, best)
+        self.assertLessEqual(set(self.trends()['user_0']['recent_scores']), set(scores.values()))
+        self.assertGreaterEqual(self.db.get_template_percentiles(self.sessions[0].template_id, 'score', (0.0,))[0.0], 0)
+
+    def test_regrade_keeps_rolled_up_sketch_history(self):
+        RetentionJob(self.db, retention_days=1, keep_recent=2, sync_enabled=False).run(now=datetime(2026, 3, 1))
+        self.run_job('regrade')
+
+        for template_id in {session.template_id for session in self.sessions}:
+            sessions = sum(session.template_id == template_id for session in self.sessions)
+            self.assertEqual(self.db.get_template_sketch(template_id, 'score').n, sessions)
+            self.assertEqual(self.db.get_template_sketch(template_id, 'duration').n, sessions)
+
+    def test_score_rebuild_commits_per_range(self):
+        self.wipe()
+        with mock.patch.object(self.runner, '_merge', wraps=self.runner._merge) as merge:
+            self.runner.rebuild_score_aggregates()
+        self.assertGreater(merge.call_count, 2)
+        self.assertEqual(len(self.trends()), 7)
+
+    def test_score_rebuild_only_touches_given_templates(self):
+        regraded, untouched = self.sessions[0].template_id, 'other_template'
+        self.db.write_sessions([make_session(f'other_{i}', template_id=untouched, score=50.0 + i)
+                                for i in range(3)])
+        with self.db.pool.writer() as conn:
+            conn.execute("UPDATE template_sketches SET sketch = '{}' WHERE template_id IN (?, ?)",
+                         (regraded, untouched))
+        self.runner.rebuild_score_aggregates([regraded])
+
+        self.assertEqual(self.db.get_template_sketch(regraded, 'score').n,
+                         sum(session.template_id == regraded for session in self.sessions))
+        with self.db.pool.reader() as conn:
+            self.assertEqual(conn.execute(
+                "SELECT sketch FROM template_sketches WHERE template_id = ? AND metric = 'score'", (untouched,)
+            ).fetchone()[0], '{}')
+
+    def test_sessions_committed_after_the_snapshot_are_kept(self):
+        key_range = ('user_0', 'user_6')
+        with self.db.pool.reader() as conn:
+            shards = {name: jobs.read_shard(conn, name, key_range, {}) for name in ('progress', 'trends')}
+
+        late = [make_session(f'late_{i}', user_id='user_2', score=99.0, accuracy=0.5,
+                             start=datetime(2026, 2, 1) + timedelta(hours=i)) for i in range(3)]
+        self.db.write_sessions(late)
+        expected_progress, expected_trends = self.progress(), self.trends()
+
+        with self.db.pool.writer() as conn:
+            jobs.merge_progress(conn, key_range, *shards['progress'])
+            jobs.merge_trends(conn, key_range, *shards['trends'])
+        self.assertProgressEqual(self.progress(), expected_progress)
+        self.assertTrendsEqual(self.trends(), expected_trends)
+
+    def test_cancelled_job_stops_merging(self):
+        self.wipe()
+        job = Job('trends')
+        self.runner.run(job, on_progress=lambda j: j.cancel() if j.done == 1 else None)
+
+        self.assertEqual(job.state, 'cancelled')
+        self.assertEqual(job.done, 1)
+        self.assertLess(len(self.trends()), 7)
+
+    def test_unknown_job(self):
+        with self.assertRaises(ValueError):
+            self.runner.start('nope')
+
+
+class TestJobsOnProcessPool(JobTestCase):
+    def test_workers_produce_the_same_results(self):
+        expected_progress, expected_trends = self.progress(), self.trends()
+        self.wipe()
+
+        runner = JobRunner(self.db, workers=2, ranges_per_worker=2)
+        updates = []
+        for name in ('progress', 'trends'):
+            job = runner.start(name, on_progress=lambda j: updates.append((j.name, j.done)))
+            self.assertTrue(job.wait(timeout=60))
+            self.assertEqual(job.state, 'done', job.error)
+            self.assertEqual(job.total, 4)
+
+        self.assertProgressEqual(self.progress(), expected_progress)
+        self.assertTrendsEqual(self.trends(), expected_trends)
+        self.assertIn(('trends', 4), updates)
+
+
+if __name__ == '__main__':
+    unittest.main()
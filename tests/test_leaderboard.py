@@ -0,0 +1,96 @@
+"""Tests for incrementally maintained leaderboards"""
+import unittest
+from datetime import datetime, timedelta
+
+from data.database import DatabaseManager
+from data.leaderboard import period_start
+from tests.test_database import DatabaseTestCase, make_session
+
+MONDAY = datetime(2026, 3, 2, 12, 0, 0)
+
+
+class TestPeriods(unittest.TestCase):
+    def test_period_starts(self):
+        when = MONDAY + timedelta(days=3)
+        self.assertEqual(period_start('day', when), '2026-03-05')
+        self.assertEqual(period_start('week', when), '2026-03-02')
+        self.assertEqual(period_start('month', when), '2026-03-01')
+        self.assertEqual(period_start('all', when), '')
+        with self.assertRaises(ValueError):
+            period_start('year', when)
+
+
+class TestLeaderboard(DatabaseTestCase):
+    def save(self, session_id, user_id, score, start=MONDAY):
+        self.db.save_session(make_session(session_id, user_id=user_id, score=score, start=start))
+
+    def test_best_score_per_user(self):
+        self.save('s1', 'alice', 70.0)
+        self.save('s2', 'alice', 90.0)
+        self.save('s3', 'alice', 80.0)
+        self.save('s4', 'bob', 85.0)
+        self.db.flush(timeout=5)
+
+        board = self.db.leaderboard.top('template_001', 'week', when=MONDAY)
+        self.assertEqual([(e['user_id'], e['best_score']) for e in board], [('alice', 90.0), ('bob', 85.0)])
+        self.assertEqual(board[0]['session_id'], 's2')
+
+    def test_windows_are_separate(self):
+        self.save('s1', 'alice', 70.0)
+        self.save('s2', 'bob', 60.0, start=MONDAY + timedelta(days=7))
+        self.db.flush(timeout=5)
+
+        self.assertEqual([e['user_id'] for e in self.db.leaderboard.top('template_001', 'week', when=MONDAY)],
+                         ['alice'])
+        self.assertEqual([e['user_id'] for e in self.db.leaderboard.top('template_001', 'all')],
+                         ['alice', 'bob'])
+        self.assertEqual(self.db.leaderboard.top('template_001', 'week', store_id='other', when=MONDAY), [])
+
+    def test_cached_board_follows_writes(self):
+        self.db.leaderboard.size = 3
+        for i in range(5):
+            self.save(f's{i}', f'user_{i}', 50.0 + i)
+        self.db.flush(timeout=5)
+        self.assertEqual([e['user_id'] for e in self.db.leaderboard.top('template_001', 'day', when=MONDAY)],
+                         ['user_4', 'user_3', 'user_2'])
+
+        self.save('s9', 'user_0', 99.0)
+        self.db.flush(timeout=5)
+        board = self.db.leaderboard.top('template_001', 'day', when=MONDAY)
+        self.assertEqual([e['user_id'] for e in board], ['user_0', 'user_4', 'user_3'])
+        self.assertEqual(board, self.db.leaderboard._load(
+            self.db.leaderboard.board_key('template_001', 'day', MONDAY), 3))
+
+    def test_rank_outside_top(self):
+        self.db.leaderboard.size = 2
+        for i in range(6):
+            self.save(f's{i}', f'user_{i}', 50.0 + i)
+        self.db.flush(timeout=5)
+
+        self.assertEqual(self.db.leaderboard.rank('user_5', 'template_001', 'week', when=MONDAY), 1)
+        self.assertEqual(self.db.leaderboard.rank('user_1', 'template_001', 'week', when=MONDAY), 5)
+        self.assertIsNone(self.db.leaderboard.rank('nobody', 'template_001', 'week', when=MONDAY))
+
+    def test_rebuild_matches_incremental(self):
+        for i in range(8):
+            self.save(f's{i}', f'user_{i % 3}', 40.0 + i * 7 % 50, start=MONDAY + timedelta(days=i))
+        self.db.flush(timeout=5)
+
+        with self.db.pool.reader() as conn:
+            before = conn.execute("SELECT * FROM leaderboard_entries ORDER BY 1, 2, 3, 4, 5").fetchall()
+        with self.db.pool.writer() as conn:
+            self.db.leaderboard.rebuild(conn)
+        with self.db.pool.reader() as conn:
+            after = conn.execute("SELECT * FROM leaderboard_entries ORDER BY 1, 2, 3, 4, 5").fetchall()
+        self.assertEqual([tuple(r) for r in before], [tuple(r) for r in after])
+
+    def test_store_id_from_manager(self):
+        self.db.close_all_connections()
+        self.db = DatabaseManager(self.db_path, store_id='store_7')
+        self.save('s1', 'alice', 70.0)
+        self.db.flush(timeout=5)
+        self.assertEqual(len(self.db.leaderboard.top('template_001', 'all', store_id='store_7')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
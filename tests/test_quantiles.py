@@ -0,0 +1,100 @@
+"""Tests for quantile sketches and template percentiles"""
+import bisect
+import random
+import unittest
+
+from core.quantiles import KLLSketch
+from data.sync import SyncClient
+from data.sync_server import SyncServer
+from tests.test_database import DatabaseTestCase, make_session
+
+
+def exact_rank(values, value):
+    ordered = sorted(values)
+    return bisect.bisect_right(ordered, value) / len(ordered)
+
+
+class TestKLLSketch(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.gauss(50, 10) for _ in range(50000)]
+
+    def test_quantiles_are_close(self):
+        sketch = KLLSketch()
+        sketch.update_many(self.values)
+        self.assertEqual(sketch.n, len(self.values))
+        self.assertLess(sketch.size, 1000)
+        for fraction in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(exact_rank(self.values, sketch.quantile(fraction)), fraction, delta=0.02)
+
+    def test_merge_matches_whole_stream(self):
+        left, right = KLLSketch(), KLLSketch()
+        left.update_many(self.values[:30000])
+        right.update_many(self.values[30000:])
+        merged = KLLSketch.merged([left, right])
+
+        self.assertEqual(merged.n, len(self.values))
+        for fraction in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(exact_rank(self.values, merged.quantile(fraction)), fraction, delta=0.02)
+
+    def test_json_round_trip(self):
+        sketch = KLLSketch()
+        sketch.update_many(self.values[:5000])
+        restored = KLLSketch.from_json(sketch.to_json())
+        self.assertEqual(restored.n, sketch.n)
+        self.assertEqual(restored.quantiles([0.1, 0.5, 0.9]), sketch.quantiles([0.1, 0.5, 0.9]))
+
+        restored.update_many(self.values[5000:])
+        self.assertEqual(restored.n, len(self.values))
+
+    def test_empty_sketch(self):
+        self.assertEqual(KLLSketch().quantiles([0.5, 0.9]), [None, None])
+        self.assertEqual(KLLSketch().rank(1.0), 0.0)
+
+
+class TestTemplatePercentiles(DatabaseTestCase):
+    def add_sessions(self, scores, template_id='template_001'):
+        for i, score in enumerate(scores):
+            self.db.save_session(make_session(f'{template_id}_{i}', user_id=f'user_{i % 4}',
+                                              template_id=template_id, score=score))
+        self.db.flush(timeout=5)
+
+    def test_sketches_follow_saved_sessions(self):
+        self.add_sessions([float(score) for score in range(1, 101)])
+
+        percentiles = self.db.get_template_percentiles('template_001', 'score')
+        self.assertEqual(percentiles, {0.5: 50.0, 0.9: 90.0, 0.99: 99.0})
+        self.assertAlmostEqual(self.db.get_percentile_rank('template_001', 'score', 75.0), 0.75)
+        self.assertEqual(self.db.get_template_percentiles('template_001', 'duration')[0.5], 40.0)
+
+    def test_unknown_template(self):
+        self.assertEqual(self.db.get_template_percentiles('missing', 'score', (0.5,)), {0.5: None})
+        self.assertIsNone(self.db.get_percentile_rank('missing', 'score', 50.0))
+
+    def test_sketches_merge_at_the_hub(self):
+        server = SyncServer()
+        server.start()
+        try:
+            self.add_sessions([10.0, 20.0, 30.0])
+            SyncClient(self.db, server.url, timeout=2).sync_now()
+            # A later upload replaces the device's sketch rather than adding to it
+            self.db.save_session(make_session('late', score=40.0))
+            self.db.flush(timeout=5)
+            SyncClient(self.db, server.url, timeout=2).sync_now()
+
+            other = KLLSketch()
+            other.update_many([50.0, 60.0])
+            server.apply_batch({'device_id': 'tablet_2', 'last_seq': 1, 'changes': [{
+                'table': 'template_sketches', 'key': ['template_001', 'score'],
+                'row': {'template_id': 'template_001', 'metric': 'score', 'sketch': other.to_json()},
+            }]})
+
+            merged = server.merged_sketch('template_001', 'score')
+            self.assertEqual(merged.n, 6)
+            self.assertEqual(merged.quantiles([0.5, 1.0]), [30.0, 60.0])
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
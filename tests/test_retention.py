@@ -0,0 +1,117 @@
+"""Tests for session retention rollups"""
+import os
+import sqlite3
+import unittest
+from datetime import datetime, timedelta
+
+from core.scoring_system import ScoringSystem
+from data.database import DatabaseManager
+from data.retention import RetentionJob
+from tests.test_database import DatabaseTestCase, make_session
+
+NOW = datetime(2026, 6, 1, 12, 0, 0)
+
+
+class TestRetention(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = RetentionJob(self.db, retention_days=30, keep_recent=5, chunk_size=3, sync_enabled=False)
+
+    def add_sessions(self, count, user_id='user_1', start=NOW - timedelta(days=100)):
+        sessions = []
+        for i in range(count):
+            session = make_session(f'{user_id}_{i}', user_id=user_id, score=50.0 + i,
+                                   accuracy=0.5 + i / 100, start=start + timedelta(days=i))
+            session.errors = [{'type': 'wrong_order'}] * (i % 3) + [{'type': 'overtime'}] * (i % 2)
+            self.db.save_session(session)
+            sessions.append(session)
+        self.db.flush(timeout=5)
+        return sessions
+
+    def remaining_ids(self):
+        with self.db.pool.reader() as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM training_sessions ORDER BY start_time")]
+
+    def test_expired_sessions_are_rolled_up(self):
+        sessions = self.add_sessions(12)
+        result = self.job.run(now=NOW)
+
+        self.assertEqual(result['sessions_rolled_up'], 7)
+        self.assertEqual(self.remaining_ids(), [s.id for s in sessions[7:]])
+
+    def test_trends_are_preserved(self):
+        sessions = self.add_sessions(12)
+        scoring = ScoringSystem()
+        expected = scoring.analyze_performance_trends('user_1', sessions)
+
+        self.job.run(now=NOW)
+        actual = scoring.analyze_performance_trends(
+            'user_1', sessions[7:], rollup=self.db.get_session_rollup('user_1')
+        )
+
+        for key in ('average_score', 'average_accuracy', 'average_speed'):
+            self.assertAlmostEqual(actual[key], expected[key])
+        for key in ('total_sessions', 'performance_trend', 'common_errors'):
+            self.assertEqual(actual[key], expected[key])
+
+    def test_recent_sessions_within_window_are_kept(self):
+        self.add_sessions(3, start=NOW - timedelta(days=40))
+        self.add_sessions(8, user_id='user_2', start=NOW - timedelta(days=10))
+        self.assertEqual(self.job.run(now=NOW)['sessions_rolled_up'], 0)
+        self.assertIsNone(self.db.get_session_rollup('user_1'))
+
+    def test_expiry_is_not_synced(self):
+        self.add_sessions(8)
+        with self.db.pool.writer() as conn:
+            conn.execute("DELETE FROM change_log")
+
+        self.assertEqual(RetentionJob(self.db, retention_days=30).run(now=NOW)['sessions_rolled_up'], 3)
+        with self.db.pool.reader() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0], 0)
+
+    def pending_changes(self):
+        with self.db.pool.reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+
+    def test_change_log_is_pruned_without_sync(self):
+        self.add_sessions(3, start=NOW - timedelta(days=1))
+        RetentionJob(self.db, retention_days=30).run(now=NOW)
+        self.assertGreater(self.pending_changes(), 0)
+
+        self.assertGreater(self.job.run(now=NOW)['changes_pruned'], 0)
+        self.assertEqual(self.pending_changes(), 0)
+
+    def auto_vacuum(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_new_databases_vacuum_incrementally(self):
+        self.assertEqual(self.auto_vacuum(), 2)
+        self.add_sessions(8)
+        self.job.run(now=NOW)
+        self.assertGreater(self.job.seconds_until_due(), 0)
+        self.assertFalse(self.job.enable_incremental_vacuum())
+
+    def test_old_databases_are_only_rebuilt_on_request(self):
+        self.db.close()
+        self.db_path = os.path.join(self.tmp_dir, 'legacy.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE legacy (id INTEGER)")
+        conn.close()
+
+        self.db = DatabaseManager(self.db_path)
+        self.db.initialize()
+        job = RetentionJob(self.db, retention_days=30, sync_enabled=False)
+        self.add_sessions(8)
+        self.assertEqual(job.run(now=NOW)['pages_freed'], 0)
+        self.assertEqual(self.auto_vacuum(), 0)
+
+        self.assertTrue(job.enable_incremental_vacuum())
+        self.assertEqual(self.auto_vacuum(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
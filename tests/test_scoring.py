@@ -0,0 +1,56 @@
+"""Tests for template-backed session scoring"""
+import dataclasses
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from core.scoring_system import ScoringSystem
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class TestScoringPlans(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = self.db.get_all_templates()[0]
+        self.scoring = ScoringSystem(self.db)
+
+    def make_session(self):
+        session = make_session('s1', template_id=self.template.id)
+        session.end_time = session.start_time + timedelta(seconds=self.template.total_time_target)
+        session.completed_steps = list(range(len(self.template.steps)))
+        return session
+
+    def test_scores_against_stored_template(self):
+        result = self.scoring.calculate_session_score(self.make_session())
+        self.assertEqual(result['score'], 100)
+        self.assertEqual(result['grade'], 'A')
+
+    def test_unknown_template(self):
+        session = self.make_session()
+        session.template_id = 'missing'
+        self.assertEqual(self.scoring.calculate_session_score(session)['feedback'], 'Template not found')
+
+    def test_plan_compiled_once(self):
+        with mock.patch.object(self.db, 'get_template', wraps=self.db.get_template) as get_template:
+            for _ in range(3):
+                self.scoring.calculate_session_score(self.make_session())
+        self.assertEqual(get_template.call_count, 1)
+
+        plan = self.scoring.get_plan(self.template.id)
+        self.assertEqual(plan.step_count, len(self.template.steps))
+        self.assertEqual(plan.total_time_target, self.template.total_time_target)
+
+    def test_plan_rebuilt_after_template_edit(self):
+        old_plan = self.scoring.get_plan(self.template.id)
+
+        edited = dataclasses.replace(self.template, total_time_target=self.template.total_time_target * 2,
+                                     steps=list(self.template.steps))
+        self.db.save_template(edited)
+
+        new_plan = self.scoring.get_plan(self.template.id)
+        self.assertNotEqual(new_plan.version, old_plan.version)
+        self.assertEqual(new_plan.total_time_target, edited.total_time_target)
+
+
+if __name__ == '__main__':
+    unittest.main()
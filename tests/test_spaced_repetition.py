@@ -0,0 +1,140 @@
+"""Tests for FSRS flashcard scheduling"""
+import unittest
+from datetime import datetime, timedelta
+
+from core.spaced_repetition import FSRS, Rating, forgetting_curve
+from tests.test_database import DatabaseTestCase
+
+NOW = datetime(2026, 3, 1, 9, 0, 0)
+
+
+class TestFSRS(unittest.TestCase):
+    def setUp(self):
+        self.fsrs = FSRS()
+
+    def test_forgetting_curve(self):
+        self.assertAlmostEqual(forgetting_curve(0, 5.0), 1.0)
+        self.assertAlmostEqual(forgetting_curve(5.0, 5.0), 0.9)
+        self.assertLess(forgetting_curve(20.0, 5.0), 0.9)
+
+    def test_first_review(self):
+        good = self.fsrs.review(None, Rating.GOOD, NOW)
+        self.assertAlmostEqual(good.stability, 3.7145)
+        self.assertEqual(good.interval_days, 4.0)
+        self.assertEqual(good.due_at, NOW + timedelta(days=4))
+        self.assertEqual((good.reps, good.lapses), (1, 0))
+
+        again = self.fsrs.review(None, Rating.AGAIN, NOW)
+        self.assertEqual(again.due_at, NOW + timedelta(minutes=10))
+        self.assertGreater(again.difficulty, good.difficulty)
+
+    def test_difficulty_reverts_towards_w4(self):
+        w = self.fsrs.w
+        self.assertAlmostEqual(self.fsrs.next_difficulty(w[4], Rating.GOOD), w[4])
+        self.assertAlmostEqual(self.fsrs.next_difficulty(9.0, Rating.GOOD), w[7] * w[4] + (1 - w[7]) * 9.0)
+
+    def test_successful_reviews_grow_intervals(self):
+        state, intervals = None, []
+        now = NOW
+        for _ in range(5):
+            state = self.fsrs.review(state, Rating.GOOD, now)
+            intervals.append(state.interval_days)
+            now = state.due_at
+        self.assertEqual(intervals, sorted(intervals))
+        self.assertGreater(intervals[-1], 30)
+
+    def test_lapse_shrinks_stability(self):
+        state = self.fsrs.review(None, Rating.GOOD, NOW)
+        state = self.fsrs.review(state, Rating.GOOD, state.due_at)
+        lapsed = self.fsrs.review(state, Rating.AGAIN, state.due_at)
+
+        self.assertLess(lapsed.stability, state.stability)
+        self.assertEqual(lapsed.lapses, 1)
+        self.assertGreater(lapsed.difficulty, state.difficulty)
+
+    def test_easy_beats_hard(self):
+        state = self.fsrs.review(None, Rating.GOOD, NOW)
+        hard = self.fsrs.review(state, Rating.HARD, state.due_at)
+        easy = self.fsrs.review(state, Rating.EASY, state.due_at)
+        self.assertLess(hard.interval_days, easy.interval_days)
+
+    def test_desired_retention_sets_interval(self):
+        self.assertEqual(FSRS().next_interval(10.0), 10.0)
+        self.assertLess(FSRS(desired_retention=0.95).next_interval(10.0), 10.0)
+        self.assertEqual(FSRS(maximum_interval=30).next_interval(1000.0), 30.0)
+
+
+class TestFlashcardSchedule(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enrolled = self.db.enroll_flashcards('user_1', now=NOW)
+
+    def due_ids(self, now, **filters):
+        return [f.id for f in self.db.get_due_flashcards('user_1', limit=100, now=now, **filters)]
+
+    def test_enrollment_is_idempotent(self):
+        self.assertGreater(self.enrolled, 0)
+        self.assertEqual(self.db.enroll_flashcards('user_1', now=NOW), 0)
+        self.assertEqual(len(self.due_ids(NOW)), self.enrolled)
+        self.assertEqual(self.db.get_due_flashcards('user_2', now=NOW), [])
+
+    def test_seeded_cards_are_enrolled(self):
+        with self.db.pool.writer() as conn:
+            for table in ('flashcard_schedule', 'flashcard_ingredients', 'flashcard_tips'):
+                conn.execute(f"DELETE FROM {table} WHERE flashcard_id = 'flash_002'")
+            conn.execute("DELETE FROM flashcards WHERE id = 'flash_002'")
+        self.db.set_meta('flashcards_seed_hash', 'stale')
+
+        self.db.seed_flashcards()
+        self.assertEqual(self.db.enroll_flashcards('user_1', now=NOW), 0)
+        self.assertIn('flash_002', self.due_ids(datetime.now()))
+        self.assertEqual(self.db.get_due_flashcards('user_2'), [])
+
+    def test_reviewed_card_leaves_the_queue_until_due(self):
+        state = self.db.review_flashcard('user_1', 'flash_001', Rating.GOOD, now=NOW)
+        self.assertNotIn('flash_001', self.due_ids(NOW))
+        self.assertNotIn('flash_001', self.due_ids(state.due_at - timedelta(hours=1)))
+        self.assertIn('flash_001', self.due_ids(state.due_at))
+
+        self.assertEqual(self.db.get_flashcard_schedule('user_1', 'flash_001'), state)
+        self.assertIsNone(self.db.get_flashcard_schedule('user_1', 'flash_002'))
+        self.assertEqual(self.db.get_flashcard_by_id('flash_001').times_reviewed, 1)
+
+    def test_most_overdue_first(self):
+        self.db.review_flashcard('user_1', 'flash_001', Rating.AGAIN, now=NOW)
+        self.db.review_flashcard('user_1', 'flash_002', Rating.AGAIN, now=NOW - timedelta(minutes=5))
+        due = self.due_ids(NOW + timedelta(days=1))
+        self.assertEqual(due[-2:], ['flash_002', 'flash_001'])
+
+    def test_filters(self):
+        card = self.db.get_flashcard_by_id('flash_001')
+        due = self.db.get_due_flashcards('user_1', limit=100, now=NOW, category=card.category)
+        self.assertTrue(due)
+        self.assertTrue(all(f.category == card.category for f in due))
+
+    def test_unknown_card(self):
+        self.assertIsNone(self.db.review_flashcard('user_1', 'missing', Rating.GOOD, now=NOW))
+
+    def test_next_due_is_an_index_range_scan(self):
+        with self.db.pool.reader() as conn:
+            plan = ' '.join(row['detail'] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT flashcard_id FROM flashcard_schedule "
+                "WHERE user_id = ? AND due_at <= ? ORDER BY due_at LIMIT 1", ('user_1', NOW.isoformat())
+            ))
+        self.assertIn('idx_flashcard_schedule_due', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_only_reviewed_cards_are_synced(self):
+        with self.db.pool.reader() as conn:
+            self.assertEqual(conn.execute(
+                "SELECT COUNT(*) FROM change_log WHERE table_name = 'flashcard_schedule'").fetchone()[0], 0)
+
+        self.db.review_flashcard('user_1', 'flash_001', Rating.GOOD, now=NOW)
+        with self.db.pool.reader() as conn:
+            keys = [row[0] for row in conn.execute(
+                "SELECT row_key FROM change_log WHERE table_name = 'flashcard_schedule'")]
+        self.assertEqual(keys, ['["user_1","flash_001"]'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""Tests for delta sync and the local sync hub"""
+import unittest
+from datetime import datetime, timedelta
+
+from data.retention import RetentionJob
+from data.sync import SyncClient, SyncError
+from data.sync_server import SyncServer
+from tests.test_database import DatabaseTestCase, make_session
+
+
+class SyncTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = SyncServer()
+        self.server.start()
+        self.client = SyncClient(self.db, self.server.url, batch_size=2,
+                                 max_attempts=3, backoff=0.01, timeout=2)
+
+    def tearDown(self):
+        self.client.stop()
+        self.server.stop()
+        super().tearDown()
+
+    def pending(self):
+        with self.db.pool.reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+
+
+class TestChangeLog(SyncTestCase):
+    def test_seeding_is_not_logged(self):
+        self.assertEqual(self.pending(), 0)
+
+    def test_writes_are_logged(self):
+        self.db.save_session(make_session('s1'))
+        self.db.flush(timeout=5)
+        self.db.update_flashcard_progress('flash_001', mastered=True)
+
+        with self.db.pool.reader() as conn:
+            tables = {row[0] for row in conn.execute("SELECT table_name FROM change_log")}
+        self.assertEqual(tables, {'training_sessions', 'user_progress', 'user_template_progress',
+                                  'flashcards', 'template_sketches'})
+
+
+class TestSyncClient(SyncTestCase):
+    def test_pushes_changes_and_advances_watermark(self):
+        for i in range(3):
+            self.db.save_session(make_session(f's{i}'))
+        self.db.update_flashcard_progress('flash_001', mastered=True)
+
+        self.assertGreaterEqual(self.client.sync_now(), 6)
+        self.assertEqual(self.pending(), 0)
+        self.assertGreater(self.client.watermark, 0)
+
+        sessions = self.server.rows('training_sessions')
+        self.assertEqual([s['key'] for s in sessions], [['s0'], ['s1'], ['s2']])
+        self.assertEqual(self.server.rows('flashcards')[0]['row']['times_reviewed'], 1)
+        progress = self.server.rows('user_template_progress')
+        self.assertEqual(progress[0]['key'], ['user_1', 'template_001'])
+        self.assertEqual(progress[0]['row']['sessions'], 3)
+
+    def test_only_new_changes_are_resent(self):
+        self.db.save_session(make_session('s1'))
+        self.client.sync_now()
+        self.assertEqual(self.client.sync_now(), 0)
+
+        self.db.update_flashcard_progress('flash_002', mastered=False)
+        self.assertEqual(self.client.sync_now(), 1)
+
+    def test_deleted_rows_are_sent_as_null(self):
+        self.db.save_session(make_session('s1'))
+        self.client.sync_now()
+        with self.db.pool.writer() as conn:
+            conn.execute("DELETE FROM training_sessions WHERE id = 's1'")
+
+        self.client.sync_now()
+        self.assertIsNone(self.server.rows('training_sessions')[0]['row'])
+
+    def test_retries_transient_failures(self):
+        self.db.save_session(make_session('s1'))
+        self.server.fail_requests = 2
+        # Session, two progress rows and four template sketches
+        self.assertEqual(self.client.sync_now(), 7)
+
+    def test_resumes_after_failure(self):
+        self.db.save_session(make_session('s1'))
+        self.server.fail_requests = 10
+
+        with self.assertRaises(SyncError):
+            self.client.sync_now()
+        self.assertEqual(self.client.watermark, 0)
+        self.assertEqual(self.pending(), 7)
+
+        self.server.fail_requests = 0
+        self.assertEqual(self.client.sync_now(), 7)
+        self.assertEqual(len(self.server.rows('training_sessions')), 1)
+
+    def test_duplicate_batch_is_not_reapplied(self):
+        batch = {'device_id': 'd1', 'after_seq': 0, 'last_seq': 5,
+                 'changes': [{'table': 'flashcards', 'key': ['flash_001'], 'row': {'id': 'flash_001'}}]}
+        self.assertEqual(self.server.apply_batch(batch), 5)
+
+        batch['changes'][0]['row'] = None
+        self.assertEqual(self.server.apply_batch(batch), 5)
+        self.assertIsNotNone(self.server.rows('flashcards')[0]['row'])
+
+
+
+class TestRetentionWithSync(SyncTestCase):
+    def test_unsynced_sessions_are_not_expired(self):
+        now = datetime(2026, 6, 1)
+        self.db.write_sessions([
+            make_session(f's{i}', start=now - timedelta(days=100 - i)) for i in range(3)
+        ])
+        job = RetentionJob(self.db, retention_days=30, keep_recent=0)
+
+        # The hub has not seen these sessions yet
+        self.assertEqual(job.run(now=now)['sessions_rolled_up'], 0)
+
+        self.client.sync_now()
+        self.assertEqual(job.run(now=now)['sessions_rolled_up'], 3)
+        self.client.sync_now()
+
+        sessions = self.server.rows('training_sessions')
+        self.assertEqual([s['key'] for s in sessions], [['s0'], ['s1'], ['s2']])
+        self.assertTrue(all(s['row'] is not None for s in sessions))
+
+
+if __name__ == '__main__':
+    unittest.main()
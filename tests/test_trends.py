@@ -0,0 +1,101 @@
+"""Tests for incremental trend accumulators"""
+import random
+import statistics
+import unittest
+from datetime import datetime, timedelta
+
+from core.scoring_system import ScoringSystem
+from core.trends import RunningStats, TrendAccumulator
+from data.migrations import MIGRATIONS
+from tests.test_database import DatabaseTestCase, make_session
+
+
+def make_history(count, user_id='user_1', seed=7):
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(count):
+        session = make_session(f'{user_id}_{i}', user_id=user_id, score=rng.uniform(40, 100),
+                               accuracy=rng.random(), speed=rng.random(),
+                               start=datetime(2026, 1, 1) + timedelta(hours=i))
+        session.errors = [{'type': rng.choice(['wrong_order', 'overtime', 'sauce_amount'])}
+                          for _ in range(rng.randint(0, 2))]
+        sessions.append(session)
+    return sessions
+
+
+class TestRunningStats(unittest.TestCase):
+    def test_matches_batch_statistics(self):
+        values = [random.Random(1).uniform(0, 100) for _ in range(50)]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        self.assertAlmostEqual(stats.mean, statistics.fmean(values))
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(values))
+
+    def test_merge_equals_adding(self):
+        left, right, both = RunningStats(), RunningStats(), RunningStats()
+        for i, value in enumerate([3.0, 9.5, 1.25, 7.0, 4.5, 8.0]):
+            (left if i < 2 else right).add(value)
+            both.add(value)
+        left.merge(right.count, right.mean, right.m2)
+        self.assertAlmostEqual(left.mean, both.mean)
+        self.assertAlmostEqual(left.m2, both.m2)
+
+
+class TestTrendAccumulator(unittest.TestCase):
+    def test_summary_matches_full_analysis(self):
+        sessions = make_history(40)
+        accumulator = TrendAccumulator.from_json(self.accumulate(sessions).to_json())
+
+        scoring = ScoringSystem()
+        expected = scoring.analyze_performance_trends('user_1', sessions)
+        actual = scoring.summarize_trends(accumulator)
+
+        for key in ('average_score', 'average_accuracy', 'average_speed'):
+            self.assertAlmostEqual(actual[key], expected[key])
+        for key in ('total_sessions', 'performance_trend', 'common_errors', 'recommendations'):
+            self.assertEqual(actual[key], expected[key])
+
+    def test_recent_buffer_is_bounded(self):
+        accumulator = self.accumulate(make_history(12))
+        self.assertEqual(len(accumulator.recent_scores), 5)
+
+    def test_empty_accumulator_has_no_trends(self):
+        self.assertEqual(ScoringSystem().summarize_trends(TrendAccumulator()), {})
+
+    @staticmethod
+    def accumulate(sessions):
+        accumulator = TrendAccumulator()
+        accumulator.add_sessions(sessions)
+        return accumulator
+
+
+class TestStoredTrends(DatabaseTestCase):
+    def test_updated_as_sessions_are_saved(self):
+        sessions = make_history(30)
+        for session in sessions:
+            self.db.save_session(session)
+        self.db.flush(timeout=5)
+
+        accumulator = self.db.get_user_trends('user_1')
+        self.assertEqual(accumulator.total_sessions, 30)
+        self.assertEqual(list(accumulator.recent_scores), [s.score for s in sessions[-5:]])
+        self.assertAlmostEqual(accumulator.score.mean, statistics.fmean(s.score for s in sessions))
+
+    def test_backfilled_by_migration(self):
+        sessions = make_history(10)
+        self.db.write_sessions(sessions)
+        with self.db.pool.writer() as conn:
+            conn.execute("DELETE FROM user_trends")
+            dict(((v, f) for v, _, f in MIGRATIONS))[9](conn)
+
+        accumulator = self.db.get_user_trends('user_1')
+        self.assertEqual(accumulator.total_sessions, 10)
+        self.assertAlmostEqual(accumulator.speed.variance, statistics.pvariance(s.speed for s in sessions))
+
+    def test_unknown_user(self):
+        self.assertIsNone(self.db.get_user_trends('nobody'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,7 +12,7 @@ from kivy.properties import StringProperty, ListProperty
 from kivy.clock import Clock
 
 from utils.translation_mixin import TranslatableLabel, TranslatableButton
-from ui.widgets.flashcard_widget import FlashcardWidget
+from ui.widgets.flashcard_deck import FlashcardDeck
 from data.database import DatabaseManager
 
 
@@ -22,20 +22,35 @@ class FlashcardsScreen(Screen):  # REMOVED: , TranslatableMixin
     current_category = StringProperty('all')
     current_difficulty = StringProperty('all')
 
+    # Most cards loaded into the deck at once
+    DECK_SIZE = 200
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name = 'flashcards'
 
-        # Initialize database properly
-        self.db = DatabaseManager()
-        self.db.initialize()
+        # Use the app-owned database so the connection pool is shared
+        self.db = self.get_database()
 
-        self.current_flashcards = []
-        self.current_index = 0
+        self.deck = None
+        # User whose unseen cards have been scheduled; seeding runs before the screen loads
+        self.enrolled_user = None
 
         # Setup UI after a short delay
         Clock.schedule_once(lambda dt: self.setup_ui(), 0.1)
 
+    def get_database(self):
+        """Return the running app's database, or a standalone one outside the app"""
+        from kivy.app import App
+        app = App.get_running_app()
+
+        if app and getattr(app, 'database', None):
+            return app.database
+
+        db = DatabaseManager()
+        db.initialize()
+        return db
+
     def setup_ui(self):
         """Setup the screen UI"""
         # Main layout
@@ -98,9 +113,8 @@ class FlashcardsScreen(Screen):  # REMOVED: , TranslatableMixin
             btn.bind(on_press=lambda instance, d=diff: self.filter_by_difficulty(d))
             difficulty_layout.add_widget(btn)
 
-        # Flashcard display area
-        self.card_container = BoxLayout(
-            orientation='vertical',
+        # Flashcard display area; reuses its card widgets as the deck is browsed
+        self.deck = FlashcardDeck(
             size_hint_y=0.64,
             padding=20
         )
@@ -133,7 +147,7 @@ class FlashcardsScreen(Screen):  # REMOVED: , TranslatableMixin
         main_layout.add_widget(header)
         main_layout.add_widget(filters_layout)
         main_layout.add_widget(difficulty_layout)
-        main_layout.add_widget(self.card_container)
+        main_layout.add_widget(self.deck)
         main_layout.add_widget(nav_layout)
 
         self.add_widget(main_layout)
@@ -141,86 +155,39 @@ class FlashcardsScreen(Screen):  # REMOVED: , TranslatableMixin
         # Load initial flashcards
         self.load_flashcards()
 
-    # def load_flashcards(self):
-    #     """Load flashcards based on current filters"""
-    #     # Build filters
-    #     category = None if self.current_category == 'all' else self.current_category
-    #     difficulty = None if self.current_difficulty == 'all' else self.current_difficulty
-    #
-    #     self.current_flashcards = self.db.get_flashcards(
-    #         category=category,
-    #         difficulty=difficulty
-    #     )
-    #     self.current_index = 0
-    #
-    #     self.display_current_card()
-    #     self.update_progress()
-
     def load_flashcards(self):
-        """Load flashcards based on current filters"""
-        # TEMPORARY: Return empty list until database is fixed
-        self.current_flashcards = []
-        self.current_index = 0
-        self.display_current_card()
+        """Load the cards due for review, filtered by the current category and difficulty"""
+        from kivy.app import App
+        user_id = getattr(App.get_running_app(), 'user_id', 'trainee')
+
+        # Cards the trainee has never seen join the queue as due now, once per user;
+        # filter changes only read
+        if self.enrolled_user != user_id:
+            self.db.enroll_flashcards(user_id)
+            self.enrolled_user = user_id
+        self.deck.set_cards(self.db.get_due_flashcards(
+            user_id,
+            limit=self.DECK_SIZE,
+            category=None if self.current_category == 'all' else self.current_category,
+            difficulty=None if self.current_difficulty == 'all' else self.current_difficulty
+        ))
         self.update_progress()
 
-        # Comment out the original code:
-        # # Build filters
-        # category = None if self.current_category == 'all' else self.current_category
-        # difficulty = None if self.current_difficulty == 'all' else self.current_difficulty
-        #
-        # self.current_flashcards = self.db.get_flashcards(
-        #     category=category,
-        #     difficulty=difficulty
-        # )
-        # self.current_index = 0
-        #
-        # self.display_current_card()
-        # self.update_progress()
-
-
-
-
-
-
-    def display_current_card(self):
-        """Display the current flashcard"""
-        self.card_container.clear_widgets()
-
-        if not self.current_flashcards:
-            # No cards message
-            label = Label(
-                text='No flashcards found for selected filters',
-                font_size='20sp',
-                color=(0.5, 0.5, 0.5, 1)
-            )
-            self.card_container.add_widget(label)
-            return
-
-        if self.current_index < len(self.current_flashcards):
-            flashcard = self.current_flashcards[self.current_index]
-            card_widget = FlashcardWidget(flashcard=flashcard)
-            self.card_container.add_widget(card_widget)
-
     def update_progress(self):
         """Update progress label"""
-        total = len(self.current_flashcards)
-        current = self.current_index + 1 if total > 0 else 0
+        total = len(self.deck.cards)
+        current = self.deck.index + 1 if total > 0 else 0
         self.progress_label.text = f'{current}/{total}'
 
     def next_card(self, instance):
         """Show next card"""
-        if self.current_flashcards:
-            self.current_index = (self.current_index + 1) % len(self.current_flashcards)
-            self.display_current_card()
-            self.update_progress()
+        self.deck.next()
+        self.update_progress()
 
     def previous_card(self, instance):
         """Show previous card"""
-        if self.current_flashcards:
-            self.current_index = (self.current_index - 1) % len(self.current_flashcards)
-            self.display_current_card()
-            self.update_progress()
+        self.deck.previous()
+        self.update_progress()
 
     def filter_by_category(self, category):
         """Filter flashcards by category"""
@@ -248,15 +215,17 @@ class FlashcardsScreen(Screen):  # REMOVED: , TranslatableMixin
 
     def show_stats(self, instance):
         """Show flashcards statistics"""
-        # This would show mastery statistics
         # For now, just print to console
-        flashcards = self.db.get_flashcards()
-        mastered = sum(1 for f in flashcards if f.mastery_level > 0.7)
+        stats = self.db.get_flashcard_stats()
+        overall = stats.overall
 
         print(f"Flashcards Statistics:")
-        print(f"Total: {len(flashcards)}")
-        print(f"Mastered: {mastered} ({mastered/len(flashcards)*100:.1f}%)")
-        print(f"Average mastery: {sum(f.mastery_level for f in flashcards)/len(flashcards)*100:.1f}%")
+        print(f"Total: {overall.total}")
+        print(f"New: {overall.new}, learning: {overall.learning}, familiar: {overall.familiar}")
+        print(f"Mastered: {overall.mastered} ({overall.mastered_fraction*100:.1f}%)")
+        print(f"Average mastery: {overall.average_mastery*100:.1f}%")
+        for category, counts in sorted(stats.by_category.items()):
+            print(f"  {category}: {counts.mastered}/{counts.total} mastered")
 
     def go_back(self, instance):
         """Return to main menu"""
@@ -57,6 +57,23 @@ class SettingsScreen(Screen):
         lang_layout.add_widget(self.lang_button)
         layout.add_widget(lang_layout)
 
+        # Developer tools
+        if self.is_developer_mode():
+            stats_btn = TranslatableButton(
+                translation_key='query_stats_button',
+                size_hint=(1, 0.15)
+            )
+            stats_btn.bind(on_release=self.dump_query_stats)
+            layout.add_widget(stats_btn)
+
+        # Training history export
+        if self.get_exporter():
+            self.setup_export_controls(layout)
+
+        # Maintenance jobs
+        if self.get_job_runner():
+            self.setup_job_controls(layout)
+
         # Back button
         back_btn = TranslatableButton(
             translation_key='back_button',
@@ -115,6 +132,118 @@ class SettingsScreen(Screen):
             current_lang = app.config_manager.get("general", "language") or "en"
             self.lang_button.text = 'Русский' if current_lang == 'en' else 'English'
 
+    def is_developer_mode(self):
+        """Check the app.developer_mode setting"""
+        from kivy.app import App
+        app = App.get_running_app()
+
+        config_manager = getattr(app, 'config_manager', None)
+        return bool(config_manager and config_manager.get('app.developer_mode', False))
+
+    def dump_query_stats(self, instance):
+        """Write the data layer's query latency stats to the log"""
+        from kivy.app import App
+        app = App.get_running_app()
+
+        database = getattr(app, 'database', None)
+        if database:
+            database.dump_query_stats()
+
+    def get_exporter(self):
+        """The app's SessionExporter, or None without a database"""
+        from kivy.app import App
+        return getattr(App.get_running_app(), 'session_exporter', None)
+
+    def setup_export_controls(self, layout):
+        """Button exporting the training history to paths.exports, plus a status line"""
+        from kivy.uix.label import Label
+
+        export_btn = TranslatableButton(
+            translation_key='export_history_button',
+            size_hint=(1, 0.15)
+        )
+        export_btn.bind(on_release=self.export_history)
+        layout.add_widget(export_btn)
+
+        self.export_status = Label(text='', size_hint=(1, 0.1))
+        layout.add_widget(self.export_status)
+        self._exporting = False
+
+    def export_history(self, instance):
+        """Export every stored session off the UI thread"""
+        import threading
+
+        exporter = self.get_exporter()
+        if exporter is None or self._exporting:
+            return
+        self._exporting = True
+        threading.Thread(target=self._run_export, args=(exporter,), name='lineup-export', daemon=True).start()
+
+    def _run_export(self, exporter):
+        from kivy.clock import Clock
+        try:
+            count = exporter.export()
+            message = ('export_status', {'count': count, 'folder': str(exporter.export_dir)})
+        except Exception as e:
+            message = ('export_failed', {'error': str(e)})
+        Clock.schedule_once(lambda dt: self.update_export_status(*message))
+
+    def update_export_status(self, key, values):
+        from kivy.app import App
+        app = App.get_running_app()
+        self._exporting = False
+        self.export_status.text = app.translate(key, **values) if hasattr(app, 'translate') else str(values)
+
+    def get_job_runner(self):
+        """The app's JobRunner, or None when maintenance jobs are disabled"""
+        from kivy.app import App
+        return getattr(App.get_running_app(), 'job_runner', None)
+
+    def setup_job_controls(self, layout):
+        """Buttons to run and cancel maintenance jobs, plus a status line"""
+        from kivy.uix.label import Label
+
+        jobs_layout = BoxLayout(
+            orientation='horizontal',
+            size_hint=(1, 0.15),
+            spacing=10
+        )
+        for job_name in ('regrade', 'progress', 'trends'):
+            job_btn = TranslatableButton(translation_key=f'job_{job_name}_button')
+            job_btn.bind(on_release=lambda instance, name=job_name: self.start_job(name))
+            jobs_layout.add_widget(job_btn)
+
+        cancel_btn = TranslatableButton(translation_key='job_cancel_button')
+        cancel_btn.bind(on_release=self.cancel_job)
+        jobs_layout.add_widget(cancel_btn)
+        layout.add_widget(jobs_layout)
+
+        self.job_status = Label(text='', size_hint=(1, 0.1))
+        layout.add_widget(self.job_status)
+
+    def start_job(self, name):
+        """Start a maintenance job unless one is already running"""
+        runner = self.get_job_runner()
+        if runner and not runner.busy:
+            runner.start(name, on_progress=self.on_job_progress)
+
+    def cancel_job(self, instance):
+        runner = self.get_job_runner()
+        if runner:
+            runner.cancel()
+
+    def on_job_progress(self, job):
+        """Called from the job thread; the label is updated on the UI thread"""
+        from kivy.clock import Clock
+        Clock.schedule_once(lambda dt: self.update_job_status(job))
+
+    def update_job_status(self, job):
+        from kivy.app import App
+        app = App.get_running_app()
+        self.job_status.text = app.translate(
+            'job_status', job=job.name, done=job.done, total=job.total, state=job.state
+        ) if hasattr(app, 'translate') else f"{job.name}: {job.done}/{job.total} ({job.state})"
+
     def go_back(self, instance):
         """Return to main menu"""
         self.manager.current = 'main'
@@ -0,0 +1,96 @@
+"""
+Flashcard deck view that recycles a small ring of card widgets
+"""
+
+from kivy.uix.anchorlayout import AnchorLayout
+from kivy.uix.label import Label
+from kivy.properties import NumericProperty, StringProperty
+from kivy.clock import Clock
+
+from ui.widgets.flashcard_widget import FlashcardWidget
+
+
+class FlashcardDeck(AnchorLayout):
+    """Shows one card of a deck at a time.
+
+    Three FlashcardWidgets are created once and rebound to cards as the
+    deck is browsed. After each move the previous and next cards are
+    bound to the spare widgets on the following frame, so Next/Previous
+    only swap which widget is shown.
+    """
+
+    RING_SIZE = 3
+
+    index = NumericProperty(0)
+    empty_text = StringProperty('No flashcards found for selected filters')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cards = []
+        self._ring = [FlashcardWidget() for _ in range(self.RING_SIZE)]
+        # Deck index each ring widget is bound to, None when unbound
+        self._bound = [None] * self.RING_SIZE
+        self._empty_label = Label(text=self.empty_text, font_size='20sp', color=(0.5, 0.5, 0.5, 1))
+        self.bind(empty_text=self._empty_label.setter('text'))
+        self._shown = None
+        self._prefetch_trigger = Clock.create_trigger(self._prefetch)
+
+    def set_cards(self, cards):
+        """Replace the deck and show its first card"""
+        self.cards = list(cards)
+        self._bound = [None] * self.RING_SIZE
+        self.index = 0
+        self._show()
+
+    @property
+    def current(self):
+        return self.cards[self.index] if self.cards else None
+
+    def next(self):
+        if self.cards:
+            self.index = (self.index + 1) % len(self.cards)
+            self._show()
+
+    def previous(self):
+        if self.cards:
+            self.index = (self.index - 1) % len(self.cards)
+            self._show()
+
+    def _show(self):
+        if not self.cards:
+            self._display(self._empty_label)
+            return
+
+        widget = self._widget_for(self.index)
+        widget.show_front()
+        self._display(widget)
+        self._prefetch_trigger()
+
+    def _display(self, widget):
+        if self._shown is not widget:
+            if self._shown is not None:
+                self.remove_widget(self._shown)
+            self.add_widget(widget)
+            self._shown = widget
+
+    def _prefetch(self, *args):
+        """Bind the neighbours of the current card to spare ring widgets"""
+        if self.cards:
+            self._widget_for((self.index + 1) % len(self.cards))
+            self._widget_for((self.index - 1) % len(self.cards))
+
+    def _widget_for(self, index):
+        """The ring widget bound to a deck index, rebinding one outside the current window if needed"""
+        for slot, bound in enumerate(self._bound):
+            if bound == index:
+                return self._ring[slot]
+
+        count = len(self.cards)
+        window = (self.index, (self.index + 1) % count, (self.index - 1) % count)
+        for slot, bound in enumerate(self._bound):
+            if bound not in window:
+                break
+        self._bound[slot] = index
+        widget = self._ring[slot]
+        widget.set_flashcard(self.cards[index])
+        return widget
@@ -13,6 +13,12 @@ from kivy.lang import Builder
 from kivy.clock import Clock
 
 Builder.load_string("""
+<IngredientRow@Label>:
+    font_size: '16sp'
+    halign: 'left'
+    valign: 'middle'
+    text_size: self.width, None
+
 <FlashcardWidget>:
     size_hint: (None, None)
     size: (300, 400)
@@ -76,12 +82,16 @@ Builder.load_string("""
             size_hint_y: 0.15
             color: 0.2, 0.2, 0.2, 1
         
-        ScrollView:
+        # Rows are recycled, so a new card only swaps their text
+        RecycleView:
+            id: ingredients_view
             size_hint_y: 0.7
+            viewclass: 'IngredientRow'
             
-            GridLayout:
-                id: ingredients_grid
-                cols: 1
+            RecycleBoxLayout:
+                orientation: 'vertical'
+                default_size: None, 30
+                default_size_hint: 1, None
                 size_hint_y: None
                 height: self.minimum_height
                 spacing: 5
@@ -126,12 +136,13 @@ class FlashcardWidget(FloatLayout):
             self.set_flashcard(flashcard)
 
     def set_flashcard(self, flashcard):
-        """Set the flashcard data"""
+        """Set the flashcard data, showing its front side"""
         self.flashcard = flashcard
         self.dish_name = self._(flashcard.dish_name_translation_key)
         self.ingredients = [
             self._(key) for key in flashcard.ingredients_translation_keys
         ]
+        self.show_front()
 
         # Update ingredients display
         if hasattr(self, 'ids'):
@@ -139,23 +150,15 @@ class FlashcardWidget(FloatLayout):
 
     def update_ingredients_display(self):
         """Update the ingredients list in the UI"""
-        ingredients_grid = self.ids.ingredients_grid
-        ingredients_grid.clear_widgets()
-
-        for ingredient in self.ingredients:
-            from kivy.uix.label import Label
-            label = Label(
-                text=f"• {ingredient}",
-                font_size='16sp',
-                halign='left',
-                size_hint_y=None,
-                height=30,
-                text_size=(self.width - 40, None)
-            )
-            ingredients_grid.add_widget(label)
-
-        # Set proper height for scroll
-        ingredients_grid.height = len(self.ingredients) * 35
+        ingredients_view = self.ids.ingredients_view
+        ingredients_view.data = [{'text': f"• {ingredient}"} for ingredient in self.ingredients]
+        ingredients_view.scroll_y = 1
+
+    def show_front(self):
+        """Turn the card face up without animating, e.g. before it is reused"""
+        Animation.cancel_all(self)
+        self.opacity = 1
+        self.is_flipped = False
 
     def flip(self):
         """Animate card flip"""
@@ -175,9 +178,17 @@ class FlashcardWidget(FloatLayout):
     def mark_mastered(self, mastered):
         """Mark flashcard as mastered or needs practice"""
         if self.flashcard:
-            from data.database import DatabaseManager
-            db = DatabaseManager()
-            db.update_flashcard_progress(self.flashcard.id, mastered)
+            from kivy.app import App
+            app = App.get_running_app()
+            db = getattr(app, 'database', None)
+            if db is None:
+                from data.database import DatabaseManager
+                db = DatabaseManager()
+
+            # Reschedule the card for this trainee
+            from core.spaced_repetition import Rating
+            user_id = getattr(app, 'user_id', 'trainee')
+            db.review_flashcard(user_id, self.flashcard.id, Rating.GOOD if mastered else Rating.AGAIN)
 
             # Show feedback
             if mastered:
@@ -187,8 +198,6 @@ class FlashcardWidget(FloatLayout):
 
     def _(self, text):
         """Translation shortcut"""
-        # Use your existing translation system
-        from utils.translation import get_translation
-        current_lang = 'en'  # You should get this from your config
-        return get_translation(text, current_lang)
-
+        from kivy.app import App
+        app = App.get_running_app()
+        return app.translate(text) if app and hasattr(app, 'translate') else text
@@ -44,7 +44,8 @@ class ConfigManager:
             "app": {
                 "name": "LineUp Pro",
                 "version": "1.0.0",
-                "developer_mode": False
+                "developer_mode": False,
+                "user_id": "trainee"
             },
             "training": {
                 "default_mode": "guided",
@@ -66,10 +67,17 @@ class ConfigManager:
                 "animation_speed": "normal"
             },
             "data": {
+                "store_id": "default",
                 "auto_backup": True,
                 "backup_interval_hours": 24,
+                "backup_keep": 7,
                 "sync_enabled": False,
-                "sync_server_url": ""
+                "sync_server_url": "",
+                "sync_interval_minutes": 15,
+                "slow_query_ms": 50,
+                "retention_days": 0,
+                "maintenance_jobs": False,
+                "job_workers": 0
             },
             "paths": {
                 "assets": "assets/",